@@ -11,9 +11,11 @@
 from .io_grader import IOGrader
 from .weighted_grader import WeightedGrader
 from .ast_grader import ASTGrader
+from .ast_rules import ASTRule, register_rule
 from .property_based_grader import PropertyBasedGrader
 from .plagiarism_detector import PlagiarismDetector
 from .performance_grader import PerformanceGrader
+from .benchmark_corpus import BenchmarkCorpus
 from .advanced_grader import AdvancedGrader, BatchGrader
 
 __all__ = [
@@ -21,9 +23,12 @@
     'IOGrader',
     'WeightedGrader',
     'ASTGrader',
+    'ASTRule',
+    'register_rule',
     'PropertyBasedGrader',
     'PlagiarismDetector',
     'PerformanceGrader',
+    'BenchmarkCorpus',
     'AdvancedGrader',
     'BatchGrader'
 ]
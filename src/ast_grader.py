@@ -5,30 +5,327 @@
 
 import ast
 import re
-from typing import Dict, List, Any, Set
+import os
+import zipfile
+import tarfile
+import multiprocessing
+from typing import Dict, List, Any, Set, Optional, Iterator, Tuple, Union
 from pathlib import Path
 
+try:
+    import pandas as pd
+except ImportError:  # pandas là phụ thuộc tùy chọn
+    pd = None
+
+from .utils import (ParseCache, ResultCache, shared_parse_cache,
+                   function_index)
+from .ast_rules import ASTRule, RuleSpec, resolve_rules, build_dispatch
+
+
+class ASTAnalyzer:
+    """
+    Phân tích AST trong một lượt duyệt duy nhất
+    
+    Gộp các chỉ số độ phức tạp, cấu trúc, đặt tên và documentation (chỉ
+    các nhóm được bật) vào một lần duyệt cây. Decorator và list
+    comprehension chỉ được giữ lại dưới dạng node; ast.unparse chỉ chạy
+    khi cần văn bản (thuộc tính decorators, list_comprehensions). Kết quả
+    lưu lâu dài được detach() để không giữ node AST.
+    
+    Các quy tắc plugin (ASTRule) được gọi trong cùng lượt duyệt qua bảng
+    dispatch theo kiểu node, nên thêm quy tắc không thêm lượt duyệt.
+    """
+    
+    def __init__(self, complexity: bool = True, structure: bool = True,
+                 naming: bool = True, docs: bool = True,
+                 rules: Tuple[ASTRule, ...] = ()):
+        """
+        Khởi tạo analyzer
+        
+        Args:
+            complexity: Tính độ phức tạp McCabe từng hàm
+            structure: Đếm các thành phần cấu trúc
+            naming: Kiểm tra quy tắc đặt tên
+            docs: Thu thập docstring
+            rules: Các quy tắc plugin cần chạy (xem ast_rules)
+        """
+        self.complexity = complexity
+        self.structure = structure
+        self.naming = naming
+        self.docs = docs
+        self.rules = tuple(rules)
+        self._dispatch = build_dispatch(self.rules)
+        self.tree = None
+        
+        # Độ phức tạp
+        self.function_complexities = {}
+        self.function_details = []
+        self._complexity = 1
+        
+        # Cấu trúc
+        self.functions = []
+        self.classes = []
+        self.loops = []
+        self.conditionals = 0
+        self.context_managers = 0
+        self.imports = []
+        self.decorator_nodes = []
+        self.list_comprehension_nodes = []
+        
+        # Đặt tên
+        self.naming_violations = []
+        self.total_names = 0
+        
+        # Documentation
+        self.doc_functions = []
+        self.doc_classes = []
+        
+        # Quy tắc plugin
+        self.rule_violations = []
+    
+    @property
+    def decorators(self) -> List[str]:
+        """Văn bản các decorator (unparse khi được gọi)"""
+        return [self.node_text(node) for node in self.decorator_nodes]
+    
+    @property
+    def list_comprehensions(self) -> List[str]:
+        """Văn bản các list comprehension (unparse khi được gọi)"""
+        return [self.node_text(node)
+                for node in self.list_comprehension_nodes]
+    
+    @staticmethod
+    def node_text(node: Union[ast.AST, str]) -> str:
+        """Văn bản của node (node đã detach được lưu sẵn dạng văn bản)"""
+        return node if isinstance(node, str) else ast.unparse(node)
+    
+    def run(self, tree: ast.AST) -> 'ASTAnalyzer':
+        """Duyệt cây và trả về chính analyzer"""
+        self.tree = tree
+        self.visit(tree)
+        return self
+    
+    def extend(self, other: 'ASTAnalyzer',
+               line_offset: int = 0) -> 'ASTAnalyzer':
+        """
+        Gộp kết quả phân tích một phần cây vào analyzer này
+        
+        Gộp theo thứ tự câu lệnh cho kết quả giống hệt một lượt duyệt cả
+        cây.
+        
+        Args:
+            other: Analyzer đã chạy trên một câu lệnh cấp module
+            line_offset: Cộng vào số dòng của vi phạm đặt tên và của hàm
+        """
+        self.function_complexities.update(other.function_complexities)
+        self.function_details.extend(
+            self.shift_lines(other.function_details, line_offset))
+        self.functions.extend(other.functions)
+        self.classes.extend(other.classes)
+        self.loops.extend(other.loops)
+        self.conditionals += other.conditionals
+        self.context_managers += other.context_managers
+        self.imports.extend(other.imports)
+        self.decorator_nodes.extend(other.decorator_nodes)
+        self.list_comprehension_nodes.extend(other.list_comprehension_nodes)
+        self.naming_violations.extend(
+            self.shift_lines(other.naming_violations, line_offset))
+        self.total_names += other.total_names
+        self.doc_functions.extend(other.doc_functions)
+        self.doc_classes.extend(other.doc_classes)
+        self.rule_violations.extend(
+            self.shift_lines(other.rule_violations, line_offset))
+        return self
+    
+    def detach(self) -> 'ASTAnalyzer':
+        """
+        Bỏ mọi tham chiếu tới AST (để cache lâu dài)
+        
+        Cây được bỏ, các node decorator/list comprehension được thay bằng
+        văn bản; các chỉ số khác vốn chỉ là số và chuỗi.
+        """
+        self.tree = None
+        self.decorator_nodes = [self.node_text(node)
+                                for node in self.decorator_nodes]
+        self.list_comprehension_nodes = [
+            self.node_text(node) for node in self.list_comprehension_nodes]
+        return self
+    
+    def make_relative(self, base_line: int) -> 'ASTAnalyzer':
+        """Đổi số dòng thành tương đối so với base_line (để cache theo hàm)"""
+        self.naming_violations = self.shift_lines(self.naming_violations,
+                                                  -base_line)
+        self.function_details = self.shift_lines(self.function_details,
+                                                 -base_line)
+        self.rule_violations = self.shift_lines(self.rule_violations,
+                                                -base_line)
+        return self
+    
+    @staticmethod
+    def shift_lines(entries: List[Dict[str, Any]],
+                    offset: int) -> List[Dict[str, Any]]:
+        """Bản sao các mục với 'line' cộng thêm offset"""
+        if not offset:
+            return list(entries)
+        return [dict(entry, line=entry['line'] + offset)
+                if entry['line'] is not None else entry
+                for entry in entries]
+    
+    def check_name(self, name: str, node_type: str, lineno: int):
+        """Kiểm tra PascalCase (class) hoặc snake_case (hàm, biến)"""
+        self.total_names += 1
+        if node_type == 'class':
+            # Classes should be PascalCase
+            if not re.match(r'^[A-Z][a-zA-Z0-9]*$', name):
+                self.naming_violations.append({
+                    'name': name,
+                    'type': node_type,
+                    'line': lineno,
+                    'issue': 'Should be PascalCase'
+                })
+        else:
+            # Functions and variables should be snake_case
+            if not re.match(r'^[a-z_][a-z0-9_]*$', name):
+                self.naming_violations.append({
+                    'name': name,
+                    'type': node_type,
+                    'line': lineno,
+                    'issue': 'Should be snake_case'
+                })
+    
+    @staticmethod
+    def doc_entry(node) -> Dict[str, Any]:
+        """Thông tin docstring của hàm/class"""
+        docstring = ast.get_docstring(node)
+        return {
+            'name': node.name,
+            'has_docstring': docstring is not None,
+            'docstring_length': len(docstring) if docstring else 0
+        }
+    
+    def visit(self, node: ast.AST):
+        """Xử lý một node rồi duyệt các node con"""
+        node_type = type(node)
+        
+        if self._dispatch:
+            handlers = self._dispatch.get(node_type)
+            if handlers:
+                for rule in handlers:
+                    message = rule.check(node)
+                    if message:
+                        self.rule_violations.append({
+                            'rule': rule.name,
+                            'line': getattr(node, 'lineno', None),
+                            'message': message
+                        })
+        
+        if node_type is ast.FunctionDef:
+            self.visit_function(node)
+            return
+        
+        if node_type is ast.ClassDef:
+            if self.naming:
+                self.check_name(node.name, 'class', node.lineno)
+            if self.structure:
+                self.classes.append(node.name)
+            if self.docs:
+                self.doc_classes.append(self.doc_entry(node))
+        elif node_type is ast.If:
+            self._complexity += 1
+            self.conditionals += 1
+        elif node_type is ast.For:
+            self._complexity += 1
+            self.loops.append('for')
+        elif node_type is ast.While:
+            self._complexity += 1
+            self.loops.append('while')
+        elif node_type is ast.ExceptHandler:
+            self._complexity += 1
+        elif node_type is ast.BoolOp:
+            self._complexity += len(node.values) - 1
+        elif node_type is ast.ListComp:
+            if self.structure:
+                self.list_comprehension_nodes.append(node)
+        elif node_type is ast.With:
+            self.context_managers += 1
+        elif node_type is ast.Import:
+            self.imports.extend(alias.name for alias in node.names)
+            if not self._dispatch:
+                return
+        elif node_type is ast.ImportFrom:
+            self.imports.append(node.module)
+            if not self._dispatch:
+                return
+        elif node_type is ast.Name:
+            if self.naming and isinstance(node.ctx, ast.Store):
+                self.check_name(node.id, 'variable', node.lineno)
+        
+        for child in ast.iter_child_nodes(node):
+            self.visit(child)
+    
+    def visit_function(self, node: ast.FunctionDef):
+        """Hàm: đặt tên, cấu trúc, docstring và độ phức tạp riêng"""
+        # Mọi chỉ số của một hàm nằm trong cùng một mục function_details
+        # (thứ tự trước-sau như doc_functions), kể cả với hàm lồng nhau
+        detail = {'name': node.name, 'line': node.lineno}
+        if self.naming:
+            violations = len(self.naming_violations)
+            self.check_name(node.name, 'function', node.lineno)
+            detail['name_compliant'] = len(self.naming_violations) == violations
+        if self.structure:
+            self.functions.append(node.name)
+            self.decorator_nodes.extend(node.decorator_list)
+        if self.docs:
+            doc = self.doc_entry(node)
+            self.doc_functions.append(doc)
+            detail['has_docstring'] = doc['has_docstring']
+            detail['docstring_length'] = doc['docstring_length']
+        if self.complexity:
+            self.function_details.append(detail)
+        
+        outer_complexity = self._complexity
+        self._complexity = 1
+        for child in ast.iter_child_nodes(node):
+            self.visit(child)
+        if self.complexity:
+            self.function_complexities[node.name] = self._complexity
+            detail['complexity'] = self._complexity
+        self._complexity = outer_complexity
+
 
 class ASTGrader:
     """Lớp chấm điểm dựa trên phân tích AST"""
     
-    def __init__(self, student_file: str):
+    def __init__(self, student_file: str,
+                 parse_cache: Optional[ParseCache] = None,
+                 incremental_cache: Optional[ResultCache] = None):
         """
         Khởi tạo AST grader
         
         Args:
             student_file: Đường dẫn đến file code sinh viên
+            parse_cache: Cache AST dùng chung (mặc định cache của tiến trình)
+            incremental_cache: Bật phân tích tăng dần (ví dụ
+                shared_result_cache): chỉ số của từng hàm/câu lệnh cấp
+                module được cache theo digest mã của nó, bài nộp lại chỉ
+                phân tích các phần đã thay đổi
         """
         self.student_file = student_file
+        self.parse_cache = (parse_cache if parse_cache is not None
+                            else shared_parse_cache)
+        self.incremental_cache = incremental_cache
+        self.incremental_stats = None
         self.tree = None
         self.code = None
+        self.analysis = None
         
     def load_and_parse(self) -> bool:
-        """Đọc và parse file Python"""
+        """Đọc và parse file Python (AST lấy từ parse_cache, không sửa đổi)"""
         try:
             with open(self.student_file, 'r', encoding='utf-8') as f:
                 self.code = f.read()
-            self.tree = ast.parse(self.code)
+            self.tree = self.parse_cache.parse(self.code)
+            self.analysis = None
             return True
         except SyntaxError as e:
             print(f"Lỗi cú pháp: {e}")
@@ -37,6 +334,122 @@ def load_and_parse(self) -> bool:
             print(f"Lỗi: {e}")
             return False
     
+    def analyze(self, complexity: bool = True, structure: bool = True,
+                naming: bool = True, docs: bool = True,
+                rules: Optional[RuleSpec] = None) -> ASTAnalyzer:
+        """
+        Chạy một lượt phân tích gộp cho các nhóm kiểm tra được bật
+        
+        Kết quả được giữ trong self.analysis để các hàm check_* dùng lại,
+        và được cache trong parse_cache theo nội dung file.
+        
+        Args:
+            rules: Bộ quy tắc plugin chạy cùng lượt duyệt (tên bộ quy tắc,
+                tên quy tắc hoặc instance ASTRule; xem ast_rules)
+        
+        Returns:
+            ASTAnalyzer đã duyệt cây
+        """
+        resolved = resolve_rules(rules) if rules is not None else ()
+        self.analysis = self._cached_analysis(complexity, structure, naming,
+                                              docs, resolved)
+        return self.analysis
+    
+    def _cached_analysis(self, complexity: bool, structure: bool,
+                         naming: bool, docs: bool,
+                         rules: Tuple[ASTRule, ...] = ()) -> ASTAnalyzer:
+        """Kết quả phân tích từ parse_cache (chạy ASTAnalyzer nếu chưa có)"""
+        options = (complexity, structure, naming, docs, rules)
+        if self.code is None:
+            return ASTAnalyzer(*options).run(self.tree)
+        if self.incremental_cache is None:
+            return self.parse_cache.artifact(
+                self.code, ('ast_analysis',) + options,
+                lambda tree: ASTAnalyzer(*options).run(tree))
+        
+        self.incremental_stats = None
+        analysis = self.parse_cache.artifact(
+            self.code, ('ast_analysis', 'incremental') + options,
+            lambda tree: self._incremental_analysis(options))
+        if self.incremental_stats is None:
+            # Cả file không đổi: mọi đơn vị đều dùng lại
+            units = function_index(self.code, self.parse_cache).units
+            self.incremental_stats = {'reused': len(units), 'analyzed': 0}
+        return analysis
+    
+    def _incremental_analysis(self, options: tuple) -> ASTAnalyzer:
+        """
+        Phân tích từng câu lệnh cấp module, dùng lại kết quả đã cache
+        
+        Kết quả của mỗi câu lệnh được lưu với số dòng tương đối so với
+        câu lệnh, nên hàm không đổi vẫn dùng lại được khi bị dời vị trí,
+        và không giữ node AST (detach) để cache không giữ cây của bài nộp.
+        """
+        analysis = ASTAnalyzer(*options)
+        analysis.tree = self.tree
+        stats = {'reused': 0, 'analyzed': 0}
+        
+        for _, stmt, digest in function_index(self.code, self.parse_cache).units:
+            key = ('ast_unit', options, digest)
+            unit = self.incremental_cache.get(key)
+            if unit is None:
+                unit = (ASTAnalyzer(*options).run(stmt)
+                        .make_relative(stmt.lineno).detach())
+                self.incremental_cache.put(key, unit)
+                stats['analyzed'] += 1
+            else:
+                stats['reused'] += 1
+            analysis.extend(unit, line_offset=stmt.lineno)
+        
+        self.incremental_stats = stats
+        return analysis
+    
+    def analysis_for(self, check: str) -> ASTAnalyzer:
+        """
+        Lấy kết quả phân tích có nhóm check (dùng lại nếu đã có)
+        
+        Args:
+            check: 'complexity', 'structure', 'naming' hoặc 'docs'
+        """
+        analysis = self.analysis
+        if (analysis is not None and analysis.tree is self.tree
+                and getattr(analysis, check)):
+            return analysis
+        options = [name == check
+                   for name in ('complexity', 'structure', 'naming', 'docs')]
+        return self._cached_analysis(*options)
+    
+    def check_rules(self, rules: RuleSpec = 'default') -> Dict[str, Any]:
+        """
+        Kiểm tra các quy tắc plugin (phong cách, cấu trúc)
+        
+        Args:
+            rules: Tên bộ quy tắc trong RULE_SETS (mặc định 'default'), tên
+                quy tắc đã đăng ký, instance ASTRule hoặc danh sách
+            
+        Returns:
+            Dictionary chứa kết quả
+        """
+        resolved = resolve_rules(rules)
+        analysis = self.analysis
+        if (analysis is None or analysis.tree is not self.tree
+                or analysis.rules != resolved):
+            analysis = self._cached_analysis(False, False, False, False,
+                                             resolved)
+        violations = [dict(violation) for violation in analysis.rule_violations]
+        
+        by_rule = {rule.name: 0 for rule in resolved}
+        for violation in violations:
+            by_rule[violation['rule']] += 1
+        
+        return {
+            'passed': len(violations) == 0,
+            'score': max(0, 10 - len(violations)),
+            'rules': [rule.name for rule in resolved],
+            'by_rule': by_rule,
+            'violations': violations
+        }
+    
     def check_complexity(self, max_complexity: int = 10) -> Dict[str, Any]:
         """
         Kiểm tra độ phức tạp McCabe Cyclomatic
@@ -47,57 +460,19 @@ def check_complexity(self, max_complexity: int = 10) -> Dict[str, Any]:
         Returns:
             Dictionary chứa kết quả
         """
-        class ComplexityVisitor(ast.NodeVisitor):
-            def __init__(self):
-                self.complexity = 1
-                self.function_complexities = {}
-                self.current_function = None
-                
-            def visit_FunctionDef(self, node):
-                old_func = self.current_function
-                old_complexity = self.complexity
-                
-                self.current_function = node.name
-                self.complexity = 1
-                self.generic_visit(node)
-                
-                self.function_complexities[node.name] = self.complexity
-                
-                self.current_function = old_func
-                self.complexity = old_complexity
-                
-            def visit_If(self, node):
-                self.complexity += 1
-                self.generic_visit(node)
-            
-            def visit_While(self, node):
-                self.complexity += 1
-                self.generic_visit(node)
-            
-            def visit_For(self, node):
-                self.complexity += 1
-                self.generic_visit(node)
-            
-            def visit_ExceptHandler(self, node):
-                self.complexity += 1
-                self.generic_visit(node)
-            
-            def visit_BoolOp(self, node):
-                self.complexity += len(node.values) - 1
-                self.generic_visit(node)
-        
-        visitor = ComplexityVisitor()
-        visitor.visit(self.tree)
+        # Bản sao: analysis nằm trong cache dùng chung
+        function_complexities = dict(
+            self.analysis_for('complexity').function_complexities)
         
         violations = {
             func: comp 
-            for func, comp in visitor.function_complexities.items() 
+            for func, comp in function_complexities.items() 
             if comp > max_complexity
         }
         
-        avg_complexity = (sum(visitor.function_complexities.values()) / 
-                         len(visitor.function_complexities) 
-                         if visitor.function_complexities else 0)
+        avg_complexity = (sum(function_complexities.values()) / 
+                         len(function_complexities) 
+                         if function_complexities else 0)
         
         passed = len(violations) == 0
         score = max(0, 10 - len(violations) * 2)
@@ -106,7 +481,7 @@ def visit_BoolOp(self, node):
             'passed': passed,
             'score': score,
             'average_complexity': avg_complexity,
-            'function_complexities': visitor.function_complexities,
+            'function_complexities': function_complexities,
             'violations': violations
         }
     
@@ -120,67 +495,17 @@ def check_code_structure(self, requirements: Dict[str, int]) -> Dict[str, Any]:
         Returns:
             Dictionary chứa kết quả
         """
-        class StructureVisitor(ast.NodeVisitor):
-            def __init__(self):
-                self.functions = []
-                self.classes = []
-                self.loops = []
-                self.conditionals = []
-                self.list_comprehensions = []
-                self.decorators = []
-                self.context_managers = []
-                self.imports = []
-                
-            def visit_FunctionDef(self, node):
-                self.functions.append(node.name)
-                if node.decorator_list:
-                    self.decorators.extend([
-                        ast.unparse(d) for d in node.decorator_list
-                    ])
-                self.generic_visit(node)
-            
-            def visit_ClassDef(self, node):
-                self.classes.append(node.name)
-                self.generic_visit(node)
-            
-            def visit_For(self, node):
-                self.loops.append('for')
-                self.generic_visit(node)
-            
-            def visit_While(self, node):
-                self.loops.append('while')
-                self.generic_visit(node)
-            
-            def visit_If(self, node):
-                self.conditionals.append('if')
-                self.generic_visit(node)
-            
-            def visit_ListComp(self, node):
-                self.list_comprehensions.append(ast.unparse(node))
-                self.generic_visit(node)
-            
-            def visit_With(self, node):
-                self.context_managers.append('with')
-                self.generic_visit(node)
-            
-            def visit_Import(self, node):
-                self.imports.extend([alias.name for alias in node.names])
-            
-            def visit_ImportFrom(self, node):
-                self.imports.append(node.module)
-        
-        visitor = StructureVisitor()
-        visitor.visit(self.tree)
+        analysis = self.analysis_for('structure')
         
         found = {
-            'functions': len(visitor.functions),
-            'classes': len(visitor.classes),
-            'loops': len(visitor.loops),
-            'conditionals': len(visitor.conditionals),
-            'list_comprehensions': len(visitor.list_comprehensions),
-            'decorators': len(visitor.decorators),
-            'context_managers': len(visitor.context_managers),
-            'imports': len(visitor.imports)
+            'functions': len(analysis.functions),
+            'classes': len(analysis.classes),
+            'loops': len(analysis.loops),
+            'conditionals': analysis.conditionals,
+            'list_comprehensions': len(analysis.list_comprehension_nodes),
+            'decorators': len(analysis.decorator_nodes),
+            'context_managers': analysis.context_managers,
+            'imports': len(analysis.imports)
         }
         
         violations = []
@@ -208,8 +533,8 @@ def visit_ImportFrom(self, node):
             'found': found,
             'violations': violations,
             'details': {
-                'function_names': visitor.functions,
-                'class_names': visitor.classes
+                'function_names': list(analysis.functions),
+                'class_names': list(analysis.classes)
             }
         }
     
@@ -220,60 +545,22 @@ def check_naming_conventions(self) -> Dict[str, Any]:
         Returns:
             Dictionary chứa kết quả
         """
-        class NamingVisitor(ast.NodeVisitor):
-            def __init__(self):
-                self.violations = []
-                self.total_names = 0
-                
-            def check_snake_case(self, name: str, node_type: str, lineno: int):
-                self.total_names += 1
-                if node_type == 'class':
-                    # Classes should be PascalCase
-                    if not re.match(r'^[A-Z][a-zA-Z0-9]*$', name):
-                        self.violations.append({
-                            'name': name,
-                            'type': node_type,
-                            'line': lineno,
-                            'issue': 'Should be PascalCase'
-                        })
-                else:
-                    # Functions and variables should be snake_case
-                    if not re.match(r'^[a-z_][a-z0-9_]*$', name):
-                        self.violations.append({
-                            'name': name,
-                            'type': node_type,
-                            'line': lineno,
-                            'issue': 'Should be snake_case'
-                        })
-            
-            def visit_FunctionDef(self, node):
-                self.check_snake_case(node.name, 'function', node.lineno)
-                self.generic_visit(node)
-            
-            def visit_ClassDef(self, node):
-                self.check_snake_case(node.name, 'class', node.lineno)
-                self.generic_visit(node)
-            
-            def visit_Name(self, node):
-                if isinstance(node.ctx, ast.Store):
-                    self.check_snake_case(node.id, 'variable', node.lineno)
-                self.generic_visit(node)
-        
-        visitor = NamingVisitor()
-        visitor.visit(self.tree)
+        analysis = self.analysis_for('naming')
+        violations = [dict(violation) for violation in analysis.naming_violations]
+        total_names = analysis.total_names
         
         compliance_rate = (
-            1 - (len(visitor.violations) / visitor.total_names)
-            if visitor.total_names > 0 else 1
+            1 - (len(violations) / total_names)
+            if total_names > 0 else 1
         )
         score = compliance_rate * 10
         
         return {
-            'passed': len(visitor.violations) == 0,
+            'passed': len(violations) == 0,
             'score': score,
             'compliance_rate': compliance_rate,
-            'total_names': visitor.total_names,
-            'violations': visitor.violations
+            'total_names': total_names,
+            'violations': violations
         }
     
     def check_documentation(self) -> Dict[str, Any]:
@@ -283,35 +570,13 @@ def check_documentation(self) -> Dict[str, Any]:
         Returns:
             Dictionary chứa kết quả
         """
-        class DocVisitor(ast.NodeVisitor):
-            def __init__(self):
-                self.functions = []
-                self.classes = []
-                
-            def visit_FunctionDef(self, node):
-                docstring = ast.get_docstring(node)
-                self.functions.append({
-                    'name': node.name,
-                    'has_docstring': docstring is not None,
-                    'docstring_length': len(docstring) if docstring else 0
-                })
-                self.generic_visit(node)
-            
-            def visit_ClassDef(self, node):
-                docstring = ast.get_docstring(node)
-                self.classes.append({
-                    'name': node.name,
-                    'has_docstring': docstring is not None,
-                    'docstring_length': len(docstring) if docstring else 0
-                })
-                self.generic_visit(node)
-        
-        visitor = DocVisitor()
-        visitor.visit(self.tree)
+        analysis = self.analysis_for('docs')
+        functions = [dict(item) for item in analysis.doc_functions]
+        classes = [dict(item) for item in analysis.doc_classes]
         
-        total_items = len(visitor.functions) + len(visitor.classes)
+        total_items = len(functions) + len(classes)
         documented_items = sum(
-            1 for item in visitor.functions + visitor.classes 
+            1 for item in functions + classes 
             if item['has_docstring']
         )
         
@@ -319,7 +584,7 @@ def visit_ClassDef(self, node):
             coverage = documented_items / total_items
             avg_length = sum(
                 item['docstring_length'] 
-                for item in visitor.functions + visitor.classes 
+                for item in functions + classes 
                 if item['has_docstring']
             ) / documented_items if documented_items > 0 else 0
             
@@ -339,8 +604,8 @@ def visit_ClassDef(self, node):
             'documented': documented_items,
             'total': total_items,
             'details': {
-                'functions': visitor.functions,
-                'classes': visitor.classes
+                'functions': functions,
+                'classes': classes
             }
         }
     
@@ -350,7 +615,8 @@ def grade(self,
               check_naming: bool = True,
               check_docs: bool = True,
               structure_requirements: Dict[str, int] = None,
-              max_complexity: int = 10) -> Dict[str, Any]:
+              max_complexity: int = 10,
+              rules: Optional[RuleSpec] = None) -> Dict[str, Any]:
         """
         Chấm điểm toàn diện
         
@@ -361,6 +627,8 @@ def grade(self,
             check_docs: Kiểm tra documentation
             structure_requirements: Yêu cầu về cấu trúc
             max_complexity: Độ phức tạp tối đa
+            rules: Bộ quy tắc plugin của bài tập (ví dụ 'default', 'strict'
+                hoặc danh sách tên quy tắc); None = không kiểm tra
             
         Returns:
             Kết quả chấm điểm chi tiết
@@ -375,6 +643,12 @@ def grade(self,
         total_score = 0
         total_weight = 0
         
+        # Một lượt duyệt cho mọi nhóm kiểm tra được bật
+        self.analyze(complexity=check_complexity,
+                     structure=bool(check_structure and structure_requirements),
+                     naming=check_naming, docs=check_docs, rules=rules)
+        incremental = self.incremental_stats
+        
         if check_complexity:
             results['complexity'] = self.check_complexity(max_complexity)
             total_score += results['complexity']['score'] * 0.25
@@ -395,13 +669,174 @@ def grade(self,
             total_score += results['documentation']['score'] * 0.25
             total_weight += 0.25
         
+        if rules is not None:
+            results['rules'] = self.check_rules(rules)
+            total_score += results['rules']['score'] * 0.25
+            total_weight += 0.25
+        
         final_score = total_score / total_weight if total_weight > 0 else 0
         
-        return {
+        result = {
             'score': round(final_score, 2),
             'max_score': 10.0,
             'results': results
         }
+        if self.incremental_cache is not None:
+            result['incremental'] = incremental
+        return result
+
+
+FILE_METRIC_COLUMNS = [
+    'file', 'error', 'functions', 'classes', 'loops', 'conditionals',
+    'list_comprehensions', 'decorators', 'context_managers', 'imports',
+    'max_complexity', 'average_complexity', 'total_names',
+    'naming_violations', 'naming_compliance', 'documented', 'doc_total',
+    'doc_coverage'
+]
+
+FUNCTION_METRIC_COLUMNS = [
+    'file', 'function', 'line', 'complexity', 'name_compliant',
+    'has_docstring', 'docstring_length'
+]
+
+
+def cohort_sources(source: str,
+                   pattern: str = '*.py') -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Liệt kê các file Python của một lớp (thư mục, file .zip hoặc .tar*)
+    
+    Args:
+        source: Đường dẫn thư mục hoặc archive
+        pattern: Mẫu tên file cần phân tích
+        
+    Yields:
+        (tên file, đường dẫn hoặc None, mã nguồn hoặc None). Với thư mục,
+        mã nguồn được đọc trong tiến trình worker.
+    """
+    if os.path.isdir(source):
+        for path in sorted(Path(source).rglob(pattern)):
+            if path.is_file():
+                yield str(path.relative_to(source)), str(path), None
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in sorted(archive.namelist()):
+                if Path(name).match(pattern) and not name.endswith('/'):
+                    yield name, None, archive.read(name).decode('utf-8', 'replace')
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            members = sorted((m for m in archive.getmembers()
+                              if m.isfile() and Path(m.name).match(pattern)),
+                             key=lambda m: m.name)
+            for member in members:
+                data = archive.extractfile(member).read()
+                yield member.name, None, data.decode('utf-8', 'replace')
+    else:
+        raise ValueError(f"Not a directory or archive: {source}")
+
+
+def file_metrics(item: Tuple[str, Optional[str], Optional[str]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Chỉ số AST của một file (chạy trong tiến trình worker)
+    
+    Args:
+        item: Phần tử từ cohort_sources()
+        
+    Returns:
+        (dòng chỉ số của file, danh sách dòng chỉ số từng hàm)
+    """
+    name, path, code = item
+    row = dict.fromkeys(FILE_METRIC_COLUMNS)
+    row['file'] = name
+    try:
+        if code is None:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                code = f.read()
+        analysis = ASTAnalyzer().run(shared_parse_cache.parse(code))
+    except (OSError, SyntaxError, ValueError) as e:
+        row['error'] = str(e)
+        return row, []
+    
+    complexities = [detail['complexity'] for detail in analysis.function_details]
+    documented = sum(1 for item in analysis.doc_functions + analysis.doc_classes
+                     if item['has_docstring'])
+    doc_total = len(analysis.doc_functions) + len(analysis.doc_classes)
+    violations = len(analysis.naming_violations)
+    row.update({
+        'functions': len(analysis.functions),
+        'classes': len(analysis.classes),
+        'loops': len(analysis.loops),
+        'conditionals': analysis.conditionals,
+        'list_comprehensions': len(analysis.list_comprehension_nodes),
+        'decorators': len(analysis.decorator_nodes),
+        'context_managers': analysis.context_managers,
+        'imports': len(analysis.imports),
+        'max_complexity': max(complexities, default=0),
+        'average_complexity': (sum(complexities) / len(complexities)
+                               if complexities else 0.0),
+        'total_names': analysis.total_names,
+        'naming_violations': violations,
+        'naming_compliance': (1 - violations / analysis.total_names
+                              if analysis.total_names > 0 else 1.0),
+        'documented': documented,
+        'doc_total': doc_total,
+        'doc_coverage': documented / doc_total if doc_total > 0 else 0.0
+    })
+    
+    functions = [
+        {
+            'file': name,
+            'function': detail['name'],
+            'line': detail['line'],
+            'complexity': detail['complexity'],
+            'name_compliant': detail['name_compliant'],
+            'has_docstring': detail['has_docstring'],
+            'docstring_length': detail['docstring_length']
+        }
+        for detail in analysis.function_details
+    ]
+    return row, functions
+
+
+def analyze_cohort(source: str, workers: Optional[int] = None,
+                   pattern: str = '*.py', chunksize: int = 8) -> Dict[str, Any]:
+    """
+    Phân tích AST cả lớp song song, trả về bảng dạng cột
+    
+    Mỗi file được phân tích bằng ASTAnalyzer (một lượt duyệt) trong một
+    process pool. Kết quả là hai DataFrame nên các truy vấn ngưỡng trên
+    cả lớp là một biểu thức vector hóa, ví dụ
+    ``functions[functions.complexity > 10]``.
+    
+    Args:
+        source: Thư mục hoặc archive (.zip, .tar, .tar.gz) chứa bài nộp
+        workers: Số tiến trình (mặc định số CPU; 1 = chạy tuần tự)
+        pattern: Mẫu tên file cần phân tích
+        chunksize: Số file gửi cho worker mỗi lần
+        
+    Returns:
+        Dictionary với 'files' (một dòng mỗi file, cột 'error' khác None
+        nếu không parse được) và 'functions' (một dòng mỗi hàm)
+    """
+    if pd is None:
+        raise ImportError("analyze_cohort requires pandas")
+    
+    items = list(cohort_sources(source, pattern))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(items)))
+    
+    if workers == 1:
+        results = [file_metrics(item) for item in items]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(file_metrics, items, chunksize=chunksize)
+    
+    files = [row for row, _ in results]
+    functions = [function for _, rows in results for function in rows]
+    return {
+        'files': pd.DataFrame(files, columns=FILE_METRIC_COLUMNS),
+        'functions': pd.DataFrame(functions, columns=FUNCTION_METRIC_COLUMNS)
+    }
 
 
 ### Thử nghiệm
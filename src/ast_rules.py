@@ -0,0 +1,228 @@
+"""
+AST Rules - Bộ quy tắc kiểm tra AST dạng plugin
+Mỗi quy tắc khai báo các kiểu node nó quan tâm; ASTAnalyzer gọi quy tắc
+ngay trong lượt duyệt cây duy nhất của nó
+"""
+
+import ast
+from typing import Dict, List, Optional, Tuple, Union, Iterable
+
+
+class ASTRule:
+    """
+    Lớp cơ sở cho một quy tắc kiểm tra AST
+    
+    Lớp con đặt name, node_types và cài đặt check(node). check() chỉ được
+    gọi cho các node có kiểu nằm trong node_types và trả về thông điệp vi
+    phạm (hoặc None). Quy tắc không giữ trạng thái giữa các node, nên kết
+    quả có thể cache theo nội dung file hoặc theo từng hàm.
+    """
+    
+    name = ''
+    description = ''
+    node_types: Tuple[type, ...] = ()
+    
+    def __init__(self, **options):
+        """
+        Khởi tạo quy tắc
+        
+        Args:
+            **options: Tham số cấu hình của quy tắc (ví dụ max_args=5)
+        """
+        self.options = options
+    
+    @property
+    def key(self) -> Tuple:
+        """Khóa định danh quy tắc cùng cấu hình (dùng cho cache)"""
+        return (type(self).__name__, self.name,
+                tuple(sorted(self.options.items())))
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ASTRule) and self.key == other.key
+    
+    def __hash__(self) -> int:
+        return hash(self.key)
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+    
+    def check(self, node: ast.AST) -> Optional[str]:
+        """
+        Kiểm tra một node
+        
+        Args:
+            node: Node có kiểu thuộc node_types
+        
+        Returns:
+            Thông điệp vi phạm, None nếu hợp lệ
+        """
+        raise NotImplementedError
+
+
+# Registry: tên quy tắc -> lớp quy tắc
+RULE_REGISTRY: Dict[str, type] = {}
+
+
+def register_rule(rule_class: type) -> type:
+    """
+    Đăng ký một lớp quy tắc (dùng làm decorator)
+    
+    Args:
+        rule_class: Lớp con của ASTRule có name và node_types
+    
+    Returns:
+        Chính lớp quy tắc
+    """
+    if not rule_class.name or not rule_class.node_types:
+        raise ValueError(f"{rule_class.__name__} must define name and node_types")
+    RULE_REGISTRY[rule_class.name] = rule_class
+    return rule_class
+
+
+@register_rule
+class BareExceptRule(ASTRule):
+    name = 'bare-except'
+    description = "except: không chỉ rõ loại exception"
+    node_types = (ast.ExceptHandler,)
+    
+    def check(self, node):
+        if node.type is None:
+            return "Bare 'except:' catches everything, name the exception"
+
+
+@register_rule
+class MutableDefaultRule(ASTRule):
+    name = 'mutable-default-arg'
+    description = "Giá trị mặc định của tham số là list/dict/set"
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+    
+    MUTABLE = (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp,
+               ast.SetComp)
+    
+    def check(self, node):
+        defaults = node.args.defaults + [d for d in node.args.kw_defaults if d]
+        if any(isinstance(default, self.MUTABLE) for default in defaults):
+            return "Mutable default argument is shared between calls"
+
+
+@register_rule
+class WildcardImportRule(ASTRule):
+    name = 'wildcard-import'
+    description = "from module import *"
+    node_types = (ast.ImportFrom,)
+    
+    def check(self, node):
+        if any(alias.name == '*' for alias in node.names):
+            return f"Wildcard import from {node.module}"
+
+
+@register_rule
+class CompareToNoneRule(ASTRule):
+    name = 'comparison-to-none'
+    description = "So sánh với None bằng == hoặc !="
+    node_types = (ast.Compare,)
+    
+    def check(self, node):
+        for op, right in zip(node.ops, node.comparators):
+            if (isinstance(op, (ast.Eq, ast.NotEq))
+                    and isinstance(right, ast.Constant) and right.value is None):
+                return "Use 'is None' / 'is not None' to compare with None"
+
+
+@register_rule
+class GlobalStatementRule(ASTRule):
+    name = 'global-statement'
+    description = "Dùng câu lệnh global"
+    node_types = (ast.Global,)
+    
+    def check(self, node):
+        return f"Global statement for {', '.join(node.names)}"
+
+
+@register_rule
+class TooManyArgumentsRule(ASTRule):
+    name = 'too-many-arguments'
+    description = "Hàm có quá nhiều tham số (max_args, mặc định 5)"
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+    
+    def check(self, node):
+        max_args = self.options.get('max_args', 5)
+        args = node.args
+        count = len(args.posonlyargs) + len(args.args) + len(args.kwonlyargs)
+        if args.args and args.args[0].arg in ('self', 'cls'):
+            count -= 1
+        if count > max_args:
+            return f"{node.name}() takes {count} arguments (max {max_args})"
+
+
+@register_rule
+class PrintCallRule(ASTRule):
+    name = 'print-call'
+    description = "Gọi print() (cho bài yêu cầu trả về giá trị)"
+    node_types = (ast.Call,)
+    
+    def check(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == 'print':
+            return "print() call, return the value instead"
+
+
+# Bộ quy tắc chọn theo bài tập
+RULE_SETS: Dict[str, List[str]] = {
+    'default': ['bare-except', 'mutable-default-arg', 'wildcard-import',
+                'comparison-to-none'],
+    'strict': ['bare-except', 'mutable-default-arg', 'wildcard-import',
+               'comparison-to-none', 'global-statement',
+               'too-many-arguments', 'print-call']
+}
+
+
+RuleSpec = Union[str, ASTRule, Iterable[Union[str, ASTRule]]]
+
+
+def resolve_rules(rules: RuleSpec) -> Tuple[ASTRule, ...]:
+    """
+    Chuyển mô tả bộ quy tắc thành các instance quy tắc
+    
+    Args:
+        rules: Tên bộ quy tắc trong RULE_SETS, tên một quy tắc đã đăng ký,
+            instance ASTRule, hoặc danh sách các giá trị trên
+    
+    Returns:
+        Tuple các quy tắc (không trùng lặp, giữ thứ tự)
+    
+    Raises:
+        KeyError: Nếu tên không phải bộ quy tắc hay quy tắc đã đăng ký
+    """
+    if isinstance(rules, (str, ASTRule)):
+        rules = [rules]
+    
+    resolved = []
+    for rule in rules:
+        if isinstance(rule, ASTRule):
+            candidates = [rule]
+        elif rule in RULE_SETS:
+            candidates = [RULE_REGISTRY[name]() for name in RULE_SETS[rule]]
+        elif rule in RULE_REGISTRY:
+            candidates = [RULE_REGISTRY[rule]()]
+        else:
+            raise KeyError(f"Unknown AST rule or rule set: {rule!r}")
+        resolved.extend(c for c in candidates if c not in resolved)
+    return tuple(resolved)
+
+
+def build_dispatch(rules: Iterable[ASTRule]) -> Dict[type, Tuple[ASTRule, ...]]:
+    """
+    Bảng dispatch kiểu node -> các quy tắc quan tâm
+    
+    Args:
+        rules: Các quy tắc
+    
+    Returns:
+        Dictionary {kiểu node: tuple quy tắc}
+    """
+    dispatch = {}
+    for rule in rules:
+        for node_type in rule.node_types:
+            dispatch.setdefault(node_type, []).append(rule)
+    return {node_type: tuple(handlers)
+            for node_type, handlers in dispatch.items()}
@@ -6,24 +6,77 @@
 import unittest
 import importlib.util
 import sys
-import io
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from contextlib import redirect_stdout, redirect_stderr
 
+from .utils import (FailureRecorder, ResultCache, ParseCache, content_digest,
+                    function_index, shared_parse_cache, truncate_text)
+
+
+class BoundedTestResult(unittest.TestResult):
+    """
+    TestResult chỉ định dạng traceback cho một số mẫu lỗi
+    
+    failures/errors và wasSuccessful() vẫn đầy đủ như unittest.TestResult,
+    nhưng mỗi mục chỉ lưu một dòng tóm tắt (kiểu và thông điệp rút gọn);
+    traceback đầy đủ chỉ được chuyển thành chuỗi cho các mẫu được hiển thị.
+    """
+    
+    def __init__(self, max_samples: int = 5, max_summary_length: int = 200):
+        super().__init__()
+        self.max_summary_length = max_summary_length
+        self.failure_recorder = FailureRecorder(max_samples)
+        self.error_recorder = FailureRecorder(max_samples)
+        self.outcomes = {}
+    
+    def _exc_info_to_string(self, err, test) -> str:
+        """Tóm tắt lỗi lưu trong failures/errors (không có traceback)"""
+        exc_type, exc_value, _ = err
+        message = truncate_text(str(exc_value), self.max_summary_length)
+        return f"{exc_type.__name__}: {message}"
+    
+    def format_error(self, test, err) -> str:
+        """Định dạng test và traceback đầy đủ của nó"""
+        return f"{test}\n{super()._exc_info_to_string(err, test)}"
+    
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self.outcomes[test._testMethodName] = 'passed'
+    
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self.outcomes[test._testMethodName] = 'failure'
+        self.failure_recorder.record(self.format_error, test, err)
+    
+    def addError(self, test, err):
+        super().addError(test, err)
+        self.outcomes[test._testMethodName] = 'error'
+        self.error_recorder.record(self.format_error, test, err)
+
 
 class BasicGrader:
     """Lớp chấm điểm cơ bản sử dụng unittest"""
     
-    def __init__(self, student_file: str):
+    def __init__(self, student_file: str,
+                 incremental_cache: Optional[ResultCache] = None,
+                 parse_cache: Optional[ParseCache] = None):
         """
         Khởi tạo bộ chấm điểm
         
         Args:
             student_file: Đường dẫn đến file code sinh viên
+            incremental_cache: Bật chấm tăng dần (ví dụ shared_result_cache):
+                kết quả mỗi test case được cache theo digest của hàm được
+                test, các hàm nó gọi và mã cấp module; bài nộp lại chỉ chạy
+                lại test của các hàm đã đổi hoặc phụ thuộc phần đã đổi
+            parse_cache: Cache AST dùng chung (mặc định cache của tiến trình)
         """
         self.student_file = student_file
         self.student_module = None
         self.test_results = []
+        self.incremental_cache = incremental_cache
+        self.parse_cache = (parse_cache if parse_cache is not None
+                            else shared_parse_cache)
         
     def load_student_code(self) -> bool:
         """
@@ -96,31 +149,89 @@ def grade(self, test_cases: List[Dict], max_score: float = 10.0) -> Dict[str, An
                 'error': 'Không thể tải code sinh viên'
             }
         
+        # Chấm tăng dần: dùng lại kết quả các test có mã liên quan không đổi
+        cached = {}
+        keys = None
+        pending = test_cases
+        if self.incremental_cache is not None:
+            keys = self.outcome_keys(test_cases)
+            if keys is not None:
+                for i, key in enumerate(keys):
+                    outcome = self.incremental_cache.get(key)
+                    if outcome is not None:
+                        cached[i] = outcome
+                pending = [tc for i, tc in enumerate(test_cases)
+                           if i not in cached]
+        
         # Tạo test class
-        TestClass = self.create_test_class(test_cases)
+        TestClass = self.create_test_class(pending)
         
         # Chạy tests
         suite = unittest.TestLoader().loadTestsFromTestCase(TestClass)
-        runner = unittest.TextTestRunner(stream=io.StringIO(), verbosity=2)
-        result = runner.run(suite)
+        result = BoundedTestResult()
+        suite.run(result)
+        
+        if keys is not None:
+            pending_keys = [key for i, key in enumerate(keys) if i not in cached]
+            for i, (tc, key) in enumerate(zip(pending, pending_keys)):
+                outcome = result.outcomes.get(f"test_{tc['function']}_{i}")
+                if outcome is not None:
+                    self.incremental_cache.put(key, outcome)
+            for i, outcome in cached.items():
+                if outcome != 'passed':
+                    recorder = (result.failure_recorder if outcome == 'failure'
+                                else result.error_recorder)
+                    recorder.record(
+                        f"test_{test_cases[i]['function']}_{i}: {outcome} "
+                        f"(dùng lại kết quả, hàm không đổi)")
         
         # Tính điểm
-        total = result.testsRun
-        passed = total - len(result.failures) - len(result.errors)
+        total = result.testsRun + len(cached)
+        failures = result.failure_recorder.count
+        errors = result.error_recorder.count
+        passed = total - failures - errors
         score = (passed / total) * max_score if total > 0 else 0
         
-        return {
+        grade_result = {
             'score': round(score, 2),
             'max_score': max_score,
             'passed': passed,
             'total': total,
-            'failures': len(result.failures),
-            'errors': len(result.errors),
+            'failures': failures,
+            'errors': errors,
             'details': {
-                'failures': [str(f) for f in result.failures],
-                'errors': [str(e) for e in result.errors]
+                'failures': result.failure_recorder.samples(),
+                'errors': result.error_recorder.samples()
             }
         }
+        if self.incremental_cache is not None:
+            grade_result['incremental'] = {
+                'reused': len(cached),
+                'executed': result.testsRun
+            }
+        return grade_result
+    
+    def outcome_keys(self, test_cases: List[Dict]) -> Optional[List[tuple]]:
+        """
+        Khóa cache kết quả cho từng test case
+        
+        Khóa gồm digest của test case và dependency_digest của hàm được
+        test (hàm, các hàm nó tham chiếu bắc cầu và mã cấp module).
+        
+        Args:
+            test_cases: Danh sách test cases
+            
+        Returns:
+            Danh sách khóa, None nếu không đọc/parse được file
+        """
+        try:
+            with open(self.student_file, 'r', encoding='utf-8') as f:
+                index = function_index(f.read(), self.parse_cache)
+        except (OSError, SyntaxError, ValueError):
+            return None
+        return [('test_outcome', content_digest(tc),
+                 index.dependency_digest(tc['function']))
+                for tc in test_cases]
 
 ### Thử nghiệm
 ##if __name__ == "__main__":
@@ -0,0 +1,226 @@
+"""
+Benchmark Corpus - Kho đầu vào benchmark dùng chung
+Lưu các đầu vào lớn thành file .npy theo từng kích thước; mọi worker
+benchmark memory-map chỉ đọc cùng một file nên không phải pickle/sao chép
+"""
+
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Callable, Tuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ khóa trong tiến trình
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là phụ thuộc tùy chọn
+    np = None
+
+
+class BenchmarkCorpus:
+    """
+    Kho đầu vào benchmark phân tầng theo kích thước
+
+    Mỗi đầu vào (tên, kích thước) là một file .npy trong root_dir, được mô
+    tả trong manifest.json. Khi đọc, file được mở bằng mmap_mode='r': các
+    tiến trình worker dùng chung page cache của hệ điều hành thay vì mỗi
+    worker giữ một bản sao. Chỉ chuyển sang list Python khi hàm cần list.
+    """
+
+    MANIFEST = 'manifest.json'
+    LOCK_FILE = 'manifest.lock'
+
+    # Khóa giữa các luồng cùng tiến trình (và khi không có fcntl)
+    _thread_lock = threading.Lock()
+
+    def __init__(self, root_dir: str):
+        """
+        Khởi tạo corpus
+
+        Args:
+            root_dir: Thư mục chứa các file .npy (tạo mới nếu chưa có)
+        """
+        if np is None:
+            raise ImportError("BenchmarkCorpus requires numpy")
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+        self._manifest = self._read_manifest()
+        self._arrays = {}
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Đọc manifest (rỗng nếu chưa có)"""
+        path = os.path.join(self.root_dir, self.MANIFEST)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        """Ghi manifest (ghi file tạm rồi đổi tên)"""
+        path = os.path.join(self.root_dir, self.MANIFEST)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{self.MANIFEST}.",
+                                        suffix='.tmp', dir=self.root_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def _manifest_lock(self):
+        """
+        Khóa độc quyền cho đọc-sửa-ghi manifest
+
+        Dùng flock trên file khóa trong root_dir để các tiến trình cùng thêm
+        đầu vào không ghi đè mục của nhau.
+        """
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = os.path.join(self.root_dir, self.LOCK_FILE)
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def add(self, name: str, data, size: Optional[int] = None) -> str:
+        """
+        Thêm một đầu vào vào corpus
+
+        Args:
+            name: Tên nhóm đầu vào (ví dụ 'random_ints')
+            data: List hoặc mảng NumPy
+            size: Kích thước dùng để phân tầng (mặc định len(data))
+
+        Returns:
+            Đường dẫn file .npy
+        """
+        array = np.ascontiguousarray(data)
+        if size is None:
+            size = len(array)
+
+        filename = f"{name}__n{size}.npy"
+        path = os.path.join(self.root_dir, filename)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{filename}.",
+                                        suffix='.tmp.npy', dir=self.root_dir)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+        with self._manifest_lock():
+            self._manifest = self._read_manifest()
+            self._manifest.setdefault(name, {})[str(size)] = {
+                'file': filename,
+                'dtype': str(array.dtype),
+                'shape': list(array.shape)
+            }
+            self._write_manifest()
+        self._arrays.pop((name, size), None)
+        return path
+
+    def generate(self, name: str, generator: Callable[[int], Any],
+                 sizes: List[int]) -> List[int]:
+        """
+        Sinh và lưu đầu vào cho nhiều kích thước
+
+        Args:
+            name: Tên nhóm đầu vào
+            generator: Hàm nhận kích thước n, trả về dữ liệu
+            sizes: Các kích thước cần sinh
+
+        Returns:
+            Danh sách kích thước đã lưu
+        """
+        for size in sizes:
+            self.add(name, generator(size), size)
+        return self.sizes(name)
+
+    def names(self) -> List[str]:
+        """Tên các nhóm đầu vào"""
+        return sorted(self._manifest)
+
+    def sizes(self, name: str) -> List[int]:
+        """Các kích thước đã lưu của một nhóm, tăng dần"""
+        return sorted(int(size) for size in self._manifest.get(name, {}))
+
+    def load(self, name: str, size: int):
+        """
+        Mở một đầu vào dưới dạng memmap chỉ đọc
+
+        Args:
+            name: Tên nhóm đầu vào
+            size: Kích thước
+
+        Returns:
+            np.memmap chỉ đọc (dùng chung giữa các lần gọi)
+        """
+        key = (name, size)
+        if key not in self._arrays:
+            entry = self._manifest.get(name, {}).get(str(size))
+            if entry is None:
+                # Có thể tiến trình khác vừa thêm đầu vào
+                self._manifest = self._read_manifest()
+                entry = self._manifest.get(name, {}).get(str(size))
+            if entry is None:
+                raise KeyError(f"No corpus input {name!r} of size {size}")
+            path = os.path.join(self.root_dir, entry['file'])
+            self._arrays[key] = np.load(path, mmap_mode='r')
+        return self._arrays[key]
+
+    def as_list(self, name: str, size: int) -> list:
+        """Chuyển một đầu vào sang list Python (bản sao riêng)"""
+        return self.load(name, size).tolist()
+
+    def inputs(self, name: str, sizes: Optional[List[int]] = None,
+               as_list: bool = False) -> List[Tuple]:
+        """
+        Tạo test inputs cho PerformanceGrader.grade_performance()
+
+        Args:
+            name: Tên nhóm đầu vào
+            sizes: Các kích thước cần dùng (mặc định tất cả)
+            as_list: Chuyển sang list cho hàm không nhận mảng NumPy
+
+        Returns:
+            Danh sách tuple tham số
+        """
+        if sizes is None:
+            sizes = self.sizes(name)
+        convert = self.as_list if as_list else self.load
+        return [(convert(name, size),) for size in sizes]
+
+    def input_generator(self, name: str,
+                        as_list: bool = False) -> Callable[[int], Tuple]:
+        """
+        Tạo input_generator cho estimate_complexity()/grade_complexity()
+
+        Với kích thước n, dùng đầu vào nhỏ nhất có kích thước >= n và cắt
+        lấy n phần tử đầu (lát cắt của memmap không sao chép dữ liệu).
+
+        Args:
+            name: Tên nhóm đầu vào
+            as_list: Chuyển sang list cho hàm không nhận mảng NumPy
+
+        Returns:
+            Hàm nhận n, trả về tuple tham số
+        """
+        def generate(n: int) -> Tuple:
+            for size in self.sizes(name):
+                if size >= n:
+                    data = self.load(name, size)[:n]
+                    return (data.tolist() if as_list else data,)
+            raise ValueError(f"Corpus {name!r} has no input of size >= {n}")
+
+        return generate
@@ -9,20 +9,25 @@
 from typing import List, Tuple, Dict, Any
 from pathlib import Path
 
+from .utils import truncate_text
+
 
 class IOGrader:
     """Lớp chấm điểm dựa trên Input/Output"""
     
-    def __init__(self, student_file: str, timeout: int = 5):
+    def __init__(self, student_file: str, timeout: int = 5,
+                 max_output_length: int = 1000):
         """
         Khởi tạo bộ chấm điểm IO
         
         Args:
             student_file: Đường dẫn đến file code sinh viên
             timeout: Thời gian timeout (giây)
+            max_output_length: Số ký tự stdout/stderr tối đa lưu trong kết quả
         """
         self.student_file = student_file
         self.timeout = timeout
+        self.max_output_length = max_output_length
         
     def run_with_input(self, input_data: str) -> Tuple[str, str, int]:
         """
@@ -99,6 +104,8 @@ def grade(self, test_cases: List[Dict[str, str]],
         
         for i, tc in enumerate(test_cases):
             stdout, stderr, returncode = self.run_with_input(tc['input'])
+            # So sánh trên output đầy đủ, chỉ lưu bản rút gọn vào kết quả
+            actual = truncate_text(stdout, self.max_output_length)
             
             if stderr == "TIMEOUT":
                 results.append({
@@ -114,8 +121,8 @@ def grade(self, test_cases: List[Dict[str, str]],
                     'status': 'ERROR',
                     'input': tc['input'],
                     'expected': tc['expected'],
-                    'actual': stdout,
-                    'error': stderr
+                    'actual': actual,
+                    'error': truncate_text(stderr, self.max_output_length)
                 })
             else:
                 match = self.compare_output(stdout, tc['expected'])
@@ -126,7 +133,7 @@ def grade(self, test_cases: List[Dict[str, str]],
                         'status': 'PASS',
                         'input': tc['input'],
                         'expected': tc['expected'],
-                        'actual': stdout
+                        'actual': actual
                     })
                 else:
                     results.append({
@@ -134,7 +141,7 @@ def grade(self, test_cases: List[Dict[str, str]],
                         'status': 'FAIL',
                         'input': tc['input'],
                         'expected': tc['expected'],
-                        'actual': stdout
+                        'actual': actual
                     })
         
         # Tính điểm
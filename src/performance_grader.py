@@ -3,27 +3,1072 @@
 Đo thời gian thực thi, memory usage, complexity
 """
 
+import os
 import time
 import tracemalloc
+import multiprocessing
+import multiprocessing.connection
+import linecache
+import cProfile
+import pstats
+import hashlib
+import json
+import marshal
+import pickle
+import platform
+import signal
+import threading
 import importlib.util
 import sys
-from typing import Dict, Any, List, Callable, Tuple
+import types
+from typing import Dict, Any, List, Callable, Tuple, Optional, Iterable
 import statistics
 import gc
+import copy
+import math
+from contextlib import contextmanager
+from hypothesis import given, settings, target, Phase, HealthCheck
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là phụ thuộc tùy chọn (chấm điểm theo lớp)
+    np = None
+
+from .utils import content_digest, deep_sizeof, describe_input, InputStore
+
+
+# Các lớp độ phức tạp theo thứ tự tăng dần: (tên, hàm tăng trưởng g(n))
+COMPLEXITY_CLASSES = [
+    ('O(1)', lambda n: 1.0),
+    ('O(log n)', lambda n: math.log2(max(n, 2))),
+    ('O(n)', lambda n: float(n)),
+    ('O(n log n)', lambda n: n * math.log2(max(n, 2))),
+    ('O(n^2)', lambda n: float(n) ** 2),
+    ('O(n^3)', lambda n: float(n) ** 3),
+]
+
+
+def fit_growth_model(sizes: List[int], times: List[float],
+                     growth: Callable[[int], float]) -> float:
+    """
+    Khớp mô hình t = a + b * g(n) bằng bình phương tối thiểu có trọng số
+    
+    Trọng số 1/t^2 để sai số được tính theo tỷ lệ, tránh việc các kích
+    thước lớn lấn át các kích thước nhỏ.
+    
+    Args:
+        sizes: Các kích thước đầu vào
+        times: Thời gian tương ứng (giây)
+        growth: Hàm tăng trưởng g(n)
+        
+    Returns:
+        Sai số tương đối bình phương trung bình của mô hình
+    """
+    weights = [1.0 / (t * t) if t > 0 else 1.0 for t in times]
+    g = [growth(n) for n in sizes]
+    total_weight = sum(weights)
+    g_mean = sum(w * x for w, x in zip(weights, g)) / total_weight
+    t_mean = sum(w * t for w, t in zip(weights, times)) / total_weight
+    
+    spread = sum(w * (x - g_mean) ** 2 for w, x in zip(weights, g))
+    if spread > 0:
+        b = sum(w * (x - g_mean) * (t - t_mean)
+                for w, x, t in zip(weights, g, times)) / spread
+        a = t_mean - b * g_mean
+        if b < 0:
+            # Mô hình tăng trưởng với hệ số âm không có ý nghĩa
+            return float('inf')
+        if a < 0:
+            # Khớp lại qua gốc tọa độ
+            a = 0.0
+            b = (sum(w * x * t for w, x, t in zip(weights, g, times)) /
+                 sum(w * x * x for w, x in zip(weights, g)))
+    else:
+        a, b = t_mean, 0.0
+    
+    return sum(w * (a + b * x - t) ** 2
+               for w, x, t in zip(weights, g, times)) / len(times)
+
+
+def reject_outliers(values: List[float]) -> Tuple[List[float], int]:
+    """
+    Loại bỏ giá trị ngoại lai theo quy tắc Tukey (ngoài 1.5 IQR)
+    
+    Args:
+        values: Danh sách giá trị đo
+        
+    Returns:
+        Tuple (các giá trị được giữ, số giá trị bị loại)
+    """
+    if len(values) < 4:
+        return list(values), 0
+    
+    q1, _, q3 = statistics.quantiles(values, n=4)
+    fence = 1.5 * (q3 - q1)
+    kept = [v for v in values if q1 - fence <= v <= q3 + fence]
+    return kept, len(values) - len(kept)
+
+
+def t_coverage(t: float, df: int) -> float:
+    """
+    P(|T| <= t) với T theo phân phối Student bậc tự do df (nguyên)
+    
+    Dùng công thức dạng chuỗi hữu hạn theo góc atan(t/sqrt(df)).
+    """
+    theta = math.atan(t / math.sqrt(df))
+    cos_sq = math.cos(theta) ** 2
+    total = term = 1.0
+    if df % 2 == 1:
+        if df == 1:
+            return 2 * theta / math.pi
+        for k in range(1, (df - 1) // 2):
+            term *= cos_sq * (2 * k) / (2 * k + 1)
+            total += term
+        return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total)
+    for k in range(1, df // 2):
+        term *= cos_sq * (2 * k - 1) / (2 * k)
+        total += term
+    return math.sin(theta) * total
+
+
+def t_critical(confidence: float, df: int) -> float:
+    """
+    Giá trị tới hạn hai phía của phân phối Student
+    
+    Args:
+        confidence: Mức tin cậy (ví dụ 0.95)
+        df: Bậc tự do
+        
+    Returns:
+        t sao cho P(|T| <= t) = confidence (xấp xỉ chuẩn khi df lớn)
+    """
+    if df >= 200:
+        return statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    low, high = 0.0, 1.0
+    while t_coverage(high, df) < confidence:
+        high *= 2
+    for _ in range(60):
+        middle = (low + high) / 2
+        if t_coverage(middle, df) < confidence:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def sequential_confidence(confidence: float, looks: int) -> float:
+    """
+    Mức tin cậy cho mỗi lần xem khi dừng sớm
+    
+    Chia đều mức lỗi 1 - confidence cho các lần xem (Bonferroni), nên xác
+    suất có một lần dừng với khoảng tin cậy sai không vượt quá
+    1 - confidence, dù xem kết quả sau mỗi cặp mẫu.
+    
+    Args:
+        confidence: Mức tin cậy tổng
+        looks: Số lần xem tối đa
+        
+    Returns:
+        Mức tin cậy dùng cho từng lần xem
+    """
+    return 1 - (1 - confidence) / max(1, looks)
+
+
+def ratio_interval(student_times: List[float], reference_times: List[float],
+                   confidence: float = 0.95) -> Dict[str, Any]:
+    """
+    Tỷ lệ thời gian tham chiếu/sinh viên và khoảng tin cậy từ các cặp mẫu
+    
+    Dùng log của tỷ lệ từng cặp (đã loại ngoại lai), nên tỷ lệ là trung
+    bình nhân và khoảng tin cậy theo phân phối Student.
+    
+    Args:
+        student_times: Thời gian của sinh viên
+        reference_times: Thời gian của tham chiếu (cùng thứ tự cặp)
+        confidence: Mức tin cậy
+        
+    Returns:
+        Dictionary chứa 'ratio', 'ratio_ci' và 'outliers_rejected'
+    """
+    log_ratios = [
+        math.log(ref / stu) for stu, ref in zip(student_times, reference_times)
+        if stu > 0 and ref > 0
+    ]
+    kept, rejected = reject_outliers(log_ratios)
+    
+    if not kept:
+        return {'ratio': 1.0, 'ratio_ci': (1.0, 1.0), 'outliers_rejected': rejected}
+    
+    center = statistics.mean(kept)
+    if len(kept) < 2:
+        # Một cặp chưa cho biết gì về độ phân tán
+        return {
+            'ratio': math.exp(center),
+            'ratio_ci': (0.0, float('inf')),
+            'outliers_rejected': rejected
+        }
+    
+    t = t_critical(confidence, len(kept) - 1)
+    half_width = t * statistics.stdev(kept) / math.sqrt(len(kept))
+    
+    return {
+        'ratio': math.exp(center),
+        'ratio_ci': (math.exp(center - half_width), math.exp(center + half_width)),
+        'outliers_rejected': rejected
+    }
+
+
+def summarize_times(times: List[float]) -> Dict[str, float]:
+    """Thống kê thời gian cho danh sách mẫu"""
+    return {
+        'mean': statistics.mean(times),
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'std': statistics.stdev(times) if len(times) > 1 else 0,
+        'samples': len(times)
+    }
+
+
+@contextmanager
+def pinned_to_cpu(cpu: Optional[int]):
+    """
+    Tạm thời ghim tiến trình hiện tại vào một core
+    
+    Không làm gì nếu cpu là None hoặc hệ điều hành không hỗ trợ
+    os.sched_setaffinity (ví dụ macOS, Windows).
+    
+    Args:
+        cpu: Chỉ số core được dành riêng cho benchmark
+    """
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        yield False
+        return
+    
+    previous = os.sched_getaffinity(0)
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except OSError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+class CallTimeout(BaseException):
+    """
+    Một lần gọi hàm vượt quá thời gian cho phép
+    
+    Kế thừa BaseException để `except Exception` trong code sinh viên không
+    nuốt được; nơi gọi hàm sinh viên bắt CALL_ERRORS.
+    """
+
+
+# Lỗi của một lần gọi hàm sinh viên (kể cả bị ngắt vì quá giờ)
+CALL_ERRORS = (Exception, CallTimeout)
+
+# Khoảng lặp lại SIGALRM khi code sinh viên nuốt CallTimeout (giây)
+CALL_DEADLINE_RETRY = 0.05
+
+# Thời gian chờ thêm sau hạn chót trước khi tiến trình chấm dừng worker
+CALL_DEADLINE_GRACE = 1.0
+
+# Hạn chót (time.monotonic) của lần gọi đang chạy trong benchmark worker,
+# dùng chung với tiến trình chấm; None ngoài worker
+_worker_call_deadline = None
+
+
+@contextmanager
+def call_deadline(seconds: Optional[float]):
+    """
+    Ngắt code Python chạy quá seconds giây bằng CallTimeout
+    
+    Dùng SIGALRM (setitimer) nên chỉ có tác dụng trên luồng chính của hệ
+    điều hành hỗ trợ tín hiệu; code C dài chỉ bị ngắt khi trả quyền về
+    Python. Tín hiệu được lặp lại mỗi CALL_DEADLINE_RETRY giây cho đến khi
+    lời gọi kết thúc, và nếu hàm nuốt CallTimeout rồi trả về thì CallTimeout
+    vẫn được ném khi ra khỏi khối. Trong benchmark worker, hạn chót còn được
+    công bố cho tiến trình chấm, nơi dừng hẳn worker nếu lời gọi vẫn chạy
+    quá CALL_DEADLINE_GRACE giây. Timer có sẵn (ví dụ của pytest-timeout)
+    được khôi phục sau đó.
+    
+    Args:
+        seconds: Thời gian tối đa (None: không giới hạn)
+    """
+    if seconds is None:
+        yield False
+        return
+    
+    slot = _worker_call_deadline
+    if slot is not None:
+        previous_deadline = slot.value
+        slot.value = time.monotonic() + seconds
+    try:
+        with _alarm_deadline(seconds) as armed:
+            yield armed
+    finally:
+        if slot is not None:
+            slot.value = previous_deadline
+
+
+def _ignore_alarm(signum, frame):
+    """Handler SIGALRM rỗng dùng trong lúc gỡ call_deadline"""
+
+
+@contextmanager
+def _alarm_deadline(seconds: float):
+    """Phần SIGALRM của call_deadline"""
+    if (not hasattr(signal, 'setitimer') or
+            threading.current_thread() is not threading.main_thread()):
+        yield False
+        return
+    
+    fired = []
+    
+    def on_alarm(signum, frame):
+        fired.append(True)
+        raise CallTimeout(f'Call exceeded {seconds}s')
+    
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    previous_delay, previous_interval = signal.setitimer(
+        signal.ITIMER_REAL, seconds, CALL_DEADLINE_RETRY)
+    started = time.monotonic()
+    try:
+        yield True
+    finally:
+        # Tắt timer và đổi sang handler rỗng trước tiên; tín hiệu đến trong
+        # lúc đó ném CallTimeout ngay tại đây, nên bỏ qua và làm lại để
+        # handler cũ chắc chắn được khôi phục
+        while True:
+            try:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, _ignore_alarm)
+                break
+            except CallTimeout:
+                pass
+        signal.signal(signal.SIGALRM, previous_handler)
+        if previous_delay:
+            remaining = previous_delay - (time.monotonic() - started)
+            signal.setitimer(signal.ITIMER_REAL, max(remaining, 1e-3),
+                             previous_interval)
+    if fired:
+        # Hàm đã nuốt CallTimeout rồi trả về sau hạn chót
+        raise CallTimeout(f'Call exceeded {seconds}s')
+
+
+def read_proc_status_kb(field: str) -> Optional[int]:
+    """
+    Đọc một trường (kB) từ /proc/self/status, ví dụ 'VmRSS', 'VmHWM'
+    
+    Returns:
+        Giá trị theo bytes hoặc None nếu không có /proc (không phải Linux)
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def peak_rss_bytes() -> int:
+    """Peak RSS của tiến trình hiện tại (bytes)"""
+    peak = read_proc_status_kb('VmHWM')
+    if peak is not None:
+        return peak
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss tính bằng kB trên Linux, bytes trên macOS
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Đặt lại peak RSS (VmHWM) về RSS hiện tại, chỉ có trên Linux
+    
+    Returns:
+        True nếu đặt lại được
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def rss_worker(func: Callable, args: Tuple, conn):
+    """
+    Chạy một lần gọi trong tiến trình con và gửi thống kê bộ nhớ về
+    
+    Args:
+        func: Hàm cần đo
+        args: Tham số đầu vào
+        conn: Đầu gửi của multiprocessing.Pipe
+    """
+    gc.collect()
+    baseline = read_proc_status_kb('VmRSS')
+    if not reset_peak_rss() or baseline is None:
+        baseline = peak_rss_bytes()
+    stats_before = gc.get_stats()
+    count_before = gc.get_count()[0]
+    
+    try:
+        func(*args)
+    except Exception as e:
+        conn.send({'error': str(e)})
+        conn.close()
+        return
+    
+    peak = peak_rss_bytes()
+    current = read_proc_status_kb('VmRSS') or peak
+    stats_after = gc.get_stats()
+    collections = [after['collections'] - before['collections']
+                   for before, after in zip(stats_before, stats_after)]
+    collected = sum(after['collected'] - before['collected']
+                    for before, after in zip(stats_before, stats_after))
+    # Ước lượng số object (có theo dõi bởi GC) được cấp phát: mỗi lần thu
+    # gom thế hệ 0 ứng với threshold0 lần cấp phát
+    allocations = (collections[0] * gc.get_threshold()[0] +
+                   gc.get_count()[0] - count_before)
+    
+    conn.send({
+        'current_bytes': max(0, current - baseline),
+        'peak_bytes': max(0, peak - baseline),
+        'baseline_rss_bytes': baseline,
+        'gc_collections': collections,
+        'gc_collected': collected,
+        'object_allocations': max(0, allocations)
+    })
+    conn.close()
+
+
+def available_cpus() -> List[int]:
+    """Danh sách core tiến trình hiện tại được phép chạy"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def benchmark_worker(target: Callable, args: Tuple, cpu: Optional[int], conn,
+                     deadline_slot=None):
+    """
+    Chạy một phiên benchmark trong tiến trình con riêng
+    
+    Tiến trình được ghim vào core dành riêng suốt phiên; các object thừa
+    hưởng từ tiến trình chấm (kết quả Hypothesis, bài nộp trước...) được
+    gc.freeze() để GC không phải duyệt lại trong lúc đo.
+    
+    Args:
+        target: Hàm thực hiện benchmark, trả về dictionary kết quả
+        args: Tham số cho target
+        cpu: Core dành riêng (None nếu không ghim)
+        conn: Đầu gửi của multiprocessing.Pipe
+        deadline_slot: multiprocessing.Value nhận hạn chót của lời gọi đang
+            chạy (xem call_deadline)
+    """
+    global _worker_call_deadline
+    _worker_call_deadline = deadline_slot
+    pinned = False
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+            pinned = True
+        except OSError:
+            pass
+    gc.collect()
+    gc.freeze()
+    
+    try:
+        result = target(*args)
+    except CALL_ERRORS as e:
+        result = {'error': str(e)}
+    result['isolated_worker'] = {
+        'pid': os.getpid(),
+        'cpu': cpu if pinned else None
+    }
+    
+    try:
+        conn.send(result)
+    except Exception as e:
+        conn.send({'error': f'Cannot send benchmark result: {e}'})
+    conn.close()
+
+
+def start_benchmark_worker(target: Callable, args: Tuple, cpu: Optional[int]):
+    """
+    Khởi động benchmark_worker trong tiến trình fork
+    
+    Returns:
+        Tuple (process, receiver, deadline_slot); deadline_slot giữ hạn chót
+        của lời gọi đang chạy trong worker (0 nếu không có)
+    """
+    ctx = multiprocessing.get_context('fork')
+    receiver, sender = ctx.Pipe(duplex=False)
+    deadline_slot = ctx.Value('d', 0.0, lock=False)
+    process = ctx.Process(target=benchmark_worker,
+                          args=(target, args, cpu, sender, deadline_slot))
+    process.start()
+    sender.close()
+    return process, receiver, deadline_slot
+
+
+def call_overdue(deadline_slot) -> bool:
+    """
+    Lời gọi trong worker đã chạy quá hạn chót + CALL_DEADLINE_GRACE
+    
+    Nghĩa là SIGALRM không ngắt được (code C dài, hoặc code sinh viên bắt
+    cả BaseException); tiến trình chấm cần dừng worker.
+    """
+    deadline = deadline_slot.value
+    return bool(deadline) and time.monotonic() > deadline + CALL_DEADLINE_GRACE
+
+
+def wait_benchmark_worker(receiver, deadline_slot,
+                          timeout: float) -> Optional[str]:
+    """
+    Chờ benchmark worker gửi kết quả
+    
+    Args:
+        receiver: Đầu nhận của Pipe
+        deadline_slot: Hạn chót của lời gọi đang chạy trong worker
+        timeout: Thời gian tối đa của cả phiên
+        
+    Returns:
+        None nếu worker đã gửi kết quả (hoặc đã thoát), ngược lại thông báo
+        lỗi khi phải dừng worker
+    """
+    end = time.monotonic() + timeout
+    while True:
+        remaining = end - time.monotonic()
+        if receiver.poll(max(0.0, min(remaining, CALL_DEADLINE_RETRY))):
+            return None
+        if call_overdue(deadline_slot):
+            return 'Call exceeded call_timeout, benchmark worker terminated'
+        if remaining <= 0:
+            return 'Timeout'
+
+
+def collect_benchmark_result(process, receiver, ready: bool,
+                             error: str = 'Timeout') -> Dict[str, Any]:
+    """
+    Nhận kết quả từ benchmark worker và dọn tiến trình
+    
+    Args:
+        process: Tiến trình worker
+        receiver: Đầu nhận của Pipe
+        ready: Worker đã gửi kết quả (hoặc đã thoát); False nghĩa là worker
+            bị dừng
+        error: Lỗi ghi nhận khi worker bị dừng
+        
+    Returns:
+        Dictionary kết quả (có khóa 'error' nếu thất bại)
+    """
+    result = None
+    try:
+        result = receiver.recv() if ready else {'error': error}
+    except EOFError:
+        pass
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        receiver.close()
+    
+    if result is None:
+        result = {'error': f'Worker exited with code {process.exitcode}'}
+    if 'error' in result:
+        result.setdefault('score', 0.0)
+    return result
+
+
+def _count_with_monitoring(func: Callable, args: Tuple) -> Dict[str, Any]:
+    """Đếm chi phí bằng sys.monitoring (Python 3.12+)"""
+    monitoring = sys.monitoring
+    events = monitoring.events
+    tool = monitoring.PROFILER_ID
+    monitoring.use_tool_id(tool, 'performance_grader')
+    
+    counts = {'instructions': 0, 'calls': 1, 'max_depth': 0}
+    depth = 0
+    
+    def enter(*_):
+        nonlocal depth
+        depth += 1
+        counts['max_depth'] = max(counts['max_depth'], depth)
+    
+    def leave(*_):
+        nonlocal depth
+        depth -= 1
+    
+    def instruction(code, offset):
+        if depth > 0:
+            counts['instructions'] += 1
+    
+    def call(code, offset, callable_obj, arg0):
+        if depth > 0:
+            counts['calls'] += 1
+    
+    handlers = {
+        events.PY_START: enter, events.PY_RESUME: enter,
+        events.PY_THROW: enter, events.PY_RETURN: leave,
+        events.PY_YIELD: leave, events.PY_UNWIND: leave,
+        events.INSTRUCTION: instruction, events.CALL: call
+    }
+    for event, handler in handlers.items():
+        monitoring.register_callback(tool, event, handler)
+    
+    mask = 0
+    for event in handlers:
+        mask |= event
+    monitoring.set_events(tool, mask)
+    try:
+        func(*args)
+    finally:
+        monitoring.set_events(tool, 0)
+        for event in handlers:
+            monitoring.register_callback(tool, event, None)
+        monitoring.free_tool_id(tool)
+    
+    counts['method'] = 'sys.monitoring'
+    return counts
+
+
+def _count_with_tracing(func: Callable, args: Tuple) -> Dict[str, Any]:
+    """
+    Đếm chi phí bằng sys.setprofile (lời gọi, độ sâu) và sys.settrace
+    (sự kiện opcode) cho Python < 3.12
+    """
+    counts = {'instructions': 0, 'calls': 0, 'max_depth': 0}
+    depth = 0
+    
+    def profiler(frame, event, arg):
+        nonlocal depth
+        if event == 'call':
+            depth += 1
+            counts['calls'] += 1
+            counts['max_depth'] = max(counts['max_depth'], depth)
+        elif event == 'return':
+            depth -= 1
+        elif event == 'c_call' and depth > 0:
+            counts['calls'] += 1
+    
+    def tracer(frame, event, arg):
+        if event == 'call':
+            frame.f_trace_opcodes = True
+        elif event == 'opcode':
+            counts['instructions'] += 1
+        return tracer
+    
+    previous_trace = sys.gettrace()
+    previous_profile = sys.getprofile()
+    sys.settrace(tracer)
+    sys.setprofile(profiler)
+    try:
+        func(*args)
+    finally:
+        sys.setprofile(previous_profile)
+        sys.settrace(previous_trace)
+    
+    if counts['calls'] == 0:
+        # Hàm C gọi trực tiếp (ví dụ sorted) không sinh sự kiện 'call'
+        counts['calls'] = 1
+    counts['method'] = 'settrace'
+    return counts
+
+
+def count_execution_cost(func: Callable, args: Tuple) -> Dict[str, Any]:
+    """
+    Đếm chi phí thực thi không phụ thuộc máy của một lần gọi
+    
+    Đếm số lệnh bytecode đã chạy, số lời gọi hàm (kể cả hàm C) và độ sâu
+    lồng nhau lớn nhất của frame Python. Kết quả chỉ phụ thuộc vào code và
+    phiên bản Python, không phụ thuộc tốc độ máy.
+    
+    Args:
+        func: Hàm cần đo
+        args: Tham số đầu vào
+        
+    Returns:
+        Dictionary với 'instructions', 'calls', 'max_depth', 'cost'
+        (instructions + calls) và 'method', hoặc 'error'
+    """
+    # Tắt GC để callback của gc (nếu có) không bị đếm vào lời gọi
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        if hasattr(sys, 'monitoring') and \
+                sys.monitoring.get_tool(sys.monitoring.PROFILER_ID) is None:
+            counts = _count_with_monitoring(func, args)
+        else:
+            counts = _count_with_tracing(func, args)
+    except Exception as e:
+        return {'error': str(e)}
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    
+    counts['cost'] = counts['instructions'] + counts['calls']
+    return counts
+
+
+def failed_time_stats(error: str, timed_out: bool = False) -> Dict[str, Any]:
+    """Thống kê thời gian cho lần đo bị lỗi"""
+    return {
+        'error': error,
+        'timed_out': timed_out,
+        'mean': float('inf'),
+        'median': float('inf'),
+        'min': float('inf'),
+        'max': float('inf'),
+        'std': float('inf')
+    }
+
+
+IMMUTABLE_TYPES = (int, float, complex, str, bytes, bool, frozenset,
+                   type(None))
+
+
+def is_immutable(value: Any) -> bool:
+    """Giá trị bất biến (tuple: mọi phần tử bất biến), dùng chung an toàn"""
+    if isinstance(value, IMMUTABLE_TYPES):
+        return True
+    if isinstance(value, tuple):
+        return all(is_immutable(item) for item in value)
+    return False
+
+
+def is_read_only(value: Any) -> bool:
+    """
+    Giá trị không thể bị hàm sửa tại chỗ
+    
+    Gồm các kiểu bất biến và mảng NumPy chỉ đọc (ví dụ memmap của
+    BenchmarkCorpus); tuple chỉ đọc khi mọi phần tử đều chỉ đọc. Hàm sửa
+    tại chỗ một mảng chỉ đọc sẽ lỗi, nên mảng chỉ đọc chỉ được dùng chung
+    cho các hàm đã xác nhận không sửa tham số (read_only_functions).
+    """
+    if isinstance(value, IMMUTABLE_TYPES):
+        return True
+    if isinstance(value, tuple):
+        return all(is_read_only(item) for item in value)
+    flags = getattr(value, 'flags', None)
+    return flags is not None and not getattr(flags, 'writeable', True)
+
+
+class InputSnapshot:
+    """
+    Ảnh chụp tham số để tạo bản sao mới cho mỗi lần gọi
+    
+    Dùng pickle protocol 5: các buffer liền mạch (mảng NumPy, bytes...)
+    được tách ra ngoài luồng pickle và chỉ cần sao chép bộ nhớ khi tạo bản
+    sao; list/dict được dựng lại bằng pickle.loads, nhanh hơn deepcopy.
+    Giá trị không pickle được thì dùng copy.deepcopy, không copy được thì
+    dùng lại chính giá trị gốc.
+    """
+    
+    def __init__(self, args: Tuple):
+        """
+        Chụp tham số
+        
+        Args:
+            args: Tuple tham số (được chụp ngay, trước mọi lần gọi)
+        """
+        self._args = args
+        self._buffers = []
+        self._payload = None
+        self._nbytes = None
+        self.method = 'pickle'
+        try:
+            self._payload = pickle.dumps(
+                args, protocol=5,
+                buffer_callback=lambda buf: self._buffers.append(bytes(buf))
+            )
+        except Exception:
+            try:
+                self._args = copy.deepcopy(args)
+                self.method = 'deepcopy'
+            except Exception:
+                self.method = None
+    
+    def fresh(self) -> Tuple:
+        """Tạo một bản sao độc lập của tham số"""
+        if self.method == 'pickle':
+            return pickle.loads(self._payload,
+                                buffers=[bytearray(buf) for buf in self._buffers])
+        if self.method == 'deepcopy':
+            return copy.deepcopy(self._args)
+        return self._args
+    
+    @property
+    def nbytes(self) -> int:
+        """Bộ nhớ ước lượng của một bản sao (0 nếu không sao chép được)"""
+        if self._nbytes is None:
+            self._nbytes = deep_sizeof(self.fresh()) if self.method else 0
+        return self._nbytes
+
+
+def code_names(code: types.CodeType) -> set:
+    """Các tên global/thuộc tính được dùng trong code và các hàm lồng"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+class ReferenceBenchmarkCache:
+    """
+    Cache trên đĩa cho kết quả đo hàm tham chiếu
+    
+    Hàm tham chiếu giống nhau cho mọi sinh viên, nên thời gian và memory
+    của nó chỉ cần đo một lần cho mỗi đầu vào trên mỗi máy. Khóa gồm hash
+    code của hàm tham chiếu, digest của đầu vào, dấu vân tay máy và cấu
+    hình đo; mỗi mục là một file JSON trong thư mục cache.
+    """
+    
+    def __init__(self, cache_dir: str):
+        """
+        Khởi tạo cache
+        
+        Args:
+            cache_dir: Thư mục lưu cache (tạo mới nếu chưa có)
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+    
+    @classmethod
+    def function_hash(cls, func: Callable) -> str:
+        """
+        Hash mọi thứ quyết định hành vi của hàm
+        
+        Gồm bytecode (kèm hằng số, hàm lồng), giá trị mặc định, nội dung các
+        biến closure và các global mà hàm tham chiếu tới; global là hàm thì
+        được băm đệ quy, nên sửa một hàm phụ cũng đổi khóa.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        cls._hash_value(func, digest, set())
+        return digest.hexdigest()
+    
+    @classmethod
+    def _hash_value(cls, value: Any, digest, seen: set):
+        """Đưa một giá trị (hàm: đệ quy theo nội dung) vào digest"""
+        code = getattr(value, '__code__', None)
+        if isinstance(value, types.ModuleType):
+            digest.update(f"module:{value.__name__}".encode())
+            return
+        if not isinstance(code, types.CodeType):
+            digest.update(content_digest(value).encode())
+            return
+        if id(value) in seen:
+            digest.update(b'cycle')
+            return
+        seen.add(id(value))
+        
+        digest.update(marshal.dumps(code))
+        cls._hash_value(getattr(value, '__defaults__', None), digest, seen)
+        cls._hash_value(getattr(value, '__kwdefaults__', None), digest, seen)
+        for cell in getattr(value, '__closure__', None) or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:  # Cell chưa được gán
+                contents = None
+            cls._hash_value(contents, digest, seen)
+        
+        namespace = getattr(value, '__globals__', {})
+        for name in sorted(code_names(code)):
+            if name in namespace:
+                digest.update(name.encode())
+                cls._hash_value(namespace[name], digest, seen)
+    
+    @staticmethod
+    def input_digest(args: Tuple) -> str:
+        """Digest nội dung đầu vào"""
+        return content_digest(args)
+    
+    @staticmethod
+    def machine_fingerprint() -> str:
+        """Dấu vân tay của máy chấm và trình thông dịch"""
+        parts = [
+            platform.node(),
+            platform.machine(),
+            platform.processor(),
+            str(os.cpu_count()),
+            platform.python_implementation(),
+            platform.python_version()
+        ]
+        return hashlib.blake2b('|'.join(parts).encode(),
+                               digest_size=6).hexdigest()
+    
+    def make_key(self, func: Callable, args: Tuple, settings: str = '') -> str:
+        """
+        Tạo khóa cache
+        
+        Args:
+            func: Hàm tham chiếu
+            args: Tham số đầu vào
+            settings: Mô tả cấu hình đo (số lần lặp, chế độ đo...)
+            
+        Returns:
+            Khóa dạng '<hash hàm>_<digest đầu vào>_<máy>_<cấu hình>'
+        """
+        settings_hash = hashlib.blake2b(settings.encode(),
+                                        digest_size=4).hexdigest()
+        return (f"{self.function_hash(func)}_{self.input_digest(args)}_"
+                f"{self.machine_fingerprint()}_{settings_hash}")
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lấy kết quả đã cache, None nếu chưa có"""
+        path = os.path.join(self.cache_dir, key + '.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+    
+    def put(self, key: str, value: Dict[str, Any]):
+        """Lưu kết quả (ghi file tạm rồi đổi tên để tránh đọc dở dang)"""
+        path = os.path.join(self.cache_dir, key + '.json')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+    
+    def invalidate(self, func: Callable = None) -> int:
+        """
+        Xóa cache
+        
+        Args:
+            func: Chỉ xóa các mục của hàm tham chiếu này (mặc định: tất cả)
+            
+        Returns:
+            Số mục đã xóa
+        """
+        prefix = self.function_hash(func) + '_' if func is not None else ''
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json') and name.startswith(prefix):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
 
 
 class PerformanceGrader:
     """Lớp đánh giá hiệu năng code"""
     
-    def __init__(self, student_file: str):
+    def __init__(self, student_file: str, calibrate_timing: bool = False,
+                 target_sample_time: float = 0.005,
+                 robust_timing: bool = False,
+                 reserved_cpu: Optional[int] = None,
+                 warmup_iterations: int = 5,
+                 sequential_timing: bool = False,
+                 score_resolution: float = 0.5,
+                 min_sequential_iterations: int = 5,
+                 memory_mode: str = 'tracemalloc',
+                 worker_timeout: float = 60.0,
+                 allocation_profile: bool = False,
+                 top_allocations: int = 5,
+                 reference_cache_dir: Optional[str] = None,
+                 isolate_benchmarks: bool = False,
+                 benchmark_timeout: float = 600.0,
+                 cost_metric: bool = False,
+                 line_profile: bool = False,
+                 top_hotspots: int = 10,
+                 measurement_budget: Optional[float] = None,
+                 call_timeout: Optional[float] = None,
+                 input_store: Optional[InputStore] = None,
+                 copy_inputs: bool = True,
+                 copy_budget: int = 64 * 1024 * 1024,
+                 read_only_functions: Optional[Iterable] = None):
         """
         Khởi tạo performance grader
         
         Args:
             student_file: Đường dẫn đến file code sinh viên
+            calibrate_timing: Đo theo kiểu timeit - mỗi mẫu chạy nhiều lần
+                gọi liên tiếp (tự hiệu chỉnh) với GC tắt
+            target_sample_time: Thời gian mục tiêu (giây) của mỗi mẫu khi
+                calibrate_timing bật
+            robust_timing: So sánh thời gian bằng measure_time_ratio() - chạy
+                xen kẽ sinh viên/tham chiếu, loại ngoại lai, có khoảng tin cậy
+            reserved_cpu: Core dành riêng để ghim tiến trình khi đo (Linux)
+            warmup_iterations: Số lần chạy khởi động không tính khi đo xen kẽ
+            sequential_timing: Đo xen kẽ và dừng sớm khi điểm thời gian đã
+                được xác định ở mức tin cậy đặt trước
+            score_resolution: Độ rộng (điểm) của mỗi bậc điểm thời gian;
+                dừng sớm khi khoảng tin cậy của điểm nằm trọn trong một bậc
+            min_sequential_iterations: Số cặp mẫu tối thiểu trước khi dừng sớm
+            memory_mode: 'tracemalloc' (mặc định) hoặc 'rss' - đo peak RSS
+                trong tiến trình con mới (nhanh hơn, tính cả bộ nhớ của C
+                extension như NumPy)
+            worker_timeout: Thời gian tối đa (giây) chờ tiến trình con đo
+            allocation_profile: Ghi lại các dòng code sinh viên cấp phát
+                nhiều bộ nhớ nhất cho mỗi test input
+            top_allocations: Số vị trí cấp phát được giữ lại
+            reference_cache_dir: Thư mục cache kết quả đo hàm tham chiếu
+                dùng chung giữa các bài nộp (không dùng khi đo xen kẽ)
+            isolate_benchmarks: Chạy grade_performance()/grade_complexity()
+                trong tiến trình con riêng, ghim vào reserved_cpu
+            benchmark_timeout: Thời gian tối đa (giây) của một phiên
+                benchmark trong tiến trình con
+            cost_metric: Chấm điểm thời gian theo chi phí tất định (số lệnh
+                bytecode + số lời gọi) thay vì thời gian thực
+            line_profile: Profile một lần gọi đại diện (cProfile + thời gian
+                từng dòng trong file sinh viên) và đưa vào kết quả, báo cáo
+            top_hotspots: Số hàm/dòng tốn thời gian nhất được giữ lại
+            measurement_budget: Thời gian tối đa (giây) cho một lần đo thời
+                gian; khi mẫu tiếp theo sẽ vượt ngân sách thì dừng và tính
+                thống kê từ các mẫu đã có (đánh dấu 'budget_limited')
+            call_timeout: Thời gian tối đa (giây) của một lần gọi hàm; lần
+                gọi vượt quá bị ngắt và tính là lỗi ('timed_out')
+            input_store: Kho đầu vào dùng chung; kết quả chỉ giữ mô tả gọn
+                của đầu vào, đầu vào đầy đủ lấy lại từ kho theo digest
+            copy_inputs: Mỗi lần gọi nhận một bản sao mới của tham số (tạo
+                ngoài vùng đo), để hàm sửa tại chỗ không ảnh hưởng các lần
+                gọi sau hay hàm tham chiếu
+            copy_budget: Tổng bộ nhớ tối đa (bytes) của các bản sao tham số
+                chuẩn bị trước cho một mẫu; số lần gọi mỗi mẫu khi hiệu
+                chỉnh bị giới hạn theo đó
+            read_only_functions: Các hàm (hoặc tên hàm) đã xác nhận không
+                sửa tham số; các hàm này nhận trực tiếp tham số (kể cả mảng
+                chỉ đọc như memmap của BenchmarkCorpus), không sao chép
         """
         self.student_file = student_file
         self.student_module = None
+        self.calibrate_timing = calibrate_timing
+        self.target_sample_time = target_sample_time
+        self.robust_timing = robust_timing
+        self.reserved_cpu = reserved_cpu
+        self.warmup_iterations = warmup_iterations
+        self.sequential_timing = sequential_timing
+        self.score_resolution = score_resolution
+        self.min_sequential_iterations = min_sequential_iterations
+        self.memory_mode = memory_mode
+        self.worker_timeout = worker_timeout
+        self.allocation_profile = allocation_profile
+        self.top_allocations = top_allocations
+        self.reference_cache = (ReferenceBenchmarkCache(reference_cache_dir)
+                                if reference_cache_dir else None)
+        self.isolate_benchmarks = isolate_benchmarks
+        self.benchmark_timeout = benchmark_timeout
+        self.cost_metric = cost_metric
+        self.line_profile = line_profile
+        self.top_hotspots = top_hotspots
+        self.measurement_budget = measurement_budget
+        self.call_timeout = call_timeout
+        self.input_store = input_store
+        self.copy_inputs = copy_inputs
+        self.copy_budget = copy_budget
+        self.read_only_functions = set(read_only_functions or ())
         
     def load_student_code(self) -> bool:
         """Tải module code của sinh viên"""
@@ -39,49 +1084,674 @@ def load_student_code(self) -> bool:
             print(f"Error loading code: {e}")
             return False
     
+    def is_confirmed_read_only(self, func: Optional[Callable]) -> bool:
+        """Hàm nằm trong read_only_functions (theo đối tượng hoặc tên)"""
+        if func is None:
+            return False
+        try:
+            if func in self.read_only_functions:
+                return True
+        except TypeError:
+            pass
+        return getattr(func, '__name__', None) in self.read_only_functions
+    
+    def input_factory(self, args: Tuple,
+                      func: Optional[Callable] = None) -> Callable[[], Tuple]:
+        """
+        Hàm tạo tham số cho từng lần gọi
+        
+        Args:
+            args: Tham số gốc
+            func: Hàm sẽ nhận tham số
+            
+        Returns:
+            Hàm không tham số trả về bản sao mới (hoặc args nếu copy_inputs
+            tắt hay tham số không thể bị sửa)
+        """
+        if is_immutable(args) or self.is_confirmed_read_only(func):
+            # Hàm không sửa tham số dùng chung tham số gốc (cả memmap)
+            return lambda: args
+        if is_read_only(args):
+            if not self.copy_inputs:
+                # Một bản sao ghi được, dùng chung cho mọi lần gọi
+                writable = InputSnapshot(args).fresh()
+                return lambda: writable
+        elif not self.copy_inputs:
+            return lambda: args
+        return InputSnapshot(args).fresh
+    
+    def fresh_args(self, args: Tuple,
+                   func: Optional[Callable] = None) -> Tuple:
+        """Một bản sao của tham số cho lần gọi đơn lẻ"""
+        return self.input_factory(args, func)()
+    
+    def batch_limit(self, fresh: Callable[[], Tuple], loops: int) -> int:
+        """
+        Giới hạn số lần gọi của một mẫu theo copy_budget
+        
+        Mỗi mẫu chuẩn bị trước loops bản sao tham số (ngoài vùng đo); với
+        hàm rất nhanh trên đầu vào lớn, số lần gọi hiệu chỉnh có thể lên tới
+        hàng chục nghìn bản sao.
+        
+        Args:
+            fresh: Hàm tạo tham số từ input_factory()
+            loops: Số lần gọi đã hiệu chỉnh
+            
+        Returns:
+            Số lần gọi mỗi mẫu (ít nhất 1)
+        """
+        snapshot = getattr(fresh, '__self__', None)
+        if not isinstance(snapshot, InputSnapshot) or not snapshot.nbytes:
+            return loops
+        return max(1, min(loops, self.copy_budget // snapshot.nbytes))
+    
+    def call_limit(self, loops: int = 1) -> Optional[float]:
+        """Thời hạn cho một khối loops lần gọi (None nếu không giới hạn)"""
+        if self.call_timeout is None:
+            return None
+        return self.call_timeout * loops
+    
+    def budget_exhausted(self, started: float, done: int, total: int) -> bool:
+        """
+        Kiểm tra mẫu tiếp theo có làm lần đo vượt measurement_budget không
+        
+        Args:
+            started: Thời điểm bắt đầu đo (time.perf_counter)
+            done: Số mẫu đã lấy
+            total: Số mẫu dự định
+            
+        Returns:
+            True nếu nên dừng lấy mẫu
+        """
+        if self.measurement_budget is None or done == 0 or done >= total:
+            return False
+        elapsed = time.perf_counter() - started
+        return elapsed + elapsed / done > self.measurement_budget
+    
+    def calibrate_loops(self, func: Callable, args: Tuple,
+                        target_time: float) -> int:
+        """
+        Tìm số lần gọi liên tiếp để một mẫu kéo dài ít nhất target_time
+        
+        Args:
+            func: Hàm cần đo
+            args: Tham số đầu vào
+            target_time: Thời gian mục tiêu của một mẫu (giây)
+            
+        Returns:
+            Số lần gọi cho mỗi mẫu
+        """
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                func(*args)
+            elapsed = time.perf_counter() - start
+            
+            if elapsed >= target_time:
+                return loops
+            
+            # Ước lượng số lần gọi cần thiết, tăng tối đa 10 lần mỗi bước
+            if elapsed > 0:
+                estimate = int(loops * target_time / elapsed) + 1
+            else:
+                estimate = loops * 10
+            loops = max(loops * 2, min(estimate, loops * 10))
+    
     def measure_execution_time(self, func: Callable, args: Tuple, 
-                              iterations: int = 100) -> Dict[str, float]:
+                              iterations: int = 100,
+                              calibrate: bool = None) -> Dict[str, float]:
         """
         Đo thời gian thực thi
         
         Args:
-            func: Hàm cần đo
+            func: Hàm cần đo
+            args: Tham số đầu vào
+            iterations: Số lần chạy (số mẫu khi đo hiệu chỉnh)
+            calibrate: Đo hiệu chỉnh kiểu timeit; mặc định theo
+                self.calibrate_timing
+            
+        Returns:
+            Dictionary chứa các thống kê thời gian (tính cho mỗi lần gọi)
+        """
+        if calibrate is None:
+            calibrate = self.calibrate_timing
+        if calibrate:
+            return self.measure_calibrated_time(func, args, iterations)
+        
+        times = []
+        budget_limited = False
+        fresh = self.input_factory(args, func)
+        started = time.perf_counter()
+        
+        for _ in range(iterations):
+            call_args = fresh()
+            gc.collect()  # Chạy garbage collector trước mỗi test
+            
+            try:
+                with call_deadline(self.call_limit()):
+                    start = time.perf_counter()
+                    func(*call_args)
+                    end = time.perf_counter()
+            except CallTimeout as e:
+                return failed_time_stats(str(e), timed_out=True)
+            except Exception as e:
+                return failed_time_stats(str(e))
+            
+            times.append(end - start)
+            if self.budget_exhausted(started, len(times), iterations):
+                budget_limited = True
+                break
+        
+        stats = summarize_times(times)
+        if self.measurement_budget is not None:
+            stats['budget_limited'] = budget_limited
+            stats['samples'] = len(times)
+        return stats
+    
+    def measure_calibrated_time(self, func: Callable, args: Tuple,
+                                samples: int = 20) -> Dict[str, float]:
+        """
+        Đo thời gian kiểu timeit
+        
+        Mỗi mẫu gồm nhiều lần gọi liên tiếp sao cho kéo dài khoảng
+        self.target_sample_time, giúp độ phân giải timer không lấn át các
+        hàm chạy trong vài micro giây. GC bị tắt trong lúc lấy mẫu và chỉ
+        được chạy giữa các mẫu.
+        
+        Args:
+            func: Hàm cần đo
+            args: Tham số đầu vào
+            samples: Số mẫu
+            
+        Returns:
+            Dictionary chứa các thống kê thời gian cho mỗi lần gọi
+        """
+        gc_was_enabled = gc.isenabled()
+        times = []
+        budget_limited = False
+        fresh = self.input_factory(args, func)
+        started = time.perf_counter()
+        
+        try:
+            with call_deadline(self.call_limit()):
+                loops = self.calibrate_loops(func, fresh(),
+                                             self.target_sample_time)
+            loops = self.batch_limit(fresh, loops)
+            
+            for _ in range(samples):
+                batch = [fresh() for _ in range(loops)]
+                gc.collect()
+                gc.disable()
+                try:
+                    with call_deadline(self.call_limit(loops)):
+                        start = time.perf_counter()
+                        for call_args in batch:
+                            func(*call_args)
+                        end = time.perf_counter()
+                finally:
+                    if gc_was_enabled:
+                        gc.enable()
+                
+                times.append((end - start) / loops)
+                if self.budget_exhausted(started, len(times), samples):
+                    budget_limited = True
+                    break
+        except CallTimeout as e:
+            return failed_time_stats(str(e), timed_out=True)
+        except Exception as e:
+            return failed_time_stats(str(e))
+        
+        stats = summarize_times(times)
+        stats['loops'] = loops
+        if self.measurement_budget is not None:
+            stats['budget_limited'] = budget_limited
+            stats['samples'] = len(times)
+        return stats
+    
+    def estimate_complexity(self, func: Callable,
+                            input_generator: Callable[[int], Tuple],
+                            min_size: int = 64, max_size: int = 65536,
+                            growth_factor: int = 2,
+                            time_budget: float = 10.0,
+                            samples: int = 5) -> Dict[str, Any]:
+        """
+        Ước lượng lớp độ phức tạp bằng thực nghiệm
+        
+        Đo hàm trên một dãy kích thước đầu vào tăng theo cấp số nhân rồi
+        khớp các mô hình tăng trưởng trong COMPLEXITY_CLASSES. Dừng leo
+        dãy kích thước khi thời gian dự kiến của bước tiếp theo vượt quá
+        ngân sách.
+        
+        Args:
+            func: Hàm cần đo
+            input_generator: Hàm nhận kích thước n, trả về tuple tham số
+            min_size: Kích thước nhỏ nhất
+            max_size: Kích thước lớn nhất
+            growth_factor: Hệ số nhân giữa hai kích thước liên tiếp
+            time_budget: Tổng thời gian đo tối đa (giây)
+            samples: Số mẫu đo ở mỗi kích thước
+            
+        Returns:
+            Dictionary chứa lớp phù hợp nhất, độ tin cậy và dữ liệu đo
+        """
+        sizes = []
+        times = []
+        spent = 0.0
+        budget_exhausted = False
+        n = min_size
+        
+        while n <= max_size:
+            # Dự đoán thời gian bước tiếp theo từ tốc độ tăng của hai bước cuối
+            if len(times) >= 2 and times[-2] > 0:
+                exponent = (math.log(times[-1] / times[-2]) /
+                            math.log(sizes[-1] / sizes[-2]))
+                projected = times[-1] * (n / sizes[-1]) ** max(exponent, 0)
+            elif times:
+                projected = times[-1] * (n / sizes[-1])
+            else:
+                projected = 0.0
+            
+            if spent + projected * samples > time_budget:
+                budget_exhausted = True
+                break
+            
+            args = input_generator(n)
+            start = time.perf_counter()
+            stats = self.measure_calibrated_time(func, args, samples)
+            spent += time.perf_counter() - start
+            
+            if 'error' in stats:
+                return {
+                    'error': stats['error'],
+                    'best_fit': None,
+                    'confidence': 0.0,
+                    'sizes': sizes,
+                    'times': times
+                }
+            
+            sizes.append(n)
+            times.append(stats['min'])
+            n *= growth_factor
+        
+        if len(sizes) < 3:
+            return {
+                'error': 'Not enough input sizes measured',
+                'best_fit': None,
+                'confidence': 0.0,
+                'sizes': sizes,
+                'times': times,
+                'budget_exhausted': budget_exhausted
+            }
+        
+        residuals = {
+            name: fit_growth_model(sizes, times, growth)
+            for name, growth in COMPLEXITY_CLASSES
+        }
+        ranked = sorted(residuals, key=residuals.get)
+        best, runner_up = residuals[ranked[0]], residuals[ranked[1]]
+        # Độ tin cậy: mô hình tốt nhất vượt trội mô hình thứ hai bao nhiêu
+        if runner_up == float('inf') or runner_up == 0:
+            confidence = 1.0 if best < runner_up else 0.0
+        else:
+            confidence = 1 - best / runner_up
+        
+        return {
+            'best_fit': ranked[0],
+            'confidence': confidence,
+            'residuals': residuals,
+            'sizes': sizes,
+            'times': times,
+            'budget_exhausted': budget_exhausted
+        }
+    
+    def compare_complexity(self, student_func: Callable,
+                           reference_func: Callable,
+                           input_generator: Callable[[int], Tuple],
+                           class_penalty: float = 4.0,
+                           **ladder_options) -> Dict[str, Any]:
+        """
+        So sánh lớp độ phức tạp của hàm sinh viên với hàm tham chiếu
+        
+        Args:
+            student_func: Hàm sinh viên
+            reference_func: Hàm tham chiếu
+            input_generator: Hàm nhận kích thước n, trả về tuple tham số
+            class_penalty: Số điểm bị trừ cho mỗi lớp chậm hơn tham chiếu
+                (nhân với độ tin cậy của phân loại)
+            ladder_options: Tham số cho estimate_complexity()
+            
+        Returns:
+            Dictionary chứa kết quả và điểm (0-10)
+        """
+        reference = self.estimate_complexity(reference_func, input_generator,
+                                             **ladder_options)
+        student = self.estimate_complexity(student_func, input_generator,
+                                           **ladder_options)
+        
+        order = [name for name, _ in COMPLEXITY_CLASSES]
+        if student['best_fit'] is None or reference['best_fit'] is None:
+            class_difference = None
+            score = 0.0
+        else:
+            class_difference = (order.index(student['best_fit']) -
+                                order.index(reference['best_fit']))
+            # Phân loại kém tin cậy (ví dụ n và n log n khi đo nhiễu) bị
+            # trừ điểm ít hơn
+            penalty = (class_penalty * max(class_difference, 0) *
+                       student['confidence'])
+            score = max(0.0, 10.0 - penalty)
+        
+        return {
+            'score': score,
+            'class_difference': class_difference,
+            'student': student,
+            'reference': reference
+        }
+    
+    def score_decided(self, ratio_ci: Tuple[float, float]) -> bool:
+        """
+        Kiểm tra điểm thời gian đã được xác định đủ chính xác chưa
+        
+        Điểm thời gian là min(10, tỷ lệ * 10), chia thành các bậc rộng
+        self.score_resolution tính từ 10 xuống ([9.5, 10], [9, 9.5)... với
+        0.5); điểm được coi là xác định khi cả khoảng tin cậy của điểm nằm
+        trong một bậc (ví dụ tỷ lệ gần 1 và khoảng nằm trong bậc cao nhất,
+        hoặc sinh viên chậm rõ rệt).
+        
+        Args:
+            ratio_ci: Khoảng tin cậy của tỷ lệ thời gian
+            
+        Returns:
+            True nếu có thể dừng lấy mẫu
+        """
+        low, high = ratio_ci
+        return (self.score_bucket(min(10.0, low * 10))
+                == self.score_bucket(min(10.0, high * 10)))
+    
+    def score_bucket(self, score: float) -> int:
+        """Bậc điểm thời gian (0 là bậc cao nhất, chứa điểm 10)"""
+        steps = (10.0 - score) / self.score_resolution
+        return max(0, math.ceil(steps - 1e-9) - 1)
+    
+    def sequential_looks(self, iterations: int) -> List[int]:
+        """
+        Các số cặp mẫu tại đó quy tắc dừng sớm được xem xét
+        
+        Xem ở min_sequential_iterations rồi mỗi khi số cặp gấp đôi (và ở
+        cặp cuối cùng): ít lần xem hơn nên mức tin cậy hiệu chỉnh cho mỗi
+        lần xem thấp hơn và khoảng tin cậy hẹp hơn.
+        
+        Args:
+            iterations: Số cặp mẫu tối đa
+            
+        Returns:
+            Danh sách số cặp mẫu, tăng dần
+        """
+        looks = []
+        count = max(2, self.min_sequential_iterations)
+        while count < iterations:
+            looks.append(count)
+            count *= 2
+        return looks + [iterations]
+    
+    def stop_sampling(self, student_times: List[float],
+                      reference_times: List[float], confidence: float,
+                      iterations: int) -> bool:
+        """
+        Quy tắc dừng sớm của measure_time_ratio, gọi sau mỗi cặp mẫu
+        
+        Chỉ xét tại các số cặp trong sequential_looks(); mỗi lần xem dùng
+        mức tin cậy đã hiệu chỉnh theo số lần xem (sequential_confidence),
+        nên việc xem lặp lại không làm tăng tỷ lệ dừng với khoảng tin cậy
+        sai.
+        
+        Args:
+            student_times: Thời gian của sinh viên đã đo
+            reference_times: Thời gian của tham chiếu đã đo
+            confidence: Mức tin cậy tổng
+            iterations: Số cặp mẫu tối đa
+            
+        Returns:
+            True nếu có thể dừng lấy mẫu
+        """
+        looks = self.sequential_looks(iterations)
+        if len(student_times) not in looks:
+            return False
+        interval = ratio_interval(
+            student_times, reference_times,
+            sequential_confidence(confidence, len(looks)))
+        return self.score_decided(interval['ratio_ci'])
+    
+    def measure_time_ratio(self, student_func: Callable,
+                           reference_func: Callable, args: Tuple,
+                           iterations: int = 50,
+                           confidence: float = 0.95,
+                           sequential: bool = None) -> Dict[str, Any]:
+        """
+        Đo tỷ lệ thời gian tham chiếu/sinh viên chống nhiễu
+        
+        Hai hàm được chạy xen kẽ (đổi thứ tự mỗi vòng) nên các đợt tải
+        tăng đột ngột trên máy chấm ảnh hưởng đều lên cả hai. Tiến trình
+        được ghim vào self.reserved_cpu, có các vòng khởi động, loại ngoại
+        lai và khoảng tin cậy cho tỷ lệ (trung bình nhân của tỷ lệ từng cặp).
+        
+        Args:
+            student_func: Hàm sinh viên
+            reference_func: Hàm tham chiếu
             args: Tham số đầu vào
-            iterations: Số lần chạy
+            iterations: Số cặp mẫu (tối đa khi dừng sớm)
+            confidence: Mức tin cậy của khoảng tin cậy
+            sequential: Dừng lấy mẫu ngay khi điểm thời gian đã được xác
+                định (stop_sampling); mặc định theo self.sequential_timing.
+                Khi đó khoảng tin cậy trả về dùng mức tin cậy đã hiệu chỉnh
+                cho các lần xem
             
         Returns:
-            Dictionary chứa các thống kê thời gian
+            Dictionary chứa thống kê hai hàm, tỷ lệ và khoảng tin cậy
         """
-        times = []
+        def timed(func: Callable, loops: int) -> float:
+            batch = [fresh_for[func]() for _ in range(loops)]
+            gc.disable()
+            try:
+                with call_deadline(self.call_limit(loops)):
+                    start = time.perf_counter()
+                    for call_args in batch:
+                        func(*call_args)
+                    return (time.perf_counter() - start) / loops
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
         
-        for _ in range(iterations):
-            gc.collect()  # Chạy garbage collector trước mỗi test
+        if sequential is None:
+            sequential = self.sequential_timing
+        
+        gc_was_enabled = gc.isenabled()
+        student_times = []
+        reference_times = []
+        budget_limited = False
+        # Mỗi hàm có nguồn tham số riêng: chỉ hàm đã xác nhận chỉ đọc
+        # mới nhận trực tiếp memmap của corpus
+        fresh_for = {student_func: self.input_factory(args, student_func),
+                     reference_func: self.input_factory(args, reference_func)}
+        
+        with pinned_to_cpu(self.reserved_cpu) as pinned:
+            # Khởi động riêng từng hàm (ít nhất một lần) để biết hàm nào lỗi
+            for label, func in (('student', student_func),
+                                ('reference', reference_func)):
+                try:
+                    for _ in range(max(1, self.warmup_iterations)):
+                        call_args = fresh_for[func]()
+                        with call_deadline(self.call_limit()):
+                            func(*call_args)
+                except CALL_ERRORS as e:
+                    error = f"{label}: {e}"
+                    timed_out = isinstance(e, CallTimeout)
+                    return {
+                        'error': error,
+                        'student': failed_time_stats(
+                            error, timed_out and label == 'student'),
+                        'reference': failed_time_stats(error),
+                        'ratio': 0.0,
+                        'ratio_ci': (0.0, 0.0)
+                    }
             
-            start = time.perf_counter()
             try:
-                func(*args)
-            except Exception as e:
+                if self.calibrate_timing:
+                    with call_deadline(self.call_limit()):
+                        student_loops = self.calibrate_loops(
+                            student_func, fresh_for[student_func](),
+                            self.target_sample_time)
+                        reference_loops = self.calibrate_loops(
+                            reference_func, fresh_for[reference_func](),
+                            self.target_sample_time)
+                    student_loops = self.batch_limit(fresh_for[student_func],
+                                                     student_loops)
+                    reference_loops = self.batch_limit(
+                        fresh_for[reference_func], reference_loops)
+                else:
+                    student_loops = reference_loops = 1
+                
+                started = time.perf_counter()
+                for i in range(iterations):
+                    gc.collect()
+                    if i % 2 == 0:
+                        student_times.append(timed(student_func, student_loops))
+                        reference_times.append(timed(reference_func, reference_loops))
+                    else:
+                        reference_times.append(timed(reference_func, reference_loops))
+                        student_times.append(timed(student_func, student_loops))
+                    
+                    if sequential and self.stop_sampling(
+                            student_times, reference_times, confidence,
+                            iterations):
+                        break
+                    if self.budget_exhausted(started, i + 1, iterations):
+                        budget_limited = True
+                        break
+            except CALL_ERRORS as e:
                 return {
                     'error': str(e),
-                    'mean': float('inf'),
-                    'median': float('inf'),
-                    'min': float('inf'),
-                    'max': float('inf'),
-                    'std': float('inf')
+                    'student': failed_time_stats(
+                        str(e), isinstance(e, CallTimeout)),
+                    'reference': failed_time_stats(str(e)),
+                    'ratio': 0.0,
+                    'ratio_ci': (0.0, 0.0)
                 }
-            end = time.perf_counter()
-            
-            times.append(end - start)
+        
+        interval_confidence = confidence
+        if sequential:
+            interval_confidence = sequential_confidence(
+                confidence, len(self.sequential_looks(iterations)))
+        interval = ratio_interval(student_times, reference_times,
+                                  interval_confidence)
+        
+        student_kept, student_rejected = reject_outliers(student_times)
+        reference_kept, reference_rejected = reject_outliers(reference_times)
+        student_stats = summarize_times(student_kept)
+        student_stats['outliers'] = student_rejected
+        reference_stats = summarize_times(reference_kept)
+        reference_stats['outliers'] = reference_rejected
+        if self.measurement_budget is not None:
+            student_stats['budget_limited'] = budget_limited
+            student_stats['samples'] = len(student_times)
         
         return {
-            'mean': statistics.mean(times),
-            'median': statistics.median(times),
-            'min': min(times),
-            'max': max(times),
-            'std': statistics.stdev(times) if len(times) > 1 else 0,
-            'samples': len(times)
+            'student': student_stats,
+            'reference': reference_stats,
+            'ratio': interval['ratio'],
+            'ratio_ci': interval['ratio_ci'],
+            'confidence': confidence,
+            'outliers_rejected': interval['outliers_rejected'],
+            'iterations': len(student_times),
+            'stopped_early': len(student_times) < iterations,
+            'budget_limited': budget_limited,
+            'pinned': pinned
         }
     
+    def _cached_reference(self, kind: str, settings: str,
+                          reference_func: Callable, args: Tuple,
+                          measure: Callable[[], Dict[str, Any]]
+                          ) -> Dict[str, Any]:
+        """Tra cache trước khi đo hàm tham chiếu; chỉ lưu kết quả thành công"""
+        if self.reference_cache is None:
+            return measure()
+        # Các tùy chọn quyết định tham số và giới hạn của mỗi lần gọi
+        call_settings = (f"{self.copy_inputs}:{self.copy_budget}:"
+                         f"{self.is_confirmed_read_only(reference_func)}:"
+                         f"{self.call_timeout}")
+        key = self.reference_cache.make_key(
+            reference_func, args, f"{kind}:{settings}:{call_settings}")
+        cached = self.reference_cache.get(key)
+        if cached is not None:
+            return cached
+        value = measure()
+        if 'error' not in value:
+            self.reference_cache.put(key, value)
+        return value
+    
+    def measure_reference_time(self, reference_func: Callable, args: Tuple,
+                               iterations: int = 100) -> Dict[str, float]:
+        """
+        Đo thời gian hàm tham chiếu, dùng cache trên đĩa nếu được bật
+        
+        Args:
+            reference_func: Hàm tham chiếu
+            args: Tham số
+            iterations: Số lần chạy
+            
+        Returns:
+            Dictionary như measure_execution_time
+        """
+        settings = (f"{iterations}:{self.calibrate_timing}:"
+                    f"{self.target_sample_time}")
+        return self._cached_reference(
+            'time', settings, reference_func, args,
+            lambda: self.measure_execution_time(reference_func, args,
+                                                iterations))
+    
+    def measure_execution_cost(self, func: Callable,
+                               args: Tuple) -> Dict[str, Any]:
+        """
+        Đo chi phí tất định của một lần gọi (xem count_execution_cost)
+        
+        Args:
+            func: Hàm cần đo
+            args: Tham số đầu vào
+            
+        Returns:
+            Dictionary chứa instructions, calls, max_depth, cost
+        """
+        call_args = self.fresh_args(args, func)
+        try:
+            with call_deadline(self.call_limit()):
+                return count_execution_cost(func, call_args)
+        except CallTimeout as e:
+            return {'error': str(e)}
+    
+    def measure_reference_cost(self, reference_func: Callable,
+                               args: Tuple) -> Dict[str, Any]:
+        """Đo chi phí tất định của hàm tham chiếu, dùng cache nếu được bật"""
+        return self._cached_reference(
+            'cost', sys.version.split()[0], reference_func, args,
+            lambda: self.measure_execution_cost(reference_func, args))
+    
+    def measure_reference_memory(self, reference_func: Callable,
+                                 args: Tuple) -> Dict[str, int]:
+        """
+        Đo memory hàm tham chiếu, dùng cache trên đĩa nếu được bật
+        
+        Args:
+            reference_func: Hàm tham chiếu
+            args: Tham số
+            
+        Returns:
+            Dictionary như measure_memory_usage
+        """
+        return self._cached_reference(
+            'memory', self.memory_mode, reference_func, args,
+            lambda: self.measure_memory_usage(reference_func, args))
+    
     def measure_memory_usage(self, func: Callable, args: Tuple) -> Dict[str, int]:
         """
         Đo memory usage
@@ -93,13 +1763,18 @@ def measure_memory_usage(self, func: Callable, args: Tuple) -> Dict[str, int]:
         Returns:
             Dictionary chứa thông tin memory
         """
+        if self.memory_mode == 'rss':
+            return self.measure_rss_usage(func, self.fresh_args(args, func))
+        
+        call_args = self.fresh_args(args, func)
         gc.collect()
         tracemalloc.start()
         
         try:
-            func(*args)
+            with call_deadline(self.call_limit()):
+                func(*call_args)
             current, peak = tracemalloc.get_traced_memory()
-        except Exception as e:
+        except CALL_ERRORS as e:
             tracemalloc.stop()
             return {
                 'error': str(e),
@@ -116,6 +1791,270 @@ def measure_memory_usage(self, func: Callable, args: Tuple) -> Dict[str, int]:
             'peak_mb': peak / (1024 * 1024)
         }
     
+    def find_worst_case_inputs(self, func: Callable, strategy,
+                               metric: str = 'time',
+                               max_examples: int = 100,
+                               top_k: int = 1) -> List[Tuple]:
+        """
+        Tìm đầu vào tệ nhất bằng targeted search của Hypothesis
+        
+        Hypothesis được hướng (qua target()) tới các đầu vào làm tăng
+        thời gian chạy hoặc lượng bộ nhớ cấp phát của hàm, ví dụ list đã
+        sắp xếp cho quicksort chọn pivot ngây thơ.
+        
+        Args:
+            func: Hàm cần đo
+            strategy: Hypothesis strategy sinh một đối số đầu vào với kích
+                thước cố định (ví dụ st.lists(..., min_size=n, max_size=n))
+            metric: 'time' (thời gian) hoặc 'memory' (peak bytes cấp phát)
+            max_examples: Số ví dụ tối đa cho quá trình tìm kiếm
+            top_k: Số đầu vào tệ nhất cần giữ lại
+            
+        Returns:
+            Danh sách test inputs (tuple tham số) theo thứ tự tệ nhất trước
+        """
+        worst = []  # Danh sách (giá trị metric, tuple tham số)
+        
+        @given(strategy)
+        @settings(max_examples=max_examples, deadline=None, database=None,
+                  phases=[Phase.generate, Phase.target],
+                  suppress_health_check=list(HealthCheck))
+        def search(input_data):
+            args = (input_data,)
+            # Đo trên bản sao để hàm sửa đổi tại chỗ không làm hỏng đầu vào
+            if metric == 'memory':
+                stats = self.measure_memory_usage(func, copy.deepcopy(args))
+                if 'error' in stats:
+                    return
+                value = stats['peak_bytes']
+            else:
+                call_args = copy.deepcopy(args)
+                start = time.perf_counter()
+                try:
+                    func(*call_args)
+                except Exception:
+                    return
+                value = time.perf_counter() - start
+            
+            target(float(value), label=metric)
+            worst.append((value, args))
+            worst.sort(key=lambda item: item[0], reverse=True)
+            del worst[top_k:]
+        
+        search()
+        
+        return [args for _, args in worst]
+    
+    def profile_allocations(self, func: Callable, args: Tuple,
+                            top_n: int = None) -> List[Dict[str, Any]]:
+        """
+        Tìm các dòng code sinh viên cấp phát nhiều bộ nhớ nhất
+        
+        Chụp snapshot tracemalloc trước và sau lần gọi (kết quả trả về vẫn
+        được giữ khi chụp), rồi quy mỗi phần cấp phát mới về dòng gần nhất
+        trong file sinh viên trên traceback - kể cả phần cấp phát xảy ra
+        bên trong thư viện được gọi từ dòng đó.
+        
+        Args:
+            func: Hàm cần đo
+            args: Tham số đầu vào
+            top_n: Số vị trí cần giữ (mặc định self.top_allocations)
+            
+        Returns:
+            Danh sách vị trí cấp phát, lớn nhất trước
+        """
+        if top_n is None:
+            top_n = self.top_allocations
+        student_path = os.path.realpath(self.student_file)
+        
+        call_args = self.fresh_args(args, func)
+        gc.collect()
+        tracemalloc.start(25)
+        try:
+            before = tracemalloc.take_snapshot()
+            try:
+                with call_deadline(self.call_limit()):
+                    result = func(*call_args)
+            except CALL_ERRORS:
+                return []
+            after = tracemalloc.take_snapshot()
+            del result
+        finally:
+            tracemalloc.stop()
+        
+        sites = {}
+        for diff in after.compare_to(before, 'traceback'):
+            if diff.size_diff <= 0:
+                continue
+            # Frame gần nhất (từ trong ra ngoài) thuộc file sinh viên
+            for frame in reversed(diff.traceback):
+                if os.path.realpath(frame.filename) == student_path:
+                    site = sites.setdefault(frame.lineno, {'size': 0, 'count': 0})
+                    site['size'] += diff.size_diff
+                    site['count'] += max(diff.count_diff, 0)
+                    break
+        
+        ranked = sorted(sites.items(), key=lambda item: item[1]['size'],
+                        reverse=True)[:top_n]
+        return [
+            {
+                'line': lineno,
+                'source': linecache.getline(student_path, lineno).strip(),
+                'size_bytes': site['size'],
+                'size_kb': site['size'] / 1024,
+                'blocks': site['count']
+            }
+            for lineno, site in ranked
+        ]
+    
+    def profile_hotspots(self, func: Callable, args: Tuple,
+                         top_n: int = None) -> Dict[str, Any]:
+        """
+        Tìm các hàm và dòng code tốn thời gian nhất của một lần gọi
+        
+        Chạy hai lần: một lần với cProfile (thời gian theo hàm, kể cả hàm
+        thư viện/built-in), một lần với line tracer chỉ gắn vào các frame của
+        file sinh viên. Thời gian của một dòng tính cả các hàm được gọi từ
+        dòng đó; số liệu bị phóng đại bởi tracer nên chỉ dùng để xếp hạng.
+        
+        Args:
+            func: Hàm cần profile
+            args: Tham số đầu vào
+            top_n: Số hàm/dòng cần giữ (mặc định self.top_hotspots)
+            
+        Returns:
+            Dictionary với 'functions' và 'lines' (tốn nhiều nhất trước),
+            hoặc 'error' nếu hàm ném exception
+        """
+        if top_n is None:
+            top_n = self.top_hotspots
+        student_path = os.path.realpath(self.student_file)
+        
+        fresh = self.input_factory(args, func)
+        profiler = cProfile.Profile()
+        try:
+            call_args = fresh()
+            with call_deadline(self.call_limit()):
+                profiler.runcall(func, *call_args)
+        except CALL_ERRORS as e:
+            return {'error': str(e)}
+        
+        functions = []
+        for (filename, lineno, name), (_, calls, own_time, cumulative, _) in \
+                pstats.Stats(profiler).stats.items():
+            if '_lsprof.Profiler' in name:
+                continue
+            functions.append({
+                'function': name,
+                'file': os.path.basename(filename),
+                'line': lineno,
+                'calls': calls,
+                'own_time': own_time,
+                'cumulative_time': cumulative
+            })
+        functions.sort(key=lambda entry: entry['own_time'], reverse=True)
+        
+        line_times = {}
+        line_hits = {}
+        frame_state = {}  # id(frame) -> (dòng đang chạy, thời điểm bắt đầu)
+        
+        def line_tracer(frame, event, arg):
+            now = time.perf_counter()
+            state = frame_state.get(id(frame))
+            if state is not None:
+                lineno, started = state
+                line_times[lineno] = line_times.get(lineno, 0.0) + now - started
+            if event == 'line':
+                line_hits[frame.f_lineno] = line_hits.get(frame.f_lineno, 0) + 1
+                frame_state[id(frame)] = (frame.f_lineno, time.perf_counter())
+            elif event == 'return':
+                frame_state.pop(id(frame), None)
+            return line_tracer
+        
+        def call_tracer(frame, event, arg):
+            if os.path.realpath(frame.f_code.co_filename) == student_path:
+                return line_tracer
+            return None
+        
+        call_args = fresh()
+        previous_trace = sys.gettrace()
+        sys.settrace(call_tracer)
+        try:
+            with call_deadline(self.call_limit()):
+                func(*call_args)
+        except CALL_ERRORS:
+            pass
+        finally:
+            sys.settrace(previous_trace)
+        
+        total = sum(line_times.values()) or 1.0
+        ranked = sorted(line_times.items(), key=lambda item: item[1],
+                        reverse=True)[:top_n]
+        lines = [
+            {
+                'line': lineno,
+                'source': linecache.getline(student_path, lineno).strip(),
+                'hits': line_hits.get(lineno, 0),
+                'time': elapsed,
+                'percent': elapsed / total * 100
+            }
+            for lineno, elapsed in ranked
+        ]
+        
+        return {'functions': functions[:top_n], 'lines': lines}
+    
+    def measure_rss_usage(self, func: Callable, args: Tuple) -> Dict[str, Any]:
+        """
+        Đo memory bằng peak RSS trong một tiến trình con mới
+        
+        Không làm chậm code như tracemalloc và tính cả bộ nhớ cấp phát bởi
+        C extension. Kèm theo số lần thu gom của GC và ước lượng số object
+        được cấp phát (từ bộ đếm của GC).
+        
+        Args:
+            func: Hàm cần đo
+            args: Tham số đầu vào
+            
+        Returns:
+            Dictionary chứa thông tin memory (cùng khóa với
+            measure_memory_usage, thêm các thống kê GC)
+        """
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            # Hàm của sinh viên không pickle được sang tiến trình spawn
+            return {
+                'error': 'RSS measurement requires fork start method',
+                'current': -1,
+                'peak': -1
+            }
+        
+        ctx = multiprocessing.get_context('fork')
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=rss_worker, args=(func, args, sender))
+        process.start()
+        sender.close()
+        
+        try:
+            if receiver.poll(self.worker_timeout):
+                stats = receiver.recv()
+            else:
+                stats = {'error': 'Timeout'}
+        except EOFError:
+            stats = {'error': f'Worker exited with code {process.exitcode}'}
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            receiver.close()
+        
+        if 'error' in stats:
+            stats.update({'current': -1, 'peak': -1})
+            return stats
+        
+        stats['current_mb'] = stats['current_bytes'] / (1024 * 1024)
+        stats['peak_mb'] = stats['peak_bytes'] / (1024 * 1024)
+        stats['method'] = 'rss'
+        return stats
+    
     def compare_with_reference(self, student_func: Callable,
                               reference_func: Callable,
                               test_inputs: List[Tuple],
@@ -138,19 +2077,52 @@ def compare_with_reference(self, student_func: Callable,
         
         for input_data in test_inputs:
             # Đo thời gian
-            student_time = self.measure_execution_time(student_func, input_data, 50)
-            reference_time = self.measure_execution_time(reference_func, input_data, 50)
+            time_ratio_ci = None
+            interleaved = self.robust_timing or self.sequential_timing
+            if interleaved:
+                timing = self.measure_time_ratio(student_func, reference_func,
+                                                 input_data, 50)
+                student_time = timing['student']
+                reference_time = timing['reference']
+            else:
+                student_time = self.measure_execution_time(student_func, input_data, 50)
+                reference_time = self.measure_reference_time(reference_func,
+                                                             input_data, 50)
             
             if 'error' in student_time:
                 time_score = 0
                 time_ratio = float('inf')
+            elif interleaved:
+                time_ratio = timing['ratio']
+                time_ratio_ci = timing['ratio_ci']
+                time_score = min(10, time_ratio * 10)
             else:
                 time_ratio = reference_time['mean'] / student_time['mean']
                 time_score = min(10, time_ratio * 10)
             
-            # Đo memory
-            student_memory = self.measure_memory_usage(student_func, input_data)
-            reference_memory = self.measure_memory_usage(reference_func, input_data)
+            # Chi phí tất định thay cho thời gian thực khi chấm điểm
+            student_cost = reference_cost = cost_ratio = None
+            if self.cost_metric and 'error' not in student_time:
+                student_cost = self.measure_execution_cost(student_func,
+                                                           input_data)
+                reference_cost = self.measure_reference_cost(reference_func,
+                                                             input_data)
+                if 'error' in student_cost or 'error' in reference_cost:
+                    cost_ratio = float('inf') if 'error' in reference_cost else 0.0
+                    time_score = 0 if 'error' in student_cost else 10
+                else:
+                    cost_ratio = reference_cost['cost'] / student_cost['cost']
+                    time_score = min(10, cost_ratio * 10)
+            
+            # Đo memory (bỏ qua nếu lần gọi của sinh viên đã bị ngắt)
+            if student_time.get('timed_out'):
+                student_memory = {'error': student_time['error'],
+                                  'current': -1, 'peak': -1}
+            else:
+                student_memory = self.measure_memory_usage(student_func,
+                                                           input_data)
+            reference_memory = self.measure_reference_memory(reference_func,
+                                                             input_data)
             
             if 'error' in student_memory:
                 memory_score = 0
@@ -168,30 +2140,52 @@ def compare_with_reference(self, student_func: Callable,
             combined_score = (time_score * time_weight + 
                             memory_score * memory_weight)
             
+            if self.allocation_profile and not student_time.get('timed_out'):
+                allocation_sites = self.profile_allocations(student_func,
+                                                            input_data)
+            else:
+                allocation_sites = None
+            
+            input_description = describe_input(input_data)
+            if self.input_store is not None:
+                self.input_store.put(input_data, input_description['digest'])
+            
             results.append({
-                'input': str(input_data),
+                'input': input_description,
                 'student_time': student_time,
                 'reference_time': reference_time,
                 'time_ratio': time_ratio,
+                'time_ratio_ci': time_ratio_ci,
                 'time_score': time_score,
+                'student_cost': student_cost,
+                'reference_cost': reference_cost,
+                'cost_ratio': cost_ratio,
                 'student_memory': student_memory,
                 'reference_memory': reference_memory,
                 'memory_ratio': memory_ratio,
                 'memory_score': memory_score,
+                'allocation_sites': allocation_sites,
                 'combined_score': combined_score
             })
         
         # Tính điểm trung bình
         avg_score = statistics.mean(r['combined_score'] for r in results)
         
-        return {
+        result = {
             'average_score': avg_score,
             'test_count': len(results),
             'detailed_results': results
         }
+        if self.reference_cache is not None:
+            result['reference_cache'] = {
+                'hits': self.reference_cache.hits,
+                'misses': self.reference_cache.misses
+            }
+        return result
     
     def profile_function(self, func_name: str, args: Tuple,
-                        iterations: int = 100) -> Dict[str, Any]:
+                        iterations: int = 100,
+                        line_profile: bool = None) -> Dict[str, Any]:
         """
         Profile một hàm cụ thể
         
@@ -199,6 +2193,8 @@ def profile_function(self, func_name: str, args: Tuple,
             func_name: Tên hàm
             args: Tham số
             iterations: Số lần chạy
+            line_profile: Thêm 'hotspots' từ profile_hotspots()
+                (mặc định self.line_profile)
             
         Returns:
             Dictionary chứa profiling results
@@ -212,15 +2208,50 @@ def profile_function(self, func_name: str, args: Tuple,
         time_stats = self.measure_execution_time(func, args, iterations)
         memory_stats = self.measure_memory_usage(func, args)
         
-        return {
+        result = {
             'function': func_name,
             'time_statistics': time_stats,
             'memory_statistics': memory_stats
         }
+        if line_profile is None:
+            line_profile = self.line_profile
+        if line_profile:
+            result['hotspots'] = self.profile_hotspots(func, args)
+        return result
+    
+    def run_isolated(self, target: Callable, *args) -> Dict[str, Any]:
+        """
+        Chạy một phiên benchmark trong tiến trình con ghim vào reserved_cpu
+        
+        Heap và rác của tiến trình chấm (bài nộp trước, lần chạy Hypothesis)
+        không ảnh hưởng đến phép đo; tiến trình con bị dừng nếu vượt
+        benchmark_timeout, hoặc nếu một lời gọi hàm vượt call_timeout mà
+        SIGALRM không ngắt được.
+        
+        Args:
+            target: Hàm trả về dictionary kết quả
+            args: Tham số cho target
+            
+        Returns:
+            Kết quả của target, kèm 'isolated_worker' (pid, core)
+        """
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            return {
+                'score': 0.0,
+                'error': 'Isolated benchmarks require fork start method'
+            }
+        
+        process, receiver, deadline_slot = start_benchmark_worker(
+            target, args, self.reserved_cpu)
+        error = wait_benchmark_worker(receiver, deadline_slot,
+                                      self.benchmark_timeout)
+        return collect_benchmark_result(process, receiver, error is None,
+                                        error or 'Timeout')
     
     def grade_performance(self, func_name: str, reference_func: Callable,
                          test_inputs: List[Tuple],
-                         max_score: float = 10.0) -> Dict[str, Any]:
+                         max_score: float = 10.0,
+                         adversarial: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Chấm điểm performance
         
@@ -229,10 +2260,30 @@ def grade_performance(self, func_name: str, reference_func: Callable,
             reference_func: Hàm tham chiếu
             test_inputs: Danh sách test inputs
             max_score: Điểm tối đa
+            adversarial: Tham số cho find_worst_case_inputs() (tùy chọn),
+                ví dụ {'strategy': ..., 'metric': 'time', 'top_k': 2}.
+                Các đầu vào tệ nhất tìm được sẽ được thêm vào test inputs
             
         Returns:
             Dictionary chứa kết quả chấm điểm
         """
+        if self.input_store is not None:
+            # Lưu ở tiến trình chấm để vẫn tra cứu được khi đo trong worker
+            for input_data in test_inputs:
+                self.input_store.put(input_data)
+        
+        if self.isolate_benchmarks:
+            return self.run_isolated(self._grade_performance, func_name,
+                                     reference_func, test_inputs,
+                                     max_score, adversarial)
+        return self._grade_performance(func_name, reference_func,
+                                       test_inputs, max_score, adversarial)
+    
+    def _grade_performance(self, func_name: str, reference_func: Callable,
+                           test_inputs: List[Tuple], max_score: float,
+                           adversarial: Optional[Dict[str, Any]]
+                           ) -> Dict[str, Any]:
+        """Chấm điểm performance trong tiến trình hiện tại"""
         if not self.load_student_code():
             return {
                 'score': 0.0,
@@ -246,25 +2297,161 @@ def grade_performance(self, func_name: str, reference_func: Callable,
                 'error': f'Function {func_name} not found'
             }
         
+        adversarial_inputs = []
+        if adversarial:
+            adversarial_inputs = self.find_worst_case_inputs(
+                student_func, **adversarial
+            )
+        
+        inputs = list(test_inputs) + adversarial_inputs
         comparison = self.compare_with_reference(
-            student_func, reference_func, test_inputs
+            student_func, reference_func, inputs
         )
         
         # Chuẩn hóa điểm
         normalized_score = (comparison['average_score'] / 10.0) * max_score
         
-        return {
+        result = {
             'score': round(normalized_score, 2),
             'max_score': max_score,
+            'adversarial_inputs': len(adversarial_inputs),
             'comparison': comparison
         }
+        
+        if self.line_profile and inputs:
+            # Profile đầu vào chậm nhất so với tham chiếu
+            slowest = min(range(len(inputs)), key=lambda i:
+                          comparison['detailed_results'][i]['time_score'])
+            result['hotspots'] = self.profile_hotspots(student_func,
+                                                       inputs[slowest])
+            result['hotspots']['input_index'] = slowest + 1
+        
+        return result
+    
+    def measure_inputs(self, func: Callable,
+                       test_inputs: List[Tuple]) -> List[Dict[str, Any]]:
+        """
+        Đo thời gian và memory thô của một hàm trên từng test input
+        
+        Args:
+            func: Hàm cần đo
+            test_inputs: Danh sách test inputs
+            
+        Returns:
+            Danh sách {'input', 'time', 'memory'} theo thứ tự test inputs
+        """
+        measurements = []
+        for input_data in test_inputs:
+            time_stats = self.measure_execution_time(func, input_data, 50)
+            if time_stats.get('timed_out'):
+                memory_stats = {'error': time_stats['error'],
+                                'current': -1, 'peak': -1}
+            else:
+                memory_stats = self.measure_memory_usage(func, input_data)
+            measurements.append({
+                'input': describe_input(input_data),
+                'time': time_stats,
+                'memory': memory_stats
+            })
+        return measurements
+    
+    def collect_measurements(self, func_name: str,
+                             test_inputs: List[Tuple]) -> Dict[str, Any]:
+        """
+        Thu thập số đo thô của hàm sinh viên để chấm theo lớp (score_cohort)
+        
+        Không chạy hàm tham chiếu; điểm được tính sau khi có số đo của cả
+        lớp.
+        
+        Args:
+            func_name: Tên hàm sinh viên
+            test_inputs: Danh sách test inputs (giống nhau cho cả lớp)
+            
+        Returns:
+            Dictionary với 'student_file' và 'measurements' (hoặc 'error')
+        """
+        if self.isolate_benchmarks:
+            return self.run_isolated(self._collect_measurements, func_name,
+                                     test_inputs)
+        return self._collect_measurements(func_name, test_inputs)
+    
+    def _collect_measurements(self, func_name: str,
+                              test_inputs: List[Tuple]) -> Dict[str, Any]:
+        """Thu thập số đo thô trong tiến trình hiện tại"""
+        if not self.load_student_code():
+            return {'student_file': self.student_file,
+                    'error': 'Cannot load student code'}
+        
+        student_func = getattr(self.student_module, func_name, None)
+        if student_func is None:
+            return {'student_file': self.student_file,
+                    'error': f'Function {func_name} not found'}
+        
+        return {
+            'student_file': self.student_file,
+            'measurements': self.measure_inputs(student_func, test_inputs)
+        }
+    
+    def grade_complexity(self, func_name: str, reference_func: Callable,
+                         input_generator: Callable[[int], Tuple],
+                         max_score: float = 10.0,
+                         **ladder_options) -> Dict[str, Any]:
+        """
+        Chấm điểm theo lớp độ phức tạp tiệm cận
+        
+        Args:
+            func_name: Tên hàm sinh viên
+            reference_func: Hàm tham chiếu
+            input_generator: Hàm nhận kích thước n, trả về tuple tham số
+            max_score: Điểm tối đa
+            ladder_options: Tham số cho estimate_complexity()
+            
+        Returns:
+            Dictionary chứa kết quả chấm điểm
+        """
+        if self.isolate_benchmarks:
+            return self.run_isolated(self._grade_complexity, func_name,
+                                     reference_func, input_generator,
+                                     max_score, ladder_options)
+        return self._grade_complexity(func_name, reference_func,
+                                      input_generator, max_score,
+                                      ladder_options)
+    
+    def _grade_complexity(self, func_name: str, reference_func: Callable,
+                          input_generator: Callable[[int], Tuple],
+                          max_score: float,
+                          ladder_options: Dict[str, Any]) -> Dict[str, Any]:
+        """Chấm điểm độ phức tạp trong tiến trình hiện tại"""
+        if not self.load_student_code():
+            return {
+                'score': 0.0,
+                'error': 'Cannot load student code'
+            }
+        
+        student_func = getattr(self.student_module, func_name, None)
+        if student_func is None:
+            return {
+                'score': 0.0,
+                'error': f'Function {func_name} not found'
+            }
+        
+        comparison = self.compare_complexity(
+            student_func, reference_func, input_generator, **ladder_options
+        )
+        
+        return {
+            'score': round(comparison['score'] / 10.0 * max_score, 2),
+            'max_score': max_score,
+            'complexity': comparison
+        }
     
     def generate_report(self, result: Dict[str, Any]) -> str:
         """
         Tạo báo cáo performance
         
         Args:
-            result: Kết quả từ grade_performance()
+            result: Kết quả từ grade_performance(), grade_complexity()
+                hoặc một phần tử của score_cohort()
             
         Returns:
             Chuỗi báo cáo
@@ -279,15 +2466,53 @@ def generate_report(self, result: Dict[str, Any]) -> str:
             return "\n".join(report)
         
         report.append(f"Score: {result['score']:.2f}/{result['max_score']}")
+        if result.get('isolated_worker'):
+            worker = result['isolated_worker']
+            core = worker['cpu'] if worker['cpu'] is not None else 'unpinned'
+            report.append(f"Isolated worker: pid {worker['pid']}, core {core}")
         report.append("")
         
+        if 'complexity' in result:
+            complexity = result['complexity']
+            for label in ('student', 'reference'):
+                estimate = complexity[label]
+                report.append(f"{label.capitalize()}: {estimate['best_fit']} "
+                              f"(confidence: {estimate['confidence']:.0%})")
+                if estimate['sizes']:
+                    note = " (budget reached)" if estimate.get('budget_exhausted') else ""
+                    report.append(f"  Sizes: {estimate['sizes'][0]}.."
+                                  f"{estimate['sizes'][-1]}{note}")
+            return "\n".join(report)
+        
+        if 'per_input' in result:
+            report.append(f"Cohort percentile: time {result['time_percentile']:.0%}, "
+                          f"memory {result['memory_percentile']:.0%}")
+            for i, entry in enumerate(result['per_input'], 1):
+                report.append(f"  Test #{i}: {entry['input']['preview']}")
+                report.append(f"    Time percentile: {entry['time_percentile']:.0%}, "
+                              f"Memory percentile: {entry['memory_percentile']:.0%}, "
+                              f"Score: {entry['score']:.2f}")
+            return "\n".join(report)
+        
         comparison = result['comparison']
         report.append(f"Tests run: {comparison['test_count']}")
+        if result.get('adversarial_inputs'):
+            report.append(f"Adversarial inputs: {result['adversarial_inputs']}")
+        if comparison.get('reference_cache'):
+            cache = comparison['reference_cache']
+            report.append(f"Reference cache: {cache['hits']} hits, "
+                          f"{cache['misses']} misses")
         report.append(f"Average score: {comparison['average_score']:.2f}/10")
         report.append("")
         
         for i, test_result in enumerate(comparison['detailed_results'], 1):
-            report.append(f"Test #{i}: {test_result['input']}")
+            description = test_result['input']
+            shapes = ", ".join(
+                f"{arg['type']}[{arg.get('shape', arg.get('length', ''))}]"
+                for arg in description.get('args', [description])
+            )
+            report.append(f"Test #{i}: {description['preview']}")
+            report.append(f"  Input: {shapes} (digest {description['digest']})")
             report.append(f"  Combined Score: {test_result['combined_score']:.2f}/10")
             
             # Time stats
@@ -298,7 +2523,21 @@ def generate_report(self, result: Dict[str, Any]) -> str:
                 report.append(f"    Student:   {st['mean']*1000:.3f}ms (±{st['std']*1000:.3f}ms)")
                 report.append(f"    Reference: {rt['mean']*1000:.3f}ms (±{rt['std']*1000:.3f}ms)")
                 report.append(f"    Ratio: {test_result['time_ratio']:.2f}x")
+                if st.get('budget_limited'):
+                    report.append(f"    Budget-limited: {st['samples']} samples")
+                if test_result.get('time_ratio_ci'):
+                    low, high = test_result['time_ratio_ci']
+                    report.append(f"    Ratio CI: [{low:.2f}x, {high:.2f}x]")
+                sc = test_result.get('student_cost')
+                rc = test_result.get('reference_cost')
+                if sc and rc and 'error' not in sc and 'error' not in rc:
+                    report.append(f"    Cost ({sc['method']}): student {sc['cost']} "
+                                  f"(calls {sc['calls']}, depth {sc['max_depth']}), "
+                                  f"reference {rc['cost']}")
+                    report.append(f"    Cost Ratio: {test_result['cost_ratio']:.2f}x")
                 report.append(f"    Score: {test_result['time_score']:.2f}/10")
+            elif st.get('timed_out'):
+                report.append(f"  Time: TIMED OUT ({st['error']})")
             
             # Memory stats
             sm = test_result['student_memory']
@@ -307,14 +2546,244 @@ def generate_report(self, result: Dict[str, Any]) -> str:
                 report.append(f"  Memory:")
                 report.append(f"    Student Peak:   {sm['peak_mb']:.2f} MB")
                 report.append(f"    Reference Peak: {rm['peak_mb']:.2f} MB")
+                if 'gc_collections' in sm:
+                    report.append(f"    Student GC collections: {sm['gc_collections']} "
+                                  f"(~{sm['object_allocations']} objects)")
                 report.append(f"    Ratio: {test_result['memory_ratio']:.2f}x")
                 report.append(f"    Score: {test_result['memory_score']:.2f}/10")
             
+            if test_result.get('allocation_sites'):
+                report.append(f"  Top allocation sites:")
+                for site in test_result['allocation_sites']:
+                    report.append(f"    line {site['line']}: {site['size_kb']:.1f} KB "
+                                  f"({site['blocks']} blocks)  {site['source']}")
+            
+            report.append("")
+        
+        hotspots = result.get('hotspots')
+        if hotspots and 'error' not in hotspots:
+            report.append(f"Hotspots (Test #{hotspots['input_index']}):")
+            report.append("  Functions by own time:")
+            for entry in hotspots['functions']:
+                report.append(f"    {entry['own_time']*1000:8.3f}ms  "
+                              f"{entry['calls']:>7} calls  {entry['function']} "
+                              f"({entry['file']}:{entry['line']})")
+            report.append("  Student lines by time:")
+            for entry in hotspots['lines']:
+                report.append(f"    line {entry['line']}: {entry['percent']:5.1f}% "
+                              f"({entry['hits']} hits)  {entry['source']}")
             report.append("")
         
         return "\n".join(report)
 
 
+def percentile_ranks(values) -> Any:
+    """
+    Hạng phần trăm theo cột, giá trị nhỏ hơn (nhanh hơn) tốt hơn
+    
+    Mỗi phần tử nhận tỷ lệ các dòng khác mà nó tốt hơn hoặc bằng: 1.0 cho
+    phần tử tốt nhất, 0.0 cho phần tử kém hẳn mọi dòng khác; các giá trị
+    bằng nhau nhận cùng hạng (hạng cao nhất của nhóm).
+    
+    Args:
+        values: Mảng (số sinh viên x số test input)
+        
+    Returns:
+        Mảng cùng shape với giá trị trong [0, 1]
+    """
+    rows = values.shape[0]
+    if rows == 1:
+        return np.ones_like(values, dtype=float)
+    not_better = (values[None, :, :] >= values[:, None, :]).sum(axis=1) - 1
+    return not_better / (rows - 1)
+
+
+def score_cohort(cohort: List[Dict[str, Any]],
+                 reference: Optional[List[Dict[str, Any]]] = None,
+                 time_weight: float = 0.6, memory_weight: float = 0.4,
+                 max_score: float = 10.0,
+                 anchor_tolerance: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Chấm điểm performance theo hạng phần trăm trong lớp
+    
+    Điểm của mỗi test input là trung bình có trọng số của hạng phần trăm
+    thời gian và memory trong lớp, nên không phụ thuộc tốc độ tuyệt đối của
+    máy hay của hàm tham chiếu. Khi có số đo của hàm tham chiếu, bài nào
+    không chậm/tốn hơn tham chiếu quá anchor_tolerance lần được hạng tối đa.
+    Bài lỗi nhận 0 cho test input đó.
+    
+    Args:
+        cohort: Kết quả collect_measurements() của từng sinh viên
+        reference: Kết quả measure_inputs() của hàm tham chiếu (tùy chọn)
+        time_weight: Trọng số thời gian
+        memory_weight: Trọng số memory
+        max_score: Điểm tối đa
+        anchor_tolerance: Hệ số cho phép so với tham chiếu
+        
+    Returns:
+        Danh sách kết quả theo thứ tự cohort
+    """
+    if np is None:
+        raise ImportError("score_cohort requires numpy")
+    
+    valid_rows = [i for i, entry in enumerate(cohort) if 'error' not in entry]
+    valid = [cohort[i] for i in valid_rows]
+    results = [{'student_file': entry.get('student_file'), 'score': 0.0,
+                'max_score': max_score, 'error': entry['error']}
+               if 'error' in entry else None for entry in cohort]
+    if not valid:
+        return results
+    
+    def matrix(entries, kind, field):
+        return np.array([
+            [m[kind].get(field, float('inf'))
+             if 'error' not in m[kind] else float('inf')
+             for m in entry['measurements']]
+            for entry in entries
+        ], dtype=float)
+    
+    times = matrix(valid, 'time', 'mean')
+    memory = matrix(valid, 'memory', 'peak_bytes')
+    failed = ~np.isfinite(times) | ~np.isfinite(memory)
+    
+    time_ranks = percentile_ranks(times)
+    memory_ranks = percentile_ranks(memory)
+    if reference is not None:
+        wrapped = [{'measurements': reference}]
+        reference_times = matrix(wrapped, 'time', 'mean')
+        reference_memory = matrix(wrapped, 'memory', 'peak_bytes')
+        # Chỉ neo theo các đầu vào mà tham chiếu đo được (không lỗi)
+        time_ranks[np.isfinite(reference_times) &
+                   (times <= reference_times * anchor_tolerance)] = 1.0
+        memory_ranks[np.isfinite(reference_memory) &
+                     (memory <= reference_memory * anchor_tolerance)] = 1.0
+    time_ranks[failed] = 0.0
+    memory_ranks[failed] = 0.0
+    
+    input_scores = max_score * (time_weight * time_ranks +
+                                memory_weight * memory_ranks)
+    student_scores = input_scores.mean(axis=1)
+    
+    for row, (index, entry) in enumerate(zip(valid_rows, valid)):
+        results[index] = {
+            'student_file': entry.get('student_file'),
+            'score': round(float(student_scores[row]), 2),
+            'max_score': max_score,
+            'time_percentile': float(time_ranks[row].mean()),
+            'memory_percentile': float(memory_ranks[row].mean()),
+            'per_input': [
+                {
+                    'input': measurement['input'],
+                    'time_percentile': float(time_ranks[row, col]),
+                    'memory_percentile': float(memory_ranks[row, col]),
+                    'score': float(input_scores[row, col])
+                }
+                for col, measurement in enumerate(entry['measurements'])
+            ]
+        }
+    return results
+
+
+def grade_performance_cohort(student_files: List[str], func_name: str,
+                             test_inputs: List[Tuple],
+                             reference_func: Optional[Callable] = None,
+                             max_score: float = 10.0,
+                             **grader_options) -> List[Dict[str, Any]]:
+    """
+    Chấm performance cả lớp: đo tất cả trước, chấm theo hạng sau
+    
+    Hàm tham chiếu (nếu có) chỉ được đo một lần cho cả lớp để neo điểm.
+    
+    Args:
+        student_files: Đường dẫn các file bài nộp
+        func_name: Tên hàm sinh viên
+        test_inputs: Danh sách test inputs
+        reference_func: Hàm tham chiếu để neo điểm (tùy chọn)
+        max_score: Điểm tối đa
+        grader_options: Tham số khởi tạo PerformanceGrader dùng chung
+        
+    Returns:
+        Danh sách kết quả score_cohort() theo thứ tự student_files
+    """
+    graders = [PerformanceGrader(path, **grader_options)
+               for path in student_files]
+    cohort = [grader.collect_measurements(func_name, test_inputs)
+              for grader in graders]
+    reference = None
+    if reference_func is not None and graders:
+        reference = graders[0].measure_inputs(reference_func, test_inputs)
+    return score_cohort(cohort, reference, max_score=max_score)
+
+
+def grade_performance_parallel(jobs: List[Dict[str, Any]],
+                               cpus: Optional[List[int]] = None,
+                               **grader_options) -> List[Dict[str, Any]]:
+    """
+    Chấm performance nhiều bài nộp song song trên các core riêng biệt
+    
+    Mỗi bài nộp chạy trong một tiến trình con ghim vào một core chưa có
+    bài nào khác dùng; khi một bài xong, core được trả lại cho bài kế tiếp.
+    
+    Args:
+        jobs: Danh sách dictionary với các khóa 'student_file', 'func_name',
+            'reference_func', 'test_inputs' và tùy chọn 'max_score',
+            'adversarial' (như grade_performance())
+        cpus: Các core dành cho benchmark (mặc định: mọi core được phép)
+        grader_options: Tham số khởi tạo PerformanceGrader dùng chung
+            (reserved_cpu do hàm này gán)
+            
+    Returns:
+        Danh sách kết quả grade_performance() theo thứ tự của jobs
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return [{'score': 0.0,
+                 'error': 'Isolated benchmarks require fork start method'}
+                for _ in jobs]
+    
+    free_cpus = list(cpus) if cpus else available_cpus()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    pending = list(enumerate(jobs))
+    # receiver -> (chỉ số job, process, core, hạn chót, hạn chót lời gọi)
+    running = {}
+    
+    while pending or running:
+        while pending and free_cpus:
+            index, job = pending.pop(0)
+            cpu = free_cpus.pop(0)
+            grader = PerformanceGrader(job['student_file'], reserved_cpu=cpu,
+                                       **grader_options)
+            process, receiver, deadline_slot = start_benchmark_worker(
+                grader._grade_performance,
+                (job['func_name'], job['reference_func'], job['test_inputs'],
+                 job.get('max_score', 10.0), job.get('adversarial')),
+                cpu
+            )
+            deadline = time.monotonic() + grader.benchmark_timeout
+            running[receiver] = (index, process, cpu, deadline,
+                                 deadline_slot)
+        
+        next_deadline = min(entry[3] for entry in running.values())
+        ready = multiprocessing.connection.wait(
+            list(running),
+            timeout=max(0.0, min(next_deadline - time.monotonic(),
+                                 CALL_DEADLINE_RETRY))
+        )
+        now = time.monotonic()
+        for receiver in list(running):
+            index, process, cpu, deadline, deadline_slot = running[receiver]
+            overdue = call_overdue(deadline_slot)
+            if receiver not in ready and now < deadline and not overdue:
+                continue
+            error = ('Call exceeded call_timeout, benchmark worker terminated'
+                     if overdue else 'Timeout')
+            results[index] = collect_benchmark_result(process, receiver,
+                                                      receiver in ready, error)
+            del running[receiver]
+            free_cpus.append(cpu)
+    
+    return results
+
+
 ### Thử nghiệm
 ##if __name__ == "__main__":
 ##    grader = PerformanceGrader("student_code.py")
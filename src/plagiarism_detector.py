@@ -6,21 +6,29 @@
 import ast
 import difflib
 from collections import defaultdict
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Tuple, Set, Optional
 import hashlib
 
+from .utils import ParseCache, shared_parse_cache, copy_tree
+
 
 class PlagiarismDetector:
     """Lớp phát hiện đạo văn giữa các file code"""
     
-    def __init__(self, similarity_threshold: float = 0.8):
+    def __init__(self, similarity_threshold: float = 0.8,
+                 parse_cache: Optional[ParseCache] = None):
         """
         Khởi tạo plagiarism detector
         
         Args:
             similarity_threshold: Ngưỡng tương đồng (0-1)
+            parse_cache: Cache AST dùng chung (mặc định cache của tiến trình).
+                Mỗi bài nộp chỉ được parse và chuẩn hóa một lần, dù xuất
+                hiện trong n-1 cặp so sánh.
         """
         self.similarity_threshold = similarity_threshold
+        self.parse_cache = (parse_cache if parse_cache is not None
+                            else shared_parse_cache)
         
     def normalize_code(self, code: str) -> str:
         """
@@ -32,8 +40,8 @@ def normalize_code(self, code: str) -> str:
         Returns:
             Mã nguồn đã chuẩn hóa
         """
-        try:
-            tree = ast.parse(code)
+        def build(tree):
+            tree = copy_tree(tree)
             
             # Loại bỏ docstrings
             for node in ast.walk(tree):
@@ -43,6 +51,9 @@ def normalize_code(self, code: str) -> str:
                         node.body = node.body[1:]
             
             return ast.unparse(tree)
+        
+        try:
+            return self.parse_cache.artifact(code, 'normalized_code', build)
         except:
             # Nếu parse thất bại, trả về code gốc
             return code
@@ -58,9 +69,14 @@ def normalize_ast(self, code: str) -> str:
             Mã nguồn đã chuẩn hóa AST
         """
         try:
-            tree = ast.parse(code)
+            return self.parse_cache.artifact(code, 'normalized_ast',
+                                             self._normalize_tree)
         except:
             return ""
+    
+    def _normalize_tree(self, tree: ast.AST) -> str:
+        """Đổi tên biến/hàm/lớp trên một bản sao của AST và unparse"""
+        tree = copy_tree(tree)
         
         class Normalizer(ast.NodeTransformer):
             def __init__(self):
@@ -99,10 +115,7 @@ def visit_ClassDef(self, node):
         normalizer = Normalizer()
         normalized = normalizer.visit(tree)
         
-        try:
-            return ast.unparse(normalized)
-        except:
-            return ""
+        return ast.unparse(normalized)
     
     def calculate_text_similarity(self, code1: str, code2: str) -> float:
         """
@@ -149,13 +162,17 @@ def get_code_fingerprint(self, code: str) -> Set[str]:
             code: Mã nguồn
             
         Returns:
-            Set các fingerprint
+            Set các fingerprint (frozenset dùng chung, cache theo nội dung)
         """
         try:
-            tree = ast.parse(code)
+            return self.parse_cache.artifact(code, 'fingerprint',
+                                             self._tree_fingerprint)
         except:
-            return set()
-        
+            return frozenset()
+    
+    @staticmethod
+    def _tree_fingerprint(tree: ast.AST) -> Set[str]:
+        """3-gram các kiểu node theo thứ tự ast.walk"""
         fingerprints = set()
         
         # Tạo n-grams từ chuỗi các node types
@@ -168,7 +185,7 @@ def get_code_fingerprint(self, code: str) -> Set[str]:
             trigram = tuple(node_sequence[i:i+3])
             fingerprints.add(trigram)
         
-        return fingerprints
+        return frozenset(fingerprints)
     
     def calculate_fingerprint_similarity(self, code1: str, code2: str) -> float:
         """
@@ -9,6 +9,143 @@
 import sys
 from typing import Callable, Any, List, Dict
 import traceback
+import functools
+import hashlib
+import pickle
+from collections import OrderedDict
+
+from .utils import FailureRecorder
+
+
+def ordered_pairs(strategy):
+    """
+    Strategy sinh cặp (a, b) đã thỏa điều kiện a <= b
+    
+    Thay vì sinh a, b độc lập rồi bỏ qua các cặp a > b (lãng phí khoảng
+    một nửa số ví dụ), mỗi cặp được sắp xếp lại ngay khi sinh ra.
+    
+    Args:
+        strategy: Hypothesis strategy cho từng phần tử
+        
+    Returns:
+        Strategy sinh tuple (a, b) với a <= b
+    """
+    return st.tuples(strategy, strategy).map(lambda pair: tuple(sorted(pair)))
+
+
+def integer_list_partitions(max_size: int = 50) -> Dict[str, Dict[str, Any]]:
+    """
+    Các phân vùng đầu vào mặc định cho hàm nhận list số nguyên
+    
+    Mỗi lớp biên (rỗng, một phần tử, trùng lặp, số âm, giá trị rất lớn)
+    có ngân sách ví dụ riêng thay vì phụ thuộc vào may rủi của một
+    strategy phẳng.
+    
+    Args:
+        max_size: Kích thước list tối đa
+        
+    Returns:
+        Dictionary {tên phân vùng: đặc tả phân vùng} dùng cho test_with_oracle
+    """
+    huge = st.one_of(st.integers(min_value=2 ** 62),
+                     st.integers(max_value=-2 ** 62))
+    return {
+        'empty': {'strategy': st.just([]), 'max_examples': 1},
+        'single': {
+            'strategy': st.lists(st.integers(), min_size=1, max_size=1),
+            'max_examples': 25
+        },
+        'duplicates': {
+            'strategy': st.lists(
+                st.integers(), min_size=1, max_size=max(1, max_size // 2)
+            ).map(lambda xs: xs + xs).flatmap(st.permutations),
+            'max_examples': 50
+        },
+        'negatives': {
+            'strategy': st.lists(st.integers(max_value=-1), min_size=1,
+                                 max_size=max_size),
+            'max_examples': 50
+        },
+        'huge_values': {
+            'strategy': st.lists(huge, min_size=1, max_size=max_size),
+            'max_examples': 50
+        },
+        'typical': {
+            'strategy': st.lists(st.integers(), max_size=max_size),
+            'max_examples': 100
+        }
+    }
+
+
+class PureCallMemo:
+    """
+    Bộ nhớ đệm LRU có giới hạn cho kết quả hàm thuần (pure) của sinh viên
+    
+    Khóa là digest của tham số đã pickle, nên cả tham số không hashable
+    (list, dict) cũng được ghi nhớ. Chỉ dùng cho hàm không sửa đổi tham số
+    và không phụ thuộc trạng thái ngoài, vì kết quả được dùng chung giữa
+    các lần gọi.
+    """
+    
+    def __init__(self, maxsize: int = 4096):
+        """
+        Khởi tạo memo
+        
+        Args:
+            maxsize: Số kết quả tối đa được giữ lại
+        """
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(args: tuple, kwargs: Dict[str, Any]):
+        """Tạo khóa từ tham số, trả về None nếu tham số không pickle được"""
+        try:
+            payload = pickle.dumps((args, sorted(kwargs.items())),
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+        return hashlib.blake2b(payload, digest_size=16).digest()
+    
+    def wrap(self, func: Callable) -> Callable:
+        """
+        Bọc hàm với memo
+        
+        Args:
+            func: Hàm sinh viên
+            
+        Returns:
+            Hàm đã được ghi nhớ kết quả
+        """
+        @functools.wraps(func)
+        def memoized(*args, **kwargs):
+            key = self.make_key(args, kwargs)
+            if key is not None and key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            
+            self.misses += 1
+            result = func(*args, **kwargs)
+            if key is not None:
+                self.cache[key] = result
+                if len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+            return result
+        
+        return memoized
+    
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê hit/miss của memo"""
+        calls = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / calls if calls > 0 else 0.0,
+            'size': len(self.cache)
+        }
 
 
 class PropertyBasedGrader:
@@ -24,6 +161,7 @@ def __init__(self, student_file: str):
         self.student_file = student_file
         self.student_module = None
         self.test_results = []
+        self.memos = {}
         
     def load_student_code(self) -> bool:
         """Tải module code của sinh viên"""
@@ -39,6 +177,36 @@ def load_student_code(self) -> bool:
             print(f"Lỗi khi tải code: {e}")
             return False
     
+    def declare_pure(self, *func_names: str, maxsize: int = 4096):
+        """
+        Khai báo các hàm thuần để ghi nhớ kết quả giữa các thuộc tính
+        
+        Các thuộc tính như giao hoán, kết hợp, phần tử đơn vị thường gọi
+        cùng f(a, b) trên các cặp trùng nhau; kết quả đã tính được dùng lại
+        thay vì chạy lại code sinh viên.
+        
+        Args:
+            func_names: Tên các hàm thuần
+            maxsize: Số kết quả tối đa được giữ cho mỗi hàm
+        """
+        for func_name in func_names:
+            self.memos[func_name] = PureCallMemo(maxsize)
+    
+    def get_function(self, func_name: str):
+        """
+        Lấy hàm sinh viên, đã bọc memo nếu hàm được khai báo là thuần
+        
+        Args:
+            func_name: Tên hàm
+            
+        Returns:
+            Hàm hoặc None nếu không tồn tại
+        """
+        func = getattr(self.student_module, func_name, None)
+        if func is not None and func_name in self.memos:
+            func = self.memos[func_name].wrap(func)
+        return func
+    
     def test_commutativity(self, func_name: str, strategy, 
                           weight: float = 1.0) -> Dict[str, Any]:
         """
@@ -52,7 +220,7 @@ def test_commutativity(self, func_name: str, strategy,
         Returns:
             Dictionary chứa kết quả
         """
-        func = getattr(self.student_module, func_name, None)
+        func = self.get_function(func_name)
         if func is None:
             return {
                 'test': 'commutativity',
@@ -61,7 +229,7 @@ def test_commutativity(self, func_name: str, strategy,
                 'error': f'Function {func_name} not found'
             }
         
-        failures = []
+        failures = FailureRecorder()
         
         @given(strategy, strategy)
         @settings(max_examples=1000, deadline=1000)
@@ -69,14 +237,13 @@ def test(a, b):
             try:
                 result1 = func(a, b)
                 result2 = func(b, a)
-                assert result1 == result2, \
-                    f"f({a},{b})={result1} != f({b},{a})={result2}"
-            except AssertionError as e:
-                failures.append(str(e))
-                raise
             except Exception as e:
-                failures.append(f"Runtime error: {e}")
+                failures.record("Runtime error: {}", e)
                 raise AssertionError(f"Error: {e}")
+            if result1 != result2:
+                failures.record("f({},{})={} != f({},{})={}",
+                                a, b, result1, b, a, result2)
+                raise AssertionError("Commutativity violated")
         
         try:
             test()
@@ -92,7 +259,8 @@ def test(a, b):
                 'passed': False,
                 'score': 0.0,
                 'function': func_name,
-                'failures': failures[:5]  # Chỉ lưu 5 lỗi đầu
+                'failure_count': failures.count,
+                'failures': failures.samples()
             }
         
         self.test_results.append(result)
@@ -111,7 +279,7 @@ def test_associativity(self, func_name: str, strategy,
         Returns:
             Dictionary chứa kết quả
         """
-        func = getattr(self.student_module, func_name, None)
+        func = self.get_function(func_name)
         if func is None:
             return {
                 'test': 'associativity',
@@ -120,7 +288,7 @@ def test_associativity(self, func_name: str, strategy,
                 'error': f'Function {func_name} not found'
             }
         
-        failures = []
+        failures = FailureRecorder()
         
         @given(strategy, strategy, strategy)
         @settings(max_examples=1000, deadline=1000)
@@ -128,11 +296,13 @@ def test(a, b, c):
             try:
                 left = func(func(a, b), c)
                 right = func(a, func(b, c))
-                assert left == right, \
-                    f"f(f({a},{b}),{c})={left} != f({a},f({b},{c}))={right}"
-            except AssertionError as e:
-                failures.append(str(e))
-                raise
+            except Exception as e:
+                failures.record("Runtime error: {}", e)
+                raise AssertionError(f"Error: {e}")
+            if left != right:
+                failures.record("f(f({},{}),{})={} != f({},f({},{}))={}",
+                                a, b, c, left, a, b, c, right)
+                raise AssertionError("Associativity violated")
         
         try:
             test()
@@ -148,7 +318,8 @@ def test(a, b, c):
                 'passed': False,
                 'score': 0.0,
                 'function': func_name,
-                'failures': failures[:5]
+                'failure_count': failures.count,
+                'failures': failures.samples()
             }
         
         self.test_results.append(result)
@@ -168,7 +339,7 @@ def test_identity(self, func_name: str, identity_value: Any,
         Returns:
             Dictionary chứa kết quả
         """
-        func = getattr(self.student_module, func_name, None)
+        func = self.get_function(func_name)
         if func is None:
             return {
                 'test': 'identity',
@@ -177,7 +348,7 @@ def test_identity(self, func_name: str, identity_value: Any,
                 'error': f'Function {func_name} not found'
             }
         
-        failures = []
+        failures = FailureRecorder()
         
         @given(strategy)
         @settings(max_examples=500)
@@ -185,11 +356,17 @@ def test(a):
             try:
                 result1 = func(a, identity_value)
                 result2 = func(identity_value, a)
-                assert result1 == a, f"f({a},{identity_value})={result1} != {a}"
-                assert result2 == a, f"f({identity_value},{a})={result2} != {a}"
-            except AssertionError as e:
-                failures.append(str(e))
-                raise
+            except Exception as e:
+                failures.record("Runtime error: {}", e)
+                raise AssertionError(f"Error: {e}")
+            if result1 != a:
+                failures.record("f({},{})={} != {}",
+                                a, identity_value, result1, a)
+                raise AssertionError("Identity violated")
+            if result2 != a:
+                failures.record("f({},{})={} != {}",
+                                identity_value, a, result2, a)
+                raise AssertionError("Identity violated")
         
         try:
             test()
@@ -205,7 +382,8 @@ def test(a):
                 'passed': False,
                 'score': 0.0,
                 'function': func_name,
-                'failures': failures[:5]
+                'failure_count': failures.count,
+                'failures': failures.samples()
             }
         
         self.test_results.append(result)
@@ -224,7 +402,7 @@ def test_monotonicity(self, func_name: str, strategy,
         Returns:
             Dictionary chứa kết quả
         """
-        func = getattr(self.student_module, func_name, None)
+        func = self.get_function(func_name)
         if func is None:
             return {
                 'test': 'monotonicity',
@@ -233,20 +411,31 @@ def test_monotonicity(self, func_name: str, strategy,
                 'error': f'Function {func_name} not found'
             }
         
-        failures = []
+        failures = FailureRecorder()
+        # Đếm số ví dụ đã chạy và số ví dụ không thỏa điều kiện a <= b
+        # (ví dụ rỗng - không kiểm tra được gì)
+        stats = {'examples': 0, 'vacuous': 0}
         
-        @given(strategy, strategy)
-        @settings(max_examples=1000)
-        def test(a, b):
+        @given(ordered_pairs(strategy))
+        @settings(max_examples=500)
+        def test(pair):
+            a, b = pair
+            stats['examples'] += 1
+            # Cặp đã được sắp xếp, nhưng vẫn có thể không so sánh được
+            # (ví dụ NaN) nên vẫn giữ điều kiện tiên quyết
+            if not a <= b:
+                stats['vacuous'] += 1
+                return
             try:
-                if a <= b:
-                    fa = func(a)
-                    fb = func(b)
-                    assert fa <= fb, \
-                        f"{a}<={b} but f({a})={fa} > f({b})={fb}"
-            except AssertionError as e:
-                failures.append(str(e))
-                raise
+                fa = func(a)
+                fb = func(b)
+            except Exception as e:
+                failures.record("Runtime error: {}", e)
+                raise AssertionError(f"Error: {e}")
+            if not fa <= fb:
+                failures.record("{}<={} but f({})={} > f({})={}",
+                                a, b, a, fa, b, fb)
+                raise AssertionError("Monotonicity violated")
         
         try:
             test()
@@ -262,9 +451,13 @@ def test(a, b):
                 'passed': False,
                 'score': 0.0,
                 'function': func_name,
-                'failures': failures[:5]
+                'failure_count': failures.count,
+                'failures': failures.samples()
             }
         
+        result['examples'] = stats['examples']
+        result['vacuous_examples'] = stats['vacuous']
+        
         self.test_results.append(result)
         return result
     
@@ -281,7 +474,7 @@ def test_idempotence(self, func_name: str, strategy,
         Returns:
             Dictionary chứa kết quả
         """
-        func = getattr(self.student_module, func_name, None)
+        func = self.get_function(func_name)
         if func is None:
             return {
                 'test': 'idempotence',
@@ -290,7 +483,7 @@ def test_idempotence(self, func_name: str, strategy,
                 'error': f'Function {func_name} not found'
             }
         
-        failures = []
+        failures = FailureRecorder()
         
         @given(strategy)
         @settings(max_examples=500)
@@ -298,11 +491,12 @@ def test(a):
             try:
                 once = func(a)
                 twice = func(once)
-                assert once == twice, \
-                    f"f(f({a}))={twice} != f({a})={once}"
-            except AssertionError as e:
-                failures.append(str(e))
-                raise
+            except Exception as e:
+                failures.record("Runtime error: {}", e)
+                raise AssertionError(f"Error: {e}")
+            if once != twice:
+                failures.record("f(f({}))={} != f({})={}", a, twice, a, once)
+                raise AssertionError("Idempotence violated")
         
         try:
             test()
@@ -318,14 +512,16 @@ def test(a):
                 'passed': False,
                 'score': 0.0,
                 'function': func_name,
-                'failures': failures[:5]
+                'failure_count': failures.count,
+                'failures': failures.samples()
             }
         
         self.test_results.append(result)
         return result
     
     def test_with_oracle(self, func_name: str, oracle: Callable,
-                        strategy, weight: float = 1.0) -> Dict[str, Any]:
+                        strategy=None, weight: float = 1.0,
+                        partitions: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Kiểm tra với reference implementation
         
@@ -334,11 +530,21 @@ def test_with_oracle(self, func_name: str, oracle: Callable,
             oracle: Hàm tham chiếu
             strategy: Hypothesis strategy
             weight: Trọng số
+            partitions: Các phân vùng đầu vào có tên (tùy chọn), dạng
+                {tên: strategy} hoặc {tên: {'strategy', 'max_examples',
+                'weight'}}. Khi có, mỗi phân vùng chạy với ngân sách riêng
+                và được chấm điểm từng phần theo tỷ lệ pass
             
         Returns:
             Dictionary chứa kết quả
+        
+        Raises:
+            ValueError: Nếu không có cả strategy lẫn partitions
         """
-        student_func = getattr(self.student_module, func_name, None)
+        if strategy is None and not partitions:
+            raise ValueError("test_with_oracle requires a strategy or partitions")
+        
+        student_func = self.get_function(func_name)
         if student_func is None:
             return {
                 'test': 'oracle',
@@ -347,7 +553,14 @@ def test_with_oracle(self, func_name: str, oracle: Callable,
                 'error': f'Function {func_name} not found'
             }
         
-        failures = []
+        if partitions:
+            result = self._test_oracle_partitions(
+                func_name, student_func, oracle, partitions, weight
+            )
+            self.test_results.append(result)
+            return result
+        
+        failures = FailureRecorder()
         
         @given(strategy)
         @settings(max_examples=1000, deadline=2000)
@@ -355,14 +568,13 @@ def test(input_data):
             try:
                 student_result = student_func(input_data)
                 oracle_result = oracle(input_data)
-                assert student_result == oracle_result, \
-                    f"Input: {input_data}\nStudent: {student_result}\nOracle: {oracle_result}"
-            except AssertionError as e:
-                failures.append(str(e))
-                raise
             except Exception as e:
-                failures.append(f"Runtime error: {e}")
+                failures.record("Runtime error: {}", e)
                 raise AssertionError(f"Error: {e}")
+            if student_result != oracle_result:
+                failures.record("Input: {}\nStudent: {}\nOracle: {}",
+                                input_data, student_result, oracle_result)
+                raise AssertionError("Oracle mismatch")
         
         try:
             test()
@@ -374,7 +586,7 @@ def test(input_data):
             }
         except Exception:
             # Tính điểm dựa trên tỷ lệ thất bại
-            failure_rate = len(failures) / 1000
+            failure_rate = failures.count / 1000
             partial_score = max(0, 10.0 * (1 - failure_rate) * weight)
             result = {
                 'test': 'oracle',
@@ -382,12 +594,110 @@ def test(input_data):
                 'score': partial_score,
                 'function': func_name,
                 'failure_rate': failure_rate,
-                'failures': failures[:5]
+                'failure_count': failures.count,
+                'failures': failures.samples()
             }
         
         self.test_results.append(result)
         return result
     
+    def _test_oracle_partitions(self, func_name: str, student_func: Callable,
+                                oracle: Callable, partitions: Dict[str, Any],
+                                weight: float) -> Dict[str, Any]:
+        """
+        Chạy kiểm tra oracle trên từng phân vùng đầu vào
+        
+        Ví dụ sai không dừng Hypothesis (không shrink) để ngân sách của
+        phân vùng được dùng hết và tỷ lệ pass phản ánh đúng số ví dụ.
+        
+        Args:
+            func_name: Tên hàm sinh viên
+            student_func: Hàm sinh viên
+            oracle: Hàm tham chiếu
+            partitions: Đặc tả các phân vùng
+            weight: Trọng số
+            
+        Returns:
+            Dictionary chứa kết quả, gồm tỷ lệ pass từng phân vùng
+        """
+        partition_results = {}
+        all_failures = []
+        
+        for name, spec in partitions.items():
+            if not isinstance(spec, dict):
+                spec = {'strategy': spec}
+            
+            stats = {'examples': 0, 'passed': 0}
+            failures = FailureRecorder(max_samples=3)
+            
+            @given(spec['strategy'])
+            @settings(max_examples=spec.get('max_examples', 100),
+                      deadline=2000)
+            def test(input_data):
+                stats['examples'] += 1
+                try:
+                    student_result = student_func(input_data)
+                    oracle_result = oracle(input_data)
+                except Exception as e:
+                    failures.record(f"[{name}] Runtime error: {{}}", e)
+                    return
+                if student_result == oracle_result:
+                    stats['passed'] += 1
+                else:
+                    failures.record(
+                        f"[{name}] Input: {{}}\nStudent: {{}}\nOracle: {{}}",
+                        input_data, student_result, oracle_result
+                    )
+            
+            error = None
+            try:
+                test()
+            except Exception as e:
+                # DeadlineExceeded, FailedHealthCheck, Flaky...: phân vùng
+                # bị tính là thất bại. Số lần gọi test() gồm cả các lần
+                # Hypothesis chạy lại khi shrink, nên số pass không đáng tin
+                error = f"{type(e).__name__}: {e}"
+                failures.record(f"[{name}] Hypothesis error: {{}}", e)
+                stats['passed'] = 0
+            
+            pass_rate = (stats['passed'] / stats['examples']
+                         if stats['examples'] > 0 else 0.0)
+            partition_results[name] = {
+                'examples': stats['examples'],
+                'passed': stats['passed'],
+                'pass_rate': pass_rate,
+                'weight': spec.get('weight', 1.0),
+                'failure_count': failures.count,
+                'failures': failures.samples()
+            }
+            if error is not None:
+                partition_results[name]['error'] = error
+            all_failures.extend(partition_results[name]['failures'])
+        
+        total_weight = sum(p['weight'] for p in partition_results.values())
+        weighted_rate = (
+            sum(p['pass_rate'] * p['weight'] for p in partition_results.values())
+            / total_weight if total_weight > 0 else 0.0
+        )
+        
+        total_examples = sum(p['examples'] for p in partition_results.values())
+        total_passed = sum(p['passed'] for p in partition_results.values())
+        
+        result = {
+            'test': 'oracle',
+            'passed': all(p['pass_rate'] == 1.0 and 'error' not in p
+                          for p in partition_results.values()),
+            'score': 10.0 * weighted_rate * weight,
+            'function': func_name,
+            'failure_rate': (1 - total_passed / total_examples
+                             if total_examples > 0 else 0.0),
+            'partitions': partition_results
+        }
+        if all_failures:
+            result['failures'] = all_failures[:5]
+        
+        return result
+    
     def test_custom_invariants(self, func_name: str, 
                               invariants: List[Callable],
                               strategy, weight: float = 1.0) -> Dict[str, Any]:
@@ -403,7 +713,7 @@ def test_custom_invariants(self, func_name: str,
         Returns:
             Dictionary chứa kết quả
         """
-        func = getattr(self.student_module, func_name, None)
+        func = self.get_function(func_name)
         if func is None:
             return {
                 'test': 'custom_invariants',
@@ -415,18 +725,21 @@ def test_custom_invariants(self, func_name: str,
         invariant_results = []
         
         for invariant in invariants:
-            failures = []
+            failures = FailureRecorder(max_samples=3)
             
             @given(strategy)
             @settings(max_examples=500)
             def test(input_data):
-                try:
-                    result = func(input_data)
-                    assert invariant(input_data, result), \
+                result = func(input_data)
+                if not invariant(input_data, result):
+                    failures.record(
+                        f"Invariant {invariant.__name__} violated: "
+                        f"f({{}})={{}}",
+                        input_data, result
+                    )
+                    raise AssertionError(
                         f"Invariant {invariant.__name__} violated"
-                except AssertionError as e:
-                    failures.append(str(e))
-                    raise
+                    )
             
             try:
                 test()
@@ -438,7 +751,8 @@ def test(input_data):
                 invariant_results.append({
                     'invariant': invariant.__name__,
                     'passed': False,
-                    'failures': failures[:3]
+                    'failure_count': failures.count,
+                    'failures': failures.samples()
                 })
         
         passed_count = sum(1 for r in invariant_results if r['passed'])
@@ -487,7 +801,7 @@ def grade(self) -> Dict[str, Any]:
         
         passed_tests = sum(1 for r in self.test_results if r.get('passed', False))
         
-        return {
+        result = {
             'score': round(normalized_score, 2),
             'max_score': 10.0,
             'total_score': total_score,
@@ -496,6 +810,13 @@ def grade(self) -> Dict[str, Any]:
             'total_tests': total_tests,
             'test_results': self.test_results
         }
+        
+        if self.memos:
+            result['memo'] = {
+                func_name: memo.stats() for func_name, memo in self.memos.items()
+            }
+        
+        return result
     
     def generate_report(self) -> str:
         """
@@ -512,6 +833,10 @@ def generate_report(self) -> str:
         report.append("=" * 70)
         report.append(f"Final Score: {result['score']:.2f}/{result['max_score']}")
         report.append(f"Tests Passed: {result['passed_tests']}/{result['total_tests']}")
+        for func_name, memo in result.get('memo', {}).items():
+            report.append(f"Memo {func_name}: {memo['hits']} hits / "
+                          f"{memo['hits'] + memo['misses']} calls "
+                          f"({memo['hit_rate']:.1%})")
         report.append("")
         
         for test_result in result['test_results']:
@@ -520,11 +845,21 @@ def generate_report(self) -> str:
             report.append(f"  Function: {test_result.get('function', 'N/A')}")
             report.append(f"  Score: {test_result.get('score', 0):.2f}/10")
             
+            if 'vacuous_examples' in test_result:
+                report.append(f"  Examples: {test_result['examples']} "
+                              f"(vacuous: {test_result['vacuous_examples']})")
+            
             if not test_result.get('passed') and 'failures' in test_result:
                 report.append("  Sample failures:")
                 for failure in test_result['failures']:
                     report.append(f"    - {failure}")
             
+            if 'partitions' in test_result:
+                report.append("  Partitions:")
+                for name, part in test_result['partitions'].items():
+                    report.append(f"    {name}: {part['passed']}/{part['examples']} "
+                                  f"({part['pass_rate']:.1%})")
+            
             if 'invariant_results' in test_result:
                 report.append("  Invariant results:")
                 for inv in test_result['invariant_results']:
@@ -7,8 +7,14 @@
 import subprocess
 import tempfile
 import shutil
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Callable, Union
 import json
+import reprlib
+import hashlib
+import pickle
+import ast
+import threading
+from collections import OrderedDict
 
 
 def safe_import_module(file_path: str, module_name: str = "student_module"):
@@ -253,6 +259,620 @@ def print_progress_bar(iteration: int, total: int, prefix: str = '',
         print()
 
 
+def truncate_text(text: Optional[str], max_length: int = 1000) -> Optional[str]:
+    """
+    Rút gọn chuỗi dài, ghi chú số ký tự bị cắt
+    
+    Args:
+        text: Chuỗi cần rút gọn (có thể None)
+        max_length: Số ký tự tối đa được giữ
+        
+    Returns:
+        Chuỗi đã rút gọn
+    """
+    if text is None or len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}... [{len(text) - max_length} more chars]"
+
+
+class FailureRecorder:
+    """
+    Ghi nhận lỗi có giới hạn, định dạng lười
+    
+    Đếm tất cả các lỗi nhưng chỉ giữ lại một số mẫu; thông điệp của mẫu
+    chỉ được định dạng (với repr đã rút gọn) khi cần hiển thị, nên các
+    đầu vào lớn không bị repr ở mỗi lần thất bại.
+    """
+    
+    def __init__(self, max_samples: int = 5, max_length: int = 200,
+                 max_message_length: int = 1000):
+        """
+        Khởi tạo recorder
+        
+        Args:
+            max_samples: Số mẫu lỗi tối đa được giữ
+            max_length: Độ dài tối đa của repr mỗi giá trị
+            max_message_length: Độ dài tối đa của mỗi thông điệp
+        """
+        self.max_samples = max_samples
+        self.max_message_length = max_message_length
+        self.count = 0
+        self._samples = []
+        self._last = None
+        
+        self._repr = reprlib.Repr()
+        self._repr.maxstring = max_length
+        self._repr.maxother = max_length
+        self._repr.maxlong = max_length
+        self._repr.maxlist = 20
+        self._repr.maxtuple = 20
+        self._repr.maxdict = 10
+        self._repr.maxset = 10
+    
+    def record(self, message: Union[str, Callable[..., str]], *args):
+        """
+        Ghi nhận một lỗi
+        
+        Args:
+            message: Chuỗi format dùng {} cho mỗi tham số (tham số được
+                thay bằng repr rút gọn), hoặc hàm nhận *args trả về chuỗi
+            args: Các giá trị liên quan đến lỗi
+        """
+        self.count += 1
+        entry = (message, args)
+        if len(self._samples) < self.max_samples:
+            self._samples.append(entry)
+        else:
+            # Giữ lỗi cuối cùng (thường là ví dụ đã được shrink)
+            self._last = entry
+    
+    def format_entry(self, entry) -> str:
+        """Định dạng một mẫu lỗi"""
+        message, args = entry
+        if callable(message):
+            text = message(*args)
+        else:
+            text = message.format(*(self._repr.repr(arg) for arg in args))
+        return truncate_text(text, self.max_message_length)
+    
+    def samples(self) -> List[str]:
+        """
+        Các mẫu lỗi đã định dạng
+        
+        Returns:
+            Tối đa max_samples thông điệp: các lỗi đầu tiên và lỗi cuối cùng
+        """
+        entries = self._samples
+        if self._last is not None:
+            entries = entries[:self.max_samples - 1] + [self._last]
+        return [self.format_entry(entry) for entry in entries]
+    
+    def __len__(self) -> int:
+        return self.count
+
+
+def content_digest(value: Any) -> str:
+    """
+    Digest nội dung của một giá trị (pickle, dự phòng bằng repr)
+    
+    Args:
+        value: Giá trị cần băm
+        
+    Returns:
+        Chuỗi hex 16 ký tự
+    """
+    try:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        payload = repr(value).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def _value_shape(value: Any) -> Dict[str, Any]:
+    """Kiểu và shape (mảng) hoặc độ dài (container) của một giá trị"""
+    info = {'type': type(value).__name__}
+    shape = getattr(value, 'shape', None)
+    if isinstance(shape, tuple):
+        info['shape'] = list(shape)
+    elif hasattr(value, '__len__'):
+        try:
+            info['length'] = len(value)
+        except TypeError:
+            pass
+    return info
+
+
+def describe_input(value: Any, preview_length: int = 80,
+                   digest: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Mô tả gọn một đầu vào thay cho str(value)
+    
+    Với các list 10^4..10^6 phần tử, str() tạo ra hàng MB văn bản; mô tả
+    chỉ gồm kiểu, shape/độ dài, digest nội dung và một đoạn xem trước.
+    Tuple tham số được mô tả thêm từng tham số trong 'args'.
+    
+    Args:
+        value: Đầu vào (thường là tuple tham số)
+        preview_length: Độ dài tối đa của đoạn xem trước
+        digest: Digest đã tính sẵn (mặc định tính bằng content_digest)
+        
+    Returns:
+        Dictionary với 'type', 'shape' hoặc 'length', 'digest', 'preview'
+    """
+    preview = reprlib.Repr()
+    preview.maxlist = preview.maxtuple = 8
+    preview.maxdict = preview.maxset = 5
+    preview.maxstring = preview.maxother = preview_length
+    
+    description = _value_shape(value)
+    if isinstance(value, tuple):
+        description['args'] = [_value_shape(arg) for arg in value]
+    description['digest'] = digest or content_digest(value)
+    description['preview'] = truncate_text(preview.repr(value), preview_length)
+    return description
+
+
+class InputStore:
+    """
+    Kho đầu vào dùng chung giữa các grader, tra cứu theo digest
+    
+    Kết quả chỉ giữ mô tả gọn (describe_input); đầu vào đầy đủ được lưu
+    một lần ở đây và lấy lại bằng digest khi cần.
+    """
+    
+    def __init__(self):
+        self._inputs = {}
+    
+    def put(self, value: Any, digest: Optional[str] = None) -> str:
+        """
+        Lưu một đầu vào
+        
+        Args:
+            value: Đầu vào
+            digest: Digest đã tính sẵn (tùy chọn)
+            
+        Returns:
+            Digest của đầu vào
+        """
+        if digest is None:
+            digest = content_digest(value)
+        self._inputs.setdefault(digest, value)
+        return digest
+    
+    def get(self, digest: str) -> Any:
+        """Lấy đầu vào theo digest (KeyError nếu không có)"""
+        return self._inputs[digest]
+    
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._inputs
+    
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+
+def copy_tree(tree: ast.AST) -> ast.AST:
+    """Bản sao sâu của một AST (pickle nhanh hơn copy.deepcopy khoảng 3 lần)"""
+    return pickle.loads(pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def deep_sizeof(value: Any) -> int:
+    """
+    Ước lượng bộ nhớ của một giá trị (artifact cache, bản sao tham số...)
+    
+    Duyệt sâu các container và thuộc tính đối tượng (ví dụ các list/dict
+    của ASTAnalyzer). Node AST (thuộc cây, đã tính trong kích thước của
+    mục cache) và các lớp (dùng chung) không được tính.
+    """
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (ast.AST, type)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(vars(obj))
+    return size
+
+
+class ParseCache:
+    """
+    Cache dùng chung cho mã nguồn, AST và các artifact dẫn xuất
+    
+    Khóa là digest nội dung mã nguồn, nên cùng một file (hoặc hai bài nộp
+    giống hệt nhau) chỉ được parse một lần mỗi lần chạy, dù nhiều thành
+    phần (ASTGrader, PlagiarismDetector, ...) cùng cần AST. Các artifact
+    (mã đã chuẩn hóa, fingerprint, kết quả phân tích) được tính một lần và
+    lưu kèm. Khi tổng bộ nhớ ước lượng vượt max_bytes, các mục ít dùng
+    gần đây nhất bị loại (LRU).
+    
+    AST trả về là bản dùng chung: không được sửa đổi. Dùng fresh_tree()
+    khi cần một cây có thể biến đổi.
+    """
+    
+    # Bộ nhớ AST xấp xỉ theo số ký tự mã nguồn (đo bằng tracemalloc)
+    AST_BYTES_PER_CHAR = 40
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Khởi tạo cache
+        
+        Args:
+            max_bytes: Giới hạn bộ nhớ ước lượng của toàn bộ cache
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def source_digest(source: str) -> str:
+        """Digest nội dung của mã nguồn"""
+        return hashlib.blake2b(source.encode('utf-8', 'surrogatepass'),
+                               digest_size=16).hexdigest()
+    
+    def _entry(self, source: str) -> Dict[str, Any]:
+        """Lấy (hoặc tạo bằng cách parse) mục của một mã nguồn"""
+        key = self.source_digest(source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        
+        entry = {'key': key, 'source': source, 'tree': None, 'error': None,
+                 'artifacts': {}, 'size': sys.getsizeof(source)}
+        try:
+            entry['tree'] = ast.parse(source)
+            entry['size'] += len(source) * self.AST_BYTES_PER_CHAR
+        except (SyntaxError, ValueError) as e:
+            entry['error'] = e
+        
+        with self._lock:
+            # Luồng khác có thể đã parse cùng nội dung
+            existing = self._entries.get(key)
+            if existing is not None:
+                return existing
+            self._entries[key] = entry
+            self.total_bytes += entry['size']
+            self._evict()
+        return entry
+    
+    def _evict(self):
+        """Loại các mục LRU cho tới khi về dưới max_bytes (giữ mục mới nhất)"""
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry['size']
+    
+    def parse(self, source: str) -> ast.AST:
+        """
+        AST dùng chung của mã nguồn
+        
+        Args:
+            source: Mã nguồn
+            
+        Returns:
+            ast.Module (không được sửa đổi)
+            
+        Raises:
+            SyntaxError: Nếu mã nguồn không hợp lệ (lỗi cũng được cache)
+        """
+        entry = self._entry(source)
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['tree']
+    
+    def fresh_tree(self, source: str) -> ast.AST:
+        """Bản sao AST có thể sửa đổi (sao chép, không parse lại)"""
+        return copy_tree(self.parse(source))
+    
+    def artifact(self, source: str, name: Any,
+                 build: Callable[[ast.AST], Any]) -> Any:
+        """
+        Artifact dẫn xuất từ AST, tính một lần cho mỗi nội dung
+        
+        Args:
+            source: Mã nguồn
+            name: Tên artifact (hashable, ví dụ 'fingerprint')
+            build: Hàm nhận AST dùng chung, trả về artifact
+            
+        Returns:
+            Artifact đã cache
+            
+        Raises:
+            SyntaxError: Nếu mã nguồn không hợp lệ
+        """
+        entry = self._entry(source)
+        artifacts = entry['artifacts']
+        if name in artifacts:
+            return artifacts[name]
+        if entry['error'] is not None:
+            raise entry['error']
+        
+        value = build(entry['tree'])
+        with self._lock:
+            if name not in artifacts:
+                artifacts[name] = value
+                size = deep_sizeof(value)
+                entry['size'] += size
+                if self._entries.get(entry['key']) is entry:
+                    self.total_bytes += size
+                    self._evict()
+            return artifacts[name]
+    
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+    
+    def __contains__(self, source: str) -> bool:
+        return self.source_digest(source) in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResultCache:
+    """
+    Cache LRU cho các kết quả tính theo digest nội dung
+    
+    Dùng cho chấm tăng dần: chỉ số AST của từng hàm và kết quả test được
+    lưu theo digest của mã liên quan, nên bài nộp lại chỉ phải phân tích
+    và chạy lại phần đã thay đổi. Giới hạn theo cả số mục và bộ nhớ ước
+    lượng (deep_sizeof) để cache sống lâu trên máy chấm không phình ra.
+    """
+    
+    def __init__(self, max_entries: int = 100000,
+                 max_bytes: int = 64 * 1024 * 1024):
+        """
+        Khởi tạo cache
+        
+        Args:
+            max_entries: Số mục tối đa (loại mục ít dùng gần đây nhất)
+            max_bytes: Giới hạn bộ nhớ ước lượng của toàn bộ cache
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+    
+    def fetch(self, key: Any, build: Callable[[], Any]) -> Any:
+        """
+        Lấy kết quả theo khóa, tính bằng build() nếu chưa có
+        
+        Args:
+            key: Khóa hashable
+            build: Hàm không tham số tính kết quả
+            
+        Returns:
+            Kết quả đã cache
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = build()
+        self.put(key, value)
+        return value
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Lấy kết quả (default nếu chưa có), cập nhật hits/misses"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key: Any, value: Any):
+        """Lưu kết quả"""
+        size = deep_sizeof(key) + deep_sizeof(value)
+        with self._lock:
+            self.total_bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            # Loại mục LRU (giữ mục mới nhất)
+            while len(self._entries) > 1 and (
+                    len(self._entries) > self.max_entries
+                    or self.total_bytes > self.max_bytes):
+                old_key, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(old_key)
+    
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+    
+    def __contains__(self, key: Any) -> bool:
+        return key in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FunctionIndex:
+    """
+    Chỉ mục các đơn vị cấp module (hàm, class, câu lệnh) của một file
+    
+    Mỗi câu lệnh cấp module là một đơn vị với digest của đúng đoạn mã của
+    nó (kể cả decorator), không phụ thuộc vị trí trong file. Các câu
+    lệnh không phải def/class gộp thành digest module. dependency_digest()
+    của một hàm bao gồm hàm đó, các hàm/class nó tham chiếu (bắc cầu) và
+    digest module, nên chỉ đổi khi kết quả chạy hàm có thể đổi.
+    """
+    
+    DEF_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    
+    def __init__(self, source: str, tree: ast.Module):
+        """
+        Xây dựng chỉ mục
+        
+        Args:
+            source: Mã nguồn
+            tree: AST của mã nguồn (không bị sửa đổi)
+        """
+        # Offset cột của AST tính theo byte UTF-8
+        lines = source.encode('utf-8', 'surrogatepass').splitlines()
+        self.units = []
+        self.digests = {}
+        self._references = None
+        self._dependency_digests = {}
+        
+        module_digests = []
+        for stmt in tree.body:
+            digest = self._digest(self._segment(lines, stmt))
+            name = stmt.name if isinstance(stmt, self.DEF_TYPES) else None
+            self.units.append((name, stmt, digest))
+            if name is None:
+                module_digests.append(digest)
+            elif name in self.digests:
+                # Định nghĩa lại: phụ thuộc vào mọi định nghĩa cùng tên
+                self.digests[name] = self._digest(self.digests[name] + digest)
+            else:
+                self.digests[name] = digest
+        self.module_digest = self._digest(' '.join(module_digests))
+    
+    @staticmethod
+    def _segment(lines: List[bytes], stmt: ast.stmt) -> bytes:
+        """
+        Đoạn mã đúng của một câu lệnh (kể cả decorator)
+        
+        Cắt theo cả dòng và cột, nên hai câu lệnh trên cùng một dòng
+        (x = 1; y = 2) có đoạn mã và digest khác nhau.
+        """
+        start_line, start_col = min(
+            [(stmt.lineno, stmt.col_offset)]
+            + [(decorator.lineno, decorator.col_offset)
+               for decorator in getattr(stmt, 'decorator_list', [])])
+        end_line, end_col = stmt.end_lineno, stmt.end_col_offset
+        if start_line == end_line:
+            return lines[start_line - 1][start_col:end_col]
+        return b'\n'.join([lines[start_line - 1][start_col:]]
+                           + lines[start_line:end_line - 1]
+                           + [lines[end_line - 1][:end_col]])
+    
+    @staticmethod
+    def _digest(text: Union[str, bytes]) -> str:
+        if isinstance(text, str):
+            text = text.encode('utf-8', 'surrogatepass')
+        return hashlib.blake2b(text, digest_size=8).hexdigest()
+    
+    @property
+    def references(self) -> Dict[str, set]:
+        """Các hàm/class cấp module mà mỗi hàm/class tham chiếu (tính khi cần)"""
+        if self._references is None:
+            references = {name: set() for name in self.digests}
+            for name, stmt, _ in self.units:
+                if name is not None:
+                    references[name].update(
+                        node.id for node in ast.walk(stmt)
+                        if isinstance(node, ast.Name) and node.id in self.digests)
+            for name, names in references.items():
+                names.discard(name)
+            self._references = references
+        return self._references
+    
+    def dependencies(self, name: str) -> set:
+        """Hàm/class name cùng mọi hàm/class nó tham chiếu bắc cầu"""
+        if name not in self.digests:
+            return set()
+        seen = {name}
+        stack = [name]
+        while stack:
+            for ref in self.references[stack.pop()]:
+                if ref not in seen:
+                    seen.add(ref)
+                    stack.append(ref)
+        return seen
+    
+    def dependency_digest(self, name: str) -> str:
+        """
+        Digest của mọi mã mà việc chạy hàm name phụ thuộc
+        
+        Args:
+            name: Tên hàm/class cấp module (có thể chưa tồn tại)
+            
+        Returns:
+            Digest; đổi khi hàm, hàm nó gọi hoặc mã cấp module đổi
+        """
+        if name not in self._dependency_digests:
+            parts = [self.module_digest, name]
+            parts.extend(f"{dep}:{self.digests[dep]}"
+                         for dep in sorted(self.dependencies(name)))
+            self._dependency_digests[name] = self._digest(' '.join(parts))
+        return self._dependency_digests[name]
+    
+    def diff(self, previous: 'FunctionIndex') -> Dict[str, Any]:
+        """
+        So sánh với phiên bản trước ở mức hàm
+        
+        Args:
+            previous: FunctionIndex của phiên bản trước
+            
+        Returns:
+            Dictionary với 'added', 'removed', 'changed', 'unchanged',
+            'module_changed' và 'affected' (hàm cần chạy lại test: đã đổi
+            hoặc phụ thuộc vào phần đã đổi)
+        """
+        names = self.digests
+        old_names = previous.digests
+        return {
+            'added': sorted(set(names) - set(old_names)),
+            'removed': sorted(set(old_names) - set(names)),
+            'changed': sorted(name for name in names
+                              if name in old_names
+                              and names[name] != old_names[name]),
+            'unchanged': sorted(name for name in names
+                                if names[name] == old_names.get(name)),
+            'module_changed': self.module_digest != previous.module_digest,
+            'affected': sorted(name for name in names
+                               if self.dependency_digest(name)
+                               != previous.dependency_digest(name))
+        }
+
+
+def function_index(source: str,
+                   parse_cache: Optional['ParseCache'] = None) -> FunctionIndex:
+    """
+    FunctionIndex của mã nguồn (cache trong parse_cache)
+    
+    Raises:
+        SyntaxError: Nếu mã nguồn không hợp lệ
+    """
+    cache = parse_cache if parse_cache is not None else shared_parse_cache
+    return cache.artifact(source, 'function_index',
+                          lambda tree: FunctionIndex(source, tree))
+
+
+# Cache parse dùng chung cho cả tiến trình
+shared_parse_cache = ParseCache()
+
+# Cache kết quả chấm tăng dần dùng chung cho cả tiến trình
+shared_result_cache = ResultCache()
+
+
 # Constants
 DEFAULT_TIMEOUT = 30
 MAX_FILE_SIZE = 1024 * 1024  # 1MB
@@ -0,0 +1,403 @@
+"""
+tests/test_ast_grader.py - Unit tests for ASTGrader
+Chức năng: Test phân tích AST gộp một lượt duyệt
+"""
+
+import pytest
+import ast
+import os
+import sys
+import zipfile
+from src.ast_grader import ASTGrader, ASTAnalyzer, analyze_cohort
+from src.plagiarism_detector import PlagiarismDetector
+from src.utils import ParseCache, ResultCache, FunctionIndex
+from src.ast_rules import ASTRule, RULE_REGISTRY, register_rule, resolve_rules
+
+
+class TestASTGrader:
+    """Test suite for ASTGrader."""
+    
+    def test_grade_complex_code(self, sample_complex_code, structure_requirements):
+        """
+        Test: Full grading of the complex code fixture.
+        Verify: Metrics of every check come from the fused pass.
+        """
+        grader = ASTGrader(sample_complex_code)
+        result = grader.grade(structure_requirements=structure_requirements)
+        
+        checks = result['results']
+        assert checks['complexity']['function_complexities']['complex_function'] == 4
+        assert checks['complexity']['function_complexities']['add'] == 3
+        assert checks['structure']['found']['functions'] == 4
+        assert checks['structure']['found']['classes'] == 1
+        assert checks['naming']['passed'] is True
+        assert checks['documentation']['coverage'] == 1.0
+        assert 0 <= result['score'] <= 10
+    
+    def test_single_pass_reused_by_checks(self, sample_complex_code):
+        """
+        Test: grade() analyzes once and the check methods reuse it.
+        """
+        grader = ASTGrader(sample_complex_code)
+        grader.grade(check_docs=False)
+        analysis = grader.analysis
+        
+        assert grader.analysis_for('complexity') is analysis
+        assert grader.analysis_for('docs') is not analysis
+        assert grader.check_documentation()['total'] == 5
+    
+    def test_unparse_on_demand(self):
+        """
+        Test: Decorators and comprehensions are kept as nodes until needed.
+        """
+        tree = ast.parse(
+            "@staticmethod\n"
+            "def squares(n):\n"
+            "    return [i * i for i in range(n)]\n"
+        )
+        analysis = ASTAnalyzer().run(tree)
+        
+        assert isinstance(analysis.decorator_nodes[0], ast.Name)
+        assert analysis.decorators == ['staticmethod']
+        assert analysis.list_comprehensions == ['[i * i for i in range(n)]']
+
+
+class TestParseCache:
+    """Test suite for the shared ParseCache."""
+    
+    def test_parsed_once_across_components(self, sample_complex_code):
+        """
+        Test: ASTGrader and PlagiarismDetector share one parse per file.
+        Verify: Only the first lookup misses; analyses are reused.
+        """
+        cache = ParseCache()
+        first = ASTGrader(sample_complex_code, parse_cache=cache)
+        second = ASTGrader(sample_complex_code, parse_cache=cache)
+        first.grade()
+        second.grade()
+        
+        assert second.tree is first.tree
+        assert second.analysis is first.analysis
+        assert cache.misses == 1
+        
+        detector = PlagiarismDetector(parse_cache=cache)
+        result = detector.compare_pair('a.py', first.code, 'b.py', first.code)
+        assert result['overall_similarity'] == pytest.approx(1.0)
+        assert cache.misses == 1
+        assert len(cache) == 1
+    
+    def test_artifacts_do_not_mutate_shared_tree(self):
+        """
+        Test: Normalization works on a copy of the cached AST.
+        """
+        cache = ParseCache()
+        code = 'def f(x):\n    """doc"""\n    return x\n'
+        detector = PlagiarismDetector(parse_cache=cache)
+        
+        assert detector.normalize_ast(code) == 'def func_0(x):\n    return var_0'
+        assert detector.normalize_code(code) == 'def f(x):\n    return x'
+        assert ast.unparse(cache.parse(code)) == ast.unparse(ast.parse(code))
+        
+        assert detector.normalize_ast('def (') == ''
+        with pytest.raises(SyntaxError):
+            cache.parse('def (')
+        assert cache.misses == 2
+    
+    def test_reports_do_not_share_cached_state(self, sample_complex_code):
+        """
+        Test: Mutating a report does not corrupt later cache hits.
+        Verify: Cached analyses are sized by their contents.
+        """
+        cache = ParseCache()
+        first = ASTGrader(sample_complex_code, parse_cache=cache).grade()
+        first['results']['complexity']['function_complexities'].clear()
+        first['results']['documentation']['details']['functions'][0]['name'] = 'x'
+        first['results']['naming']['violations'].append({'name': 'fake'})
+        
+        second = ASTGrader(sample_complex_code, parse_cache=cache).grade()
+        assert second['results']['complexity']['function_complexities']
+        assert second['results']['documentation']['details']['functions'][0]['name'] != 'x'
+        assert second['results']['naming']['violations'] == []
+        
+        code = open(sample_complex_code).read()
+        tree_estimate = sys.getsizeof(code) + len(code) * ParseCache.AST_BYTES_PER_CHAR
+        assert cache.total_bytes > tree_estimate + 1000
+    
+    def test_lru_eviction_by_size(self):
+        """
+        Test: Least recently used entries are evicted past max_bytes.
+        """
+        sources = [f"x{i} = {i}\n" * 50 for i in range(4)]
+        entry_size = len(sources[0]) * ParseCache.AST_BYTES_PER_CHAR
+        cache = ParseCache(max_bytes=int(entry_size * 2.5))
+        
+        cache.parse(sources[0])
+        cache.parse(sources[1])
+        cache.parse(sources[0])
+        cache.parse(sources[2])
+        
+        assert sources[0] in cache
+        assert sources[1] not in cache
+        assert sources[2] in cache
+        assert cache.total_bytes <= cache.max_bytes
+
+
+class TestIncrementalAnalysis:
+    """Test suite for function-level incremental re-analysis."""
+    
+    def test_resubmission_reanalyzes_changed_units(self, temp_dir):
+        """
+        Test: A resubmission reuses metrics of unchanged functions.
+        Verify: Results equal a full analysis, with shifted line numbers.
+        """
+        path = os.path.join(temp_dir, "submission.py")
+        cache = ResultCache()
+        body = ("def BadName(x):\n    if x:\n        return 1\n    return 0\n\n"
+                "def other(y):\n    return y\n")
+        with open(path, 'w') as f:
+            f.write(body)
+        first = ASTGrader(path, incremental_cache=cache).grade()
+        assert first['incremental'] == {'reused': 0, 'analyzed': 2}
+        
+        with open(path, 'w') as f:
+            f.write("import os\n\n" + body.replace("return y", "return y or 1"))
+        grader = ASTGrader(path, incremental_cache=cache)
+        second = grader.grade()
+        full = ASTGrader(path, parse_cache=ParseCache()).grade()
+        
+        assert second['incremental'] == {'reused': 1, 'analyzed': 2}
+        assert second['results'] == full['results']
+        assert second['results']['naming']['violations'][0]['line'] == 3
+    
+    def test_cached_units_hold_no_ast(self, temp_dir):
+        """
+        Test: Cached per-statement units keep only derived values.
+        Verify: Decorator and comprehension texts survive a cache hit.
+        """
+        path = os.path.join(temp_dir, "decorated.py")
+        with open(path, 'w') as f:
+            f.write("class A:\n    @staticmethod\n    def f(n):\n"
+                    "        return [i * i for i in range(n)]\n")
+        cache = ResultCache()
+        ASTGrader(path, incremental_cache=cache).grade()
+        
+        for unit in cache._entries.values():
+            assert unit.tree is None
+            assert all(isinstance(item, str) for item in
+                       unit.decorator_nodes + unit.list_comprehension_nodes)
+        
+        grader = ASTGrader(path, parse_cache=ParseCache(),
+                           incremental_cache=cache)
+        grader.grade()
+        analysis = grader.analysis_for('structure')
+        assert analysis.decorators == ['staticmethod']
+        assert analysis.list_comprehensions == ['[i * i for i in range(n)]']
+    
+    def test_result_cache_bounded_by_bytes(self):
+        """
+        Test: ResultCache evicts least recently used entries by memory.
+        """
+        cache = ResultCache(max_bytes=200 * 1024)
+        for i in range(50):
+            cache.put(i, list(range(1000)))
+        
+        assert cache.total_bytes <= cache.max_bytes
+        assert 0 < len(cache) < 50
+        assert 49 in cache and 0 not in cache
+    
+    def test_statements_sharing_a_line(self, temp_dir):
+        """
+        Test: Two statements on one line are distinct incremental units.
+        """
+        path = os.path.join(temp_dir, "same_line.py")
+        with open(path, 'w') as f:
+            f.write("x = 1; BadName = 2\n")
+        
+        incremental = ASTGrader(path, parse_cache=ParseCache(),
+                                incremental_cache=ResultCache()).grade()
+        full = ASTGrader(path, parse_cache=ParseCache()).grade()
+        
+        assert incremental['results'] == full['results']
+        assert incremental['results']['naming']['violations'][0]['name'] == 'BadName'
+        assert incremental['incremental'] == {'reused': 0, 'analyzed': 2}
+    
+    def test_function_index_diff(self):
+        """
+        Test: Diffing two versions reports changed functions and dependents.
+        """
+        def index(code):
+            return FunctionIndex(code, ast.parse(code))
+        
+        old = index("def helper():\n    return 1\n\n"
+                    "def main():\n    return helper()\n\n"
+                    "def alone():\n    return 2\n")
+        new = index("def helper():\n    return 3\n\n"
+                    "def main():\n    return helper()\n\n"
+                    "def alone():\n    return 2\n\n"
+                    "def extra():\n    pass\n")
+        diff = new.diff(old)
+        
+        assert diff['changed'] == ['helper']
+        assert diff['added'] == ['extra']
+        assert diff['unchanged'] == ['alone', 'main']
+        assert diff['affected'] == ['extra', 'helper', 'main']
+        assert diff['module_changed'] is False
+
+
+class TestCohortMetrics:
+    """Test suite for cohort-wide AST metrics."""
+    
+    @pytest.fixture
+    def cohort_dir(self, temp_dir):
+        cohort = os.path.join(temp_dir, "cohort")
+        os.makedirs(os.path.join(cohort, "b"))
+        files = {
+            "a.py": 'def add(a, b):\n    """Add."""\n    return a + b\n',
+            os.path.join("b", "main.py"): (
+                "def BadName(x):\n"
+                "    for i in range(x):\n"
+                "        if i and x:\n"
+                "            return i\n"
+                "    return 0\n"),
+            "broken.py": "def (:\n"
+        }
+        for name, code in files.items():
+            with open(os.path.join(cohort, name), 'w') as f:
+                f.write(code)
+        return cohort
+    
+    def test_directory_to_dataframes(self, cohort_dir):
+        """
+        Test: A directory is analyzed in a process pool into columnar tables.
+        Verify: Threshold queries are vectorized expressions.
+        """
+        pytest.importorskip("pandas")
+        tables = analyze_cohort(cohort_dir, workers=2)
+        files = tables['files'].set_index('file')
+        functions = tables['functions']
+        
+        assert list(files.index) == ['a.py', os.path.join('b', 'main.py'), 'broken.py']
+        assert files.loc['broken.py', 'error'] is not None
+        assert files.loc['a.py', 'doc_coverage'] == 1.0
+        assert files.loc[os.path.join('b', 'main.py'), 'loops'] == 1
+        
+        complex_functions = functions[functions.complexity > 3]
+        assert complex_functions.function.tolist() == ['BadName']
+        assert functions.name_compliant.tolist() == [True, False]
+        assert functions.line.tolist() == [1, 1]
+    
+    def test_nested_functions_keep_their_own_rows(self, temp_dir):
+        """
+        Test: Docstrings of nested functions land on the right rows.
+        """
+        pytest.importorskip("pandas")
+        cohort = os.path.join(temp_dir, "nested")
+        os.makedirs(cohort)
+        with open(os.path.join(cohort, "nested.py"), 'w') as f:
+            f.write(
+                "def outer(x):\n"
+                "    \"\"\"Documented outer function.\"\"\"\n"
+                "    def Inner(y):\n"
+                "        if y:\n"
+                "            return y\n"
+                "        return 0\n"
+                "    return Inner(x)\n"
+            )
+        
+        functions = analyze_cohort(cohort, workers=1)['functions'].set_index('function')
+        
+        assert functions.loc['outer', 'has_docstring']
+        assert functions.loc['outer', 'docstring_length'] == len("Documented outer function.")
+        assert not functions.loc['Inner', 'has_docstring']
+        assert functions.loc['Inner', 'docstring_length'] == 0
+        assert functions.loc['Inner', 'complexity'] == 2
+        assert functions.loc['outer', 'name_compliant']
+        assert not functions.loc['Inner', 'name_compliant']
+    
+    def test_archive_matches_directory(self, cohort_dir, temp_dir):
+        """
+        Test: Zip archives give the same table as the extracted directory.
+        """
+        pytest.importorskip("pandas")
+        archive = os.path.join(temp_dir, "cohort.zip")
+        with zipfile.ZipFile(archive, 'w') as zf:
+            for root, _, names in os.walk(cohort_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    zf.write(path, os.path.relpath(path, cohort_dir))
+        
+        from_dir = analyze_cohort(cohort_dir, workers=1)
+        from_zip = analyze_cohort(archive, workers=1)
+        
+        assert from_zip['functions'].equals(from_dir['functions'])
+        assert from_zip['files'].drop(columns='error').equals(
+            from_dir['files'].drop(columns='error'))
+
+
+class TestRuleEngine:
+    """Test suite for the AST rule plugin engine."""
+    
+    CODE = (
+        "from math import *\n"
+        "\n"
+        "def collect(item, bucket=[]):\n"
+        "    try:\n"
+        "        bucket.append(item)\n"
+        "    except:\n"
+        "        pass\n"
+        "    if item == None:\n"
+        "        print(bucket)\n"
+        "    return bucket\n"
+    )
+    
+    def test_rule_sets_in_grade(self, temp_dir):
+        """
+        Test: grade(rules=...) runs the selected rule set in the same pass.
+        Verify: Incremental analysis reports the same violations.
+        """
+        path = os.path.join(temp_dir, "rules.py")
+        with open(path, 'w') as f:
+            f.write(self.CODE)
+        
+        result = ASTGrader(path, parse_cache=ParseCache()).grade(rules='default')
+        rules = result['results']['rules']
+        
+        assert rules['by_rule'] == {'bare-except': 1, 'mutable-default-arg': 1,
+                                    'wildcard-import': 1, 'comparison-to-none': 1}
+        assert [v['line'] for v in rules['violations']] == [1, 3, 6, 8]
+        assert rules['score'] == 6
+        
+        grader = ASTGrader(path, parse_cache=ParseCache(),
+                           incremental_cache=ResultCache())
+        grader.load_and_parse()
+        assert grader.check_rules('strict')['by_rule']['print-call'] == 1
+        assert grader.check_rules(['bare-except'])['violations'] == rules['violations'][2:3]
+    
+    def test_dispatch_by_node_type(self):
+        """
+        Test: A registered rule only sees nodes of its declared types.
+        """
+        seen = []
+        
+        @register_rule
+        class NoLambdaRule(ASTRule):
+            name = 'test-no-lambda'
+            node_types = (ast.Lambda,)
+            
+            def check(self, node):
+                seen.append(type(node))
+                return "Lambda found"
+        
+        try:
+            tree = ast.parse("f = lambda x: x\ng = lambda: 0\nh = 1\n")
+            analysis = ASTAnalyzer(rules=resolve_rules(['test-no-lambda', 'default'])).run(tree)
+            
+            assert seen == [ast.Lambda, ast.Lambda]
+            assert [v['line'] for v in analysis.rule_violations] == [1, 2]
+            assert resolve_rules('test-no-lambda') == (NoLambdaRule(),)
+        finally:
+            RULE_REGISTRY.pop('test-no-lambda')
+        
+        with pytest.raises(KeyError):
+            resolve_rules('no-such-rule')
+
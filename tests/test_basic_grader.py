@@ -4,7 +4,9 @@
 """
 
 import pytest
-from src.basic_grader import BasicGrader
+import os
+from src.basic_grader import BasicGrader, BoundedTestResult
+from src.utils import ResultCache
 
 
 class TestBasicGrader:
@@ -78,6 +80,51 @@ def test_grade_some_failures(self, sample_buggy_code):
         assert result['passed'] < result['total']
         assert result['failures'] > 0 or result['errors'] > 0
     
+    def test_grade_failure_details_bounded(self, sample_buggy_code):
+        """
+        Test: Many failing tests.
+        Verify: All failures are counted but only a bounded sample is kept.
+        """
+        test_cases = [
+            {'function': 'add', 'inputs': [i, 1], 'expected': i + 1}
+            for i in range(20)
+        ]
+        
+        grader = BasicGrader(sample_buggy_code)
+        result = grader.grade(test_cases)
+        
+        assert result['failures'] == 20
+        assert len(result['details']['failures']) == 5
+        assert 'AssertionError' in result['details']['failures'][0]
+    
+    def test_bounded_result_keeps_testresult_contract(self):
+        """
+        Test: BoundedTestResult still fills failures/errors.
+        Verify: Entries hold one-line summaries, samples hold tracebacks.
+        """
+        import unittest
+        
+        class Cases(unittest.TestCase):
+            def test_fail(self):
+                self.assertEqual(1, 2)
+            
+            def test_error(self):
+                raise ValueError("x" * 1000)
+            
+            def test_pass(self):
+                pass
+        
+        result = BoundedTestResult()
+        unittest.TestLoader().loadTestsFromTestCase(Cases).run(result)
+        
+        assert not result.wasSuccessful()
+        assert len(result.failures) == 1
+        assert len(result.errors) == 1
+        assert result.failures[0][1] == 'AssertionError: 1 != 2'
+        assert result.errors[0][1].startswith('ValueError: xxx')
+        assert len(result.errors[0][1]) < 300
+        assert 'Traceback' in result.error_recorder.samples()[0]
+    
     def test_grade_empty_test_cases(self, sample_student_code):
         """
         Test: Grading with empty test cases.
@@ -221,3 +268,50 @@ def test_complete_grading_workflow(self, sample_student_code, basic_test_cases):
         # Verify score is reasonable
         assert 0 <= result['score'] <= result['max_score']
         assert result['passed'] <= result['total']
+
+
+class TestIncrementalGrading:
+    """Test suite for incremental regrading of resubmissions."""
+    
+    def write(self, path, code):
+        with open(path, 'w') as f:
+            f.write(code)
+    
+    def test_unchanged_functions_reuse_outcomes(self, temp_dir, basic_test_cases):
+        """
+        Test: Only tests of changed functions run again.
+        Verify: Moving a function does not invalidate its outcomes.
+        """
+        path = os.path.join(temp_dir, "submission.py")
+        cache = ResultCache()
+        self.write(path, "def add(a, b):\n    return a + b\n\n"
+                         "def multiply(a, b):\n    return a + b\n")
+        first = BasicGrader(path, incremental_cache=cache).grade(basic_test_cases)
+        assert first['incremental'] == {'reused': 0, 'executed': 4}
+        assert first['failures'] == 1
+        
+        self.write(path, "def multiply(a, b):\n    return a * b\n\n\n"
+                         "def add(a, b):\n    return a + b\n")
+        second = BasicGrader(path, incremental_cache=cache).grade(basic_test_cases)
+        assert second['incremental'] == {'reused': 3, 'executed': 1}
+        assert second['score'] == 10.0
+    
+    def test_dependents_are_retested(self, temp_dir, basic_test_cases):
+        """
+        Test: Changing a helper reruns tests of functions that call it.
+        """
+        path = os.path.join(temp_dir, "submission.py")
+        cache = ResultCache()
+        helper = "def combine(a, b):\n    return a {} b\n\n"
+        rest = ("def add(a, b):\n    return combine(a, b)\n\n"
+                "def multiply(a, b):\n    return a * b\n")
+        self.write(path, helper.format('-') + rest)
+        first = BasicGrader(path, incremental_cache=cache).grade(basic_test_cases)
+        assert first['failures'] == 2
+        
+        self.write(path, helper.format('+') + rest)
+        second = BasicGrader(path, incremental_cache=cache).grade(basic_test_cases)
+        assert second['incremental'] == {'reused': 1, 'executed': 3}
+        assert second['score'] == 10.0
+        assert second['details']['failures'] == []
+
@@ -0,0 +1,119 @@
+"""
+tests/test_benchmark_corpus.py - Unit tests for BenchmarkCorpus
+Chức năng: Test kho đầu vào benchmark dạng memmap
+"""
+
+import pytest
+import os
+
+np = pytest.importorskip("numpy")
+
+from src.benchmark_corpus import BenchmarkCorpus
+from src.performance_grader import PerformanceGrader
+
+
+@pytest.fixture
+def corpus(temp_dir):
+    """
+    Fixture: Corpus with reversed integer inputs of three sizes.
+    """
+    corpus = BenchmarkCorpus(os.path.join(temp_dir, "corpus"))
+    corpus.generate("reversed", lambda n: np.arange(n, 0, -1),
+                    [100, 1000, 10000])
+    return corpus
+
+
+class TestBenchmarkCorpus:
+    """Test suite for BenchmarkCorpus."""
+    
+    def test_inputs_are_read_only_memmaps(self, corpus):
+        """
+        Test: Stored inputs are reopened as read-only memory maps.
+        """
+        data = corpus.load("reversed", 1000)
+        
+        assert isinstance(data, np.memmap)
+        assert not data.flags.writeable
+        assert data[0] == 1000
+        assert corpus.sizes("reversed") == [100, 1000, 10000]
+    
+    def test_manifest_shared_between_instances(self, corpus):
+        """
+        Test: A second corpus on the same directory sees existing inputs.
+        """
+        other = BenchmarkCorpus(corpus.root_dir)
+        
+        assert other.names() == ["reversed"]
+        assert other.as_list("reversed", 100) == list(range(100, 0, -1))
+    
+    def test_input_generator_slices_stored_sizes(self, corpus):
+        """
+        Test: Generator serves any size up to the largest stored input.
+        """
+        generate = corpus.input_generator("reversed", as_list=True)
+        
+        assert generate(500) == (list(range(1000, 500, -1)),)
+        with pytest.raises(ValueError):
+            generate(20000)
+    
+    def test_grade_with_corpus_inputs(self, corpus, temp_dir,
+                                      mock_reference_function):
+        """
+        Test: Memmap inputs are shared only with confirmed read-only functions.
+        """
+        code_file = os.path.join(temp_dir, "np_sort.py")
+        with open(code_file, 'w') as f:
+            f.write("def sort_array(arr):\n    return sorted(arr)\n")
+        grader = PerformanceGrader(code_file,
+                                   read_only_functions=["sort_array"])
+        args = corpus.inputs("reversed", sizes=[1000])[0]
+        
+        def sort_array(arr):
+            return sorted(arr)
+        
+        assert grader.input_factory(args, sort_array)() is args
+        assert grader.input_factory(args)() is not args
+        result = grader.grade_performance("sort_array", mock_reference_function,
+                                          [args])
+        
+        assert 'error' not in result
+        assert result['comparison']['test_count'] == 1
+
+    def test_in_place_sort_on_memmap_inputs(self, corpus, temp_dir):
+        """
+        Test: A student function sorting in place gets a writable copy.
+        """
+        code_file = os.path.join(temp_dir, "in_place.py")
+        with open(code_file, 'w') as f:
+            f.write("def sort_array(arr):\n    arr.sort()\n    return arr\n")
+        grader = PerformanceGrader(code_file)
+        args = corpus.inputs("reversed", sizes=[100])[0]
+        
+        result = grader.grade_performance(
+            "sort_array", lambda arr: sorted(arr), [args])
+        
+        assert 'error' not in result
+        assert result['comparison']['test_count'] == 1
+        assert args[0][0] == 100  # Đầu vào trong corpus không bị sửa
+    
+    def test_concurrent_adds_keep_all_entries(self, temp_dir):
+        """
+        Test: Concurrent adds from several instances keep every manifest entry.
+        """
+        import threading
+        root = os.path.join(temp_dir, "shared")
+        corpora = [BenchmarkCorpus(root) for _ in range(4)]
+        
+        def add_sizes(corpus, offset):
+            for size in range(offset, 40, 4):
+                corpus.add("ints", np.arange(size + 1), size + 1)
+        
+        threads = [threading.Thread(target=add_sizes, args=(c, i))
+                   for i, c in enumerate(corpora)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert BenchmarkCorpus(root).sizes("ints") == list(range(1, 41))
+        assert not [name for name in os.listdir(root) if name.endswith('.tmp')]
@@ -0,0 +1,950 @@
+"""
+tests/test_performance_grader.py - Unit tests for PerformanceGrader
+Chức năng: Test đo hiệu năng và chấm điểm performance
+"""
+
+import pytest
+import os
+import time
+from hypothesis import strategies as st
+from src.performance_grader import (PerformanceGrader, ReferenceBenchmarkCache,
+                                    InputSnapshot, count_execution_cost,
+                                    ratio_interval, sequential_confidence,
+                                    grade_performance_cohort,
+                                    grade_performance_parallel)
+from src.utils import InputStore, describe_input
+
+
+@pytest.fixture
+def sample_sort_code(temp_dir):
+    """
+    Fixture: Student sorting code for performance tests.
+    """
+    code = '''
+def sort_list(lst):
+    """Sort a list."""
+    return sorted(lst)
+
+def naive_quicksort(lst):
+    """Quicksort with the first element as pivot."""
+    if len(lst) <= 1:
+        return list(lst)
+    pivot = lst[0]
+    smaller = [x for x in lst[1:] if x < pivot]
+    larger = [x for x in lst[1:] if x >= pivot]
+    return naive_quicksort(smaller) + [pivot] + naive_quicksort(larger)
+
+def count_pairs(lst):
+    """Quadratic pair counting."""
+    return sum(1 for x in lst for y in lst if x < y)
+
+def allocate_by_max(lst):
+    """Allocate a list as long as the largest element."""
+    return [0] * max(lst)
+'''
+    filepath = os.path.join(temp_dir, "sort_code.py")
+    with open(filepath, 'w') as f:
+        f.write(code)
+    
+    return filepath
+
+
+@pytest.mark.performance
+class TestPerformanceGrader:
+    """Test suite for PerformanceGrader."""
+    
+    def test_grade_performance(self, sample_sort_code, mock_reference_function,
+                               mock_performance_test_inputs):
+        """
+        Test: Grading a function against a reference.
+        Verify: Result structure and score range.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        result = grader.grade_performance(
+            "sort_list", mock_reference_function, mock_performance_test_inputs
+        )
+        
+        assert 0 <= result['score'] <= result['max_score']
+        assert result['comparison']['test_count'] == len(mock_performance_test_inputs)
+        assert "PERFORMANCE GRADING REPORT" in grader.generate_report(result)
+
+
+@pytest.mark.performance
+class TestCalibratedTiming:
+    """Test timeit-style calibrated measurement."""
+    
+    def test_calibrated_loops_for_fast_function(self, sample_sort_code):
+        """
+        Test: Microsecond function is measured with many loops per sample.
+        Verify: Stats are per call and GC is re-enabled afterwards.
+        """
+        import gc
+        
+        grader = PerformanceGrader(sample_sort_code, calibrate_timing=True,
+                                   target_sample_time=0.002)
+        stats = grader.measure_execution_time(len, ([1, 2, 3],), iterations=5)
+        
+        assert stats['samples'] == 5
+        assert stats['loops'] > 1
+        assert stats['mean'] < 0.002
+        assert gc.isenabled()
+    
+    def test_calibrated_copies_stay_within_budget(self, sample_sort_code):
+        """
+        Test: A fast function on a large list does not pre-copy the input
+        thousands of times per sample.
+        Verify: Loops are capped by copy_budget and measurement stays fast.
+        """
+        import bisect
+        
+        grader = PerformanceGrader(sample_sort_code, calibrate_timing=True,
+                                   target_sample_time=0.01,
+                                   copy_budget=16 * 1024 * 1024)
+        args = (list(range(65536)), 1000)
+        
+        started = time.perf_counter()
+        stats = grader.measure_execution_time(bisect.bisect_left, args,
+                                              iterations=3)
+        
+        assert 'error' not in stats
+        assert time.perf_counter() - started < 10
+        nbytes = InputSnapshot(args).nbytes
+        assert stats['loops'] * nbytes <= grader.copy_budget
+    
+    def test_read_only_function_skips_copies(self, sample_sort_code):
+        """
+        Test: Functions confirmed read-only receive the original arguments.
+        """
+        import bisect
+        
+        grader = PerformanceGrader(sample_sort_code,
+                                   read_only_functions=['bisect_left'])
+        args = (list(range(10)), 3)
+        
+        assert grader.input_factory(args, bisect.bisect_left)() is args
+        assert grader.input_factory(args, sorted)() is not args
+    
+    def test_calibrated_error(self, sample_sort_code):
+        """
+        Test: Errors during calibrated measurement are reported.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        stats = grader.measure_execution_time(
+            lambda x: 1 / x, (0,), iterations=5, calibrate=True
+        )
+        
+        assert 'error' in stats
+        assert stats['mean'] == float('inf')
+
+
+@pytest.mark.performance
+class TestRobustTiming:
+    """Test interleaved, outlier-robust ratio measurement."""
+    
+    def test_reject_outliers(self):
+        """
+        Test: Tukey fences drop a single spike.
+        """
+        from src.performance_grader import reject_outliers
+        
+        kept, rejected = reject_outliers([1.0, 1.1, 0.9, 1.0, 1.05, 50.0])
+        
+        assert rejected == 1
+        assert 50.0 not in kept
+    
+    def test_measure_time_ratio(self, sample_sort_code):
+        """
+        Test: Ratio of a function against itself is close to 1.
+        Verify: Confidence interval brackets the ratio.
+        """
+        grader = PerformanceGrader(sample_sort_code, reserved_cpu=0,
+                                   warmup_iterations=2)
+        args = (list(range(1000, 0, -1)),)
+        
+        timing = grader.measure_time_ratio(sorted, sorted, args, iterations=30)
+        
+        low, high = timing['ratio_ci']
+        assert low <= timing['ratio'] <= high
+        assert 0.5 < timing['ratio'] < 2.0
+        assert timing['student']['samples'] <= 30
+    
+    def test_compare_with_reference_robust(self, sample_sort_code,
+                                           mock_reference_function,
+                                           mock_performance_test_inputs):
+        """
+        Test: compare_with_reference in robust mode reports a ratio CI.
+        """
+        grader = PerformanceGrader(sample_sort_code, robust_timing=True)
+        grader.load_student_code()
+        
+        comparison = grader.compare_with_reference(
+            grader.student_module.sort_list, mock_reference_function,
+            mock_performance_test_inputs
+        )
+        
+        assert all(r['time_ratio_ci'] is not None
+                   for r in comparison['detailed_results'])
+
+
+@pytest.mark.performance
+class TestSequentialTiming:
+    """Test early stopping once the time score is decided."""
+    
+    def test_clearly_slow_stops_early(self, sample_sort_code):
+        """
+        Test: Student far slower than the reference.
+        Verify: Sampling stops well before the iteration cap.
+        """
+        grader = PerformanceGrader(sample_sort_code, sequential_timing=True,
+                                   warmup_iterations=1)
+        grader.load_student_code()
+        args = (list(range(300)),)
+        
+        timing = grader.measure_time_ratio(
+            grader.student_module.count_pairs, len, args, iterations=50
+        )
+        
+        assert timing['stopped_early'] is True
+        assert timing['iterations'] < 50
+        assert timing['ratio'] < 0.1
+    
+    def test_clearly_fine_stops_early(self, sample_sort_code):
+        """
+        Test: Student faster than the reference scores 10 quickly.
+        """
+        import time
+        
+        def slow_reference(lst):
+            time.sleep(0.002)
+            return sorted(lst)
+        
+        grader = PerformanceGrader(sample_sort_code, sequential_timing=True,
+                                   warmup_iterations=1)
+        timing = grader.measure_time_ratio(
+            sorted, slow_reference, ([3, 1, 2],), iterations=50
+        )
+        
+        assert timing['iterations'] == grader.min_sequential_iterations
+        assert grader.score_decided(timing['ratio_ci'])
+    
+    def test_equal_implementations_false_stop_rate(self, sample_sort_code):
+        """
+        Test: Repeated looks do not inflate wrong early stops.
+        Verify: With equal timing distributions, stopping with an interval
+        that excludes the true ratio 1.0 stays below 1 - confidence.
+        """
+        import math
+        import random
+        
+        grader = PerformanceGrader(sample_sort_code, sequential_timing=True)
+        rng = random.Random(0)
+        trials, iterations = 500, 30
+        false_stops = 0
+        
+        for _ in range(trials):
+            student_times, reference_times = [], []
+            for _ in range(iterations):
+                student_times.append(math.exp(rng.gauss(0, 1.0)))
+                reference_times.append(math.exp(rng.gauss(0, 1.0)))
+                if grader.stop_sampling(student_times, reference_times,
+                                        0.95, iterations):
+                    looks = len(grader.sequential_looks(iterations))
+                    low, high = ratio_interval(
+                        student_times, reference_times,
+                        sequential_confidence(0.95, looks))['ratio_ci']
+                    false_stops += not low <= 1.0 <= high
+                    break
+        
+        assert false_stops / trials <= 0.05
+    
+    def test_ratio_near_one_stops_early(self, sample_sort_code):
+        """
+        Test: A submission about as fast as the reference stops before
+        the iteration cap, once its score interval sits in the top bucket.
+        """
+        import math
+        import random
+        
+        grader = PerformanceGrader(sample_sort_code, sequential_timing=True)
+        rng = random.Random(1)
+        iterations = 50
+        stops = []
+        
+        for _ in range(100):
+            student_times, reference_times = [], []
+            for i in range(iterations):
+                student = math.exp(rng.gauss(0, 0.05))
+                student_times.append(student)
+                reference_times.append(student * 0.99 *
+                                       math.exp(rng.gauss(0, 0.05)))
+                if grader.stop_sampling(student_times, reference_times,
+                                        0.95, iterations):
+                    stops.append(i + 1)
+                    break
+        
+        assert len(stops) >= 90
+        assert sum(stops) / len(stops) < iterations / 2
+
+
+@pytest.mark.performance
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'),
+                    reason="RSS measurement uses /proc")
+class TestRSSMemory:
+    """Test subprocess RSS-based memory measurement."""
+    
+    def test_rss_counts_native_allocations(self, sample_sort_code):
+        """
+        Test: Memory allocated outside the Python allocator is seen.
+        Verify: Peak RSS delta and GC statistics are reported.
+        """
+        grader = PerformanceGrader(sample_sort_code, memory_mode='rss')
+        
+        stats = grader.measure_memory_usage(
+            lambda n: [[i] for i in range(n)] and len(bytearray(n * 100)),
+            (100000,)
+        )
+        
+        assert stats['method'] == 'rss'
+        assert stats['peak_bytes'] >= 100000 * 100 * 0.9
+        assert sum(stats['gc_collections']) > 0
+        assert stats['object_allocations'] > 0
+    
+    def test_rss_error(self, sample_sort_code):
+        """
+        Test: Errors in the worker process are reported.
+        """
+        grader = PerformanceGrader(sample_sort_code, memory_mode='rss')
+        
+        stats = grader.measure_memory_usage(lambda x: 1 / x, (0,))
+        
+        assert 'error' in stats
+        assert stats['peak'] == -1
+
+
+@pytest.mark.performance
+class TestAllocationProfile:
+    """Test allocation hot-spot attribution."""
+    
+    def test_profile_allocations_points_to_student_line(self, sample_sort_code):
+        """
+        Test: Net allocations are grouped by student source line.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        grader.load_student_code()
+        
+        sites = grader.profile_allocations(
+            grader.student_module.allocate_by_max, ([10, 200000, 3],)
+        )
+        
+        assert sites
+        assert "[0] * max(lst)" in sites[0]['source']
+        assert sites[0]['size_bytes'] >= 200000 * 8
+    
+    def test_allocation_sites_in_report(self, sample_sort_code,
+                                        mock_reference_function):
+        """
+        Test: Opt-in allocation profile is attached to results and report.
+        """
+        grader = PerformanceGrader(sample_sort_code, allocation_profile=True)
+        result = grader.grade_performance(
+            "naive_quicksort", mock_reference_function,
+            [(list(range(200, 0, -1)),)]
+        )
+        
+        sites = result['comparison']['detailed_results'][0]['allocation_sites']
+        assert sites
+        assert "Top allocation sites:" in grader.generate_report(result)
+
+
+@pytest.mark.performance
+class TestReferenceCache:
+    """Test the on-disk reference benchmark cache."""
+    
+    def test_reference_measured_once(self, sample_sort_code, temp_dir,
+                                     mock_reference_function):
+        """
+        Test: Second submission reuses cached reference measurements.
+        """
+        cache_dir = os.path.join(temp_dir, "ref_cache")
+        inputs = [(list(range(50)),)]
+        
+        first = PerformanceGrader(sample_sort_code, reference_cache_dir=cache_dir)
+        first_result = first.grade_performance("sort_list",
+                                               mock_reference_function, inputs)
+        second = PerformanceGrader(sample_sort_code, reference_cache_dir=cache_dir)
+        second_result = second.grade_performance("sort_list",
+                                                 mock_reference_function, inputs)
+        
+        assert first_result['comparison']['reference_cache']['misses'] == 2
+        assert second_result['comparison']['reference_cache'] == {
+            'hits': 2, 'misses': 0
+        }
+        first_ref = first_result['comparison']['detailed_results'][0]
+        second_ref = second_result['comparison']['detailed_results'][0]
+        assert first_ref['reference_time'] == second_ref['reference_time']
+    
+    def test_key_and_invalidate(self, temp_dir):
+        """
+        Test: Keys depend on function code and input; invalidate by function.
+        """
+        cache = ReferenceBenchmarkCache(os.path.join(temp_dir, "ref_cache"))
+        
+        def ref_a(lst):
+            return sorted(lst)
+        
+        def ref_b(lst):
+            return list(reversed(sorted(lst)))
+        
+        key_a = cache.make_key(ref_a, ([1, 2],))
+        assert key_a != cache.make_key(ref_a, ([2, 1],))
+        assert key_a != cache.make_key(ref_b, ([1, 2],))
+        assert key_a != cache.make_key(ref_a, ([1, 2],), settings='rss')
+        
+        cache.put(key_a, {'mean': 1.0})
+        cache.put(cache.make_key(ref_b, ([1, 2],)), {'mean': 2.0})
+        assert cache.get(key_a) == {'mean': 1.0}
+        
+        assert cache.invalidate(ref_a) == 1
+        assert cache.get(key_a) is None
+        assert cache.invalidate() == 1
+    
+    def test_key_covers_closures_defaults_and_helpers(self, temp_dir):
+        """
+        Test: Functions with the same bytecode but different captured
+        values, defaults or helpers get different keys.
+        """
+        import types
+        
+        cache = ReferenceBenchmarkCache(os.path.join(temp_dir, "ref_cache"))
+        
+        def make_ref(offset):
+            def ref(lst):
+                return [x + offset for x in lst]
+            return ref
+        
+        def ref_default(lst, offset=1):
+            return [x + offset for x in lst]
+        
+        # Cùng bytecode, chỉ khác giá trị mặc định
+        ref_default_other = types.FunctionType(
+            ref_default.__code__, ref_default.__globals__, 'ref_default', (2,))
+        namespace_a = {'helper': lambda x: x + 1}
+        namespace_b = {'helper': lambda x: x + 2}
+        exec("def ref(lst):\n    return [helper(x) for x in lst]\n", namespace_a)
+        exec("def ref(lst):\n    return [helper(x) for x in lst]\n", namespace_b)
+        
+        args = ([1, 2],)
+        assert cache.make_key(make_ref(1), args) != cache.make_key(make_ref(2), args)
+        assert cache.make_key(make_ref(1), args) == cache.make_key(make_ref(1), args)
+        assert (cache.make_key(ref_default, args)
+                != cache.make_key(ref_default_other, args))
+        assert (cache.make_key(namespace_a['ref'], args)
+                != cache.make_key(namespace_b['ref'], args))
+    
+    def test_key_covers_call_settings(self, sample_sort_code, temp_dir):
+        """
+        Test: Input copying and call timeout are part of the cached key.
+        """
+        cache_dir = os.path.join(temp_dir, "ref_cache")
+        copying = PerformanceGrader(sample_sort_code,
+                                    reference_cache_dir=cache_dir)
+        sharing = PerformanceGrader(sample_sort_code, copy_inputs=False,
+                                    call_timeout=5.0,
+                                    reference_cache_dir=cache_dir)
+        args = (list(range(50)),)
+        
+        copying.measure_reference_time(sorted, args, iterations=3)
+        sharing.measure_reference_time(sorted, args, iterations=3)
+        
+        assert copying.reference_cache.misses == 1
+        assert sharing.reference_cache.misses == 1
+        assert len(os.listdir(cache_dir)) == 2
+
+
+@pytest.mark.performance
+class TestIsolatedBenchmarks:
+    """Test benchmark sessions in dedicated worker processes."""
+    
+    def test_grade_in_isolated_worker(self, sample_sort_code,
+                                      mock_reference_function,
+                                      mock_performance_test_inputs):
+        """
+        Test: Grading runs in a child process and reports the worker.
+        """
+        grader = PerformanceGrader(sample_sort_code, isolate_benchmarks=True)
+        result = grader.grade_performance(
+            "sort_list", mock_reference_function, mock_performance_test_inputs
+        )
+        
+        assert 'error' not in result
+        assert result['isolated_worker']['pid'] != os.getpid()
+        assert 0 <= result['score'] <= result['max_score']
+        assert "Isolated worker: pid" in grader.generate_report(result)
+    
+    def test_parallel_jobs_with_timeout(self, sample_sort_code, temp_dir,
+                                        mock_reference_function):
+        """
+        Test: Jobs run in parallel workers; a hanging job is killed.
+        Verify: Results keep the order of the jobs.
+        """
+        spin_file = os.path.join(temp_dir, "spin.py")
+        with open(spin_file, 'w') as f:
+            f.write("def sort_list(lst):\n    while True:\n        pass\n")
+        inputs = [(list(range(20)),)]
+        jobs = [
+            {'student_file': spin_file, 'func_name': 'sort_list',
+             'reference_func': mock_reference_function, 'test_inputs': inputs},
+            {'student_file': sample_sort_code, 'func_name': 'sort_list',
+             'reference_func': mock_reference_function, 'test_inputs': inputs},
+        ]
+        
+        results = grade_performance_parallel(jobs, benchmark_timeout=2.0)
+        
+        assert results[0]['error'] == 'Timeout'
+        assert results[0]['score'] == 0.0
+        assert 'error' not in results[1]
+        assert results[1]['comparison']['test_count'] == 1
+
+
+@pytest.mark.performance
+class TestCostMetric:
+    """Test the deterministic bytecode/call cost metric."""
+    
+    def test_cost_is_deterministic(self, sample_sort_code):
+        """
+        Test: Repeated counting gives identical results.
+        Verify: Recursion depth and calls grow with quicksort on sorted input.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        grader.load_student_code()
+        quicksort = grader.student_module.naive_quicksort
+        
+        first = count_execution_cost(quicksort, (list(range(50)),))
+        second = count_execution_cost(quicksort, (list(range(50)),))
+        larger = count_execution_cost(quicksort, (list(range(100)),))
+        
+        assert first == second
+        assert first['max_depth'] == 50
+        assert first['calls'] >= 99
+        assert larger['instructions'] > 2 * first['instructions']
+    
+    def test_grade_with_cost_metric(self, sample_sort_code,
+                                    mock_reference_function):
+        """
+        Test: Cost metric drives the time score and is reproducible.
+        """
+        inputs = [(list(range(60, 0, -1)),)]
+        scores = []
+        for _ in range(2):
+            grader = PerformanceGrader(sample_sort_code, cost_metric=True)
+            result = grader.grade_performance(
+                "naive_quicksort", mock_reference_function, inputs
+            )
+            scores.append(result['comparison']['detailed_results'][0]['time_score'])
+        
+        detail = result['comparison']['detailed_results'][0]
+        assert scores[0] == scores[1]
+        assert detail['cost_ratio'] < 1
+        assert "Cost Ratio:" in grader.generate_report(result)
+
+
+@pytest.mark.performance
+class TestLineProfile:
+    """Test function- and line-level hotspot profiling."""
+    
+    def test_profile_function_hotspots(self, sample_sort_code):
+        """
+        Test: Hotspot lines are restricted to the student file.
+        Verify: The quadratic generator line dominates count_pairs.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        grader.load_student_code()
+        result = grader.profile_function("count_pairs", (list(range(200)),),
+                                         iterations=2, line_profile=True)
+        
+        hotspots = result['hotspots']
+        assert hotspots['functions']
+        assert "for x in lst for y in lst" in hotspots['lines'][0]['source']
+        assert all(0 <= line['percent'] <= 100 for line in hotspots['lines'])
+    
+    def test_hotspots_in_report(self, sample_sort_code,
+                                mock_reference_function):
+        """
+        Test: Grading attaches hotspots of the slowest input to the report.
+        """
+        grader = PerformanceGrader(sample_sort_code, line_profile=True)
+        result = grader.grade_performance(
+            "naive_quicksort", mock_reference_function,
+            [(list(range(10)),), (list(range(150, 0, -1)),)]
+        )
+        
+        assert result['hotspots']['input_index'] == 2
+        report = grader.generate_report(result)
+        assert "Hotspots (Test #2):" in report
+        assert "naive_quicksort" in report
+
+
+@pytest.mark.performance
+class TestTimeBudget:
+    """Test per-measurement budgets and hard per-call timeouts."""
+    
+    def test_budget_limits_samples(self, sample_sort_code):
+        """
+        Test: Slow calls stop sampling once the budget would be exceeded.
+        """
+        grader = PerformanceGrader(sample_sort_code, measurement_budget=0.2)
+        
+        stats = grader.measure_execution_time(time.sleep, (0.05,), 100)
+        
+        assert stats['budget_limited'] is True
+        assert 1 <= stats['samples'] <= 5
+        assert stats['mean'] >= 0.05
+    
+    def test_call_timeout_kills_hanging_call(self, temp_dir,
+                                             mock_reference_function):
+        """
+        Test: A call that never returns is interrupted and scored zero.
+        """
+        spin_file = os.path.join(temp_dir, "spin.py")
+        with open(spin_file, 'w') as f:
+            f.write("def sort_list(lst):\n    while True:\n        pass\n")
+        grader = PerformanceGrader(spin_file, call_timeout=0.2)
+        
+        started = time.perf_counter()
+        result = grader.grade_performance("sort_list", mock_reference_function,
+                                          [(list(range(10)),)])
+        
+        detail = result['comparison']['detailed_results'][0]
+        assert time.perf_counter() - started < 5
+        assert detail['student_time']['timed_out'] is True
+        assert detail['time_score'] == 0
+        assert "TIMED OUT" in grader.generate_report(result)
+    
+    def test_call_timeout_not_swallowed(self, temp_dir):
+        """
+        Test: A call catching Exception around its loop still times out.
+        """
+        spin_file = os.path.join(temp_dir, "swallow.py")
+        with open(spin_file, 'w') as f:
+            f.write("import time\n"
+                    "def sort_list(lst):\n"
+                    "    while True:\n"
+                    "        try:\n"
+                    "            time.sleep(0.01)\n"
+                    "        except Exception:\n"
+                    "            pass\n")
+        grader = PerformanceGrader(spin_file, call_timeout=0.5)
+        grader.load_student_code()
+        
+        started = time.perf_counter()
+        stats = grader.measure_execution_time(grader.student_module.sort_list,
+                                              ([1],), iterations=3)
+        
+        assert time.perf_counter() - started < 5
+        assert stats['timed_out'] is True
+    
+    def test_alarm_during_teardown_restores_handler(self, monkeypatch):
+        """
+        Test: SIGALRM firing while the deadline is being torn down does not
+        escape the block or leave the CallTimeout handler installed.
+        """
+        import signal
+        from src.performance_grader import CallTimeout, call_deadline
+        
+        original = signal.getsignal(signal.SIGALRM)
+        real_setitimer = signal.setitimer
+        pending = {'alarm': True}
+        
+        def setitimer(which, seconds, interval=0.0):
+            # Lần tắt timer đầu tiên: tín hiệu đến đúng lúc đó
+            if seconds == 0 and pending.pop('alarm', False):
+                signal.getsignal(signal.SIGALRM)(signal.SIGALRM, None)
+            return real_setitimer(which, seconds, interval)
+        
+        monkeypatch.setattr(signal, 'setitimer', setitimer)
+        with pytest.raises(CallTimeout):
+            with call_deadline(5.0):
+                pass
+        
+        assert real_setitimer(signal.ITIMER_REAL, 0) == (0.0, 0.0)
+        assert signal.getsignal(signal.SIGALRM) is original
+    
+    def test_isolated_worker_killed_when_call_overdue(
+            self, temp_dir, mock_reference_function):
+        """
+        Test: A call that even swallows CallTimeout is ended by killing the worker.
+        """
+        spin_file = os.path.join(temp_dir, "swallow_all.py")
+        with open(spin_file, 'w') as f:
+            f.write("def sort_list(lst):\n"
+                    "    while True:\n"
+                    "        try:\n"
+                    "            while True:\n"
+                    "                pass\n"
+                    "        except BaseException:\n"
+                    "            pass\n")
+        grader = PerformanceGrader(spin_file, call_timeout=0.2,
+                                   isolate_benchmarks=True,
+                                   benchmark_timeout=60.0)
+        
+        started = time.perf_counter()
+        result = grader.grade_performance("sort_list", mock_reference_function,
+                                          [(list(range(10)),)])
+        
+        assert time.perf_counter() - started < 10
+        assert 'call_timeout' in result['error']
+        assert result['score'] == 0.0
+
+
+@pytest.mark.performance
+class TestInputDescriptors:
+    """Test compact input descriptors and the shared input store."""
+    
+    def test_describe_large_input(self):
+        """
+        Test: Descriptor stays small for a large list argument.
+        """
+        args = (list(range(100000)), 5)
+        
+        description = describe_input(args)
+        
+        assert description['type'] == 'tuple'
+        assert description['args'] == [{'type': 'list', 'length': 100000},
+                                       {'type': 'int'}]
+        assert len(description['preview']) <= 120
+        assert description['digest'] == describe_input(
+            (list(range(100000)), 5))['digest']
+    
+    def test_results_keep_descriptors(self, sample_sort_code,
+                                      mock_reference_function):
+        """
+        Test: Results hold descriptors; full inputs come from the store.
+        """
+        store = InputStore()
+        args = (list(range(5000, 0, -1)),)
+        grader = PerformanceGrader(sample_sort_code, input_store=store)
+        result = grader.grade_performance("sort_list", mock_reference_function,
+                                          [args])
+        
+        description = result['comparison']['detailed_results'][0]['input']
+        assert description['args'][0]['length'] == 5000
+        assert store.get(description['digest']) == args
+        assert "list[5000]" in grader.generate_report(result)
+
+
+@pytest.mark.performance
+class TestInputSnapshots:
+    """Test per-call input copies made outside the timed region."""
+    
+    def test_snapshot_copies_are_independent(self):
+        """
+        Test: Fresh copies of lists and NumPy arrays do not share memory.
+        """
+        np = pytest.importorskip("numpy")
+        args = ([3, 1, 2], np.arange(5))
+        snapshot = InputSnapshot(args)
+        
+        first = snapshot.fresh()
+        first[0].sort()
+        first[1][0] = 100
+        second = snapshot.fresh()
+        
+        assert snapshot.method == 'pickle'
+        assert second[0] == [3, 1, 2]
+        assert second[1][0] == 0
+        assert args[1][0] == 0
+    
+    def test_mutation_does_not_leak(self, temp_dir):
+        """
+        Test: An in-place student function never hands mutated input on.
+        Verify: Every timed call and the reference see the original data.
+        """
+        drain_file = os.path.join(temp_dir, "drain.py")
+        with open(drain_file, 'w') as f:
+            f.write("def drain(lst):\n    while lst:\n        lst.pop()\n")
+        seen = []
+        
+        def reference(lst):
+            seen.append(len(lst))
+            return sorted(lst)
+        
+        grader = PerformanceGrader(drain_file, robust_timing=True)
+        grader.grade_performance("drain", reference, [(list(range(100)),)])
+        
+        assert seen and set(seen) == {100}
+    
+    def test_copies_can_be_disabled(self, sample_sort_code):
+        """
+        Test: copy_inputs=False calls the function on the original objects.
+        """
+        grader = PerformanceGrader(sample_sort_code, copy_inputs=False)
+        args = ([3, 1, 2],)
+        
+        grader.measure_execution_time(lambda lst: lst.sort(), args, 3)
+        
+        assert args[0] == [1, 2, 3]
+
+
+@pytest.mark.performance
+class TestCohortScoring:
+    """Test cohort-relative percentile scoring."""
+    
+    def test_cohort_ranks_students(self, temp_dir, mock_reference_function):
+        """
+        Test: Faster submissions rank higher; broken ones score zero.
+        """
+        pytest.importorskip("numpy")
+        sources = {
+            "fast.py": "def solve(lst):\n    return sorted(lst)\n",
+            "slow.py": ("def solve(lst):\n    out = list(lst)\n"
+                        "    for i in range(len(out)):\n"
+                        "        for j in range(len(out) - 1 - i):\n"
+                        "            if out[j] > out[j + 1]:\n"
+                        "                out[j], out[j + 1] = out[j + 1], out[j]\n"
+                        "    return out\n"),
+            "broken.py": "def solve(lst):\n    raise ValueError('bad')\n",
+        }
+        files = []
+        for name, code in sources.items():
+            path = os.path.join(temp_dir, name)
+            with open(path, 'w') as f:
+                f.write(code)
+            files.append(path)
+        
+        results = grade_performance_cohort(
+            files, "solve", [(list(range(300, 0, -1)),)]
+        )
+        fast, slow, broken = results
+        
+        assert fast['time_percentile'] == 1.0
+        assert slow['time_percentile'] < fast['time_percentile']
+        assert broken['score'] == 0.0
+        assert fast['score'] > slow['score']
+        report = PerformanceGrader(files[0]).generate_report(fast)
+        assert "Cohort percentile:" in report
+    
+    def test_reference_anchoring(self, sample_sort_code,
+                                 mock_reference_function):
+        """
+        Test: Beating a slower reference earns the top time percentile.
+        """
+        pytest.importorskip("numpy")
+        results = grade_performance_cohort(
+            [sample_sort_code, sample_sort_code], "count_pairs",
+            [(list(range(50)),)],
+            reference_func=lambda lst: [sum(1 for x in lst for y in lst if x < y)
+                                        for _ in range(3)]
+        )
+        
+        assert all(r['time_percentile'] == 1.0 for r in results)
+    
+    def test_failed_reference_does_not_anchor(self, temp_dir):
+        """
+        Test: When the reference raises, students are ranked only
+        against each other.
+        """
+        pytest.importorskip("numpy")
+        fast_file = os.path.join(temp_dir, "fast.py")
+        slow_file = os.path.join(temp_dir, "slow.py")
+        with open(fast_file, 'w') as f:
+            f.write("def solve(lst):\n    return sorted(lst)\n")
+        with open(slow_file, 'w') as f:
+            f.write("def solve(lst):\n"
+                    "    pairs = [(x, y) for x in lst for y in lst]\n"
+                    "    return sorted(lst)\n")
+        
+        def broken_reference(lst):
+            raise RuntimeError("reference bug")
+        
+        results = grade_performance_cohort(
+            [fast_file, slow_file], "solve", [(list(range(200)),)],
+            reference_func=broken_reference
+        )
+        
+        assert results[1]['score'] < results[0]['score']
+        assert results[1]['time_percentile'] < 1.0
+        assert results[1]['memory_percentile'] < 1.0
+
+
+@pytest.mark.performance
+class TestComplexityEstimation:
+    """Test empirical complexity-class estimation."""
+    
+    def test_estimate_linear(self, sample_sort_code):
+        """
+        Test: Linear function is classified as O(n).
+        Note: O(n log n) is accepted since timing noise can blur the two.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        result = grader.estimate_complexity(
+            sum, lambda n: (list(range(n)),),
+            min_size=1024, max_size=2 ** 16, time_budget=5.0
+        )
+        
+        assert result['best_fit'] in ('O(n)', 'O(n log n)')
+        assert 0 <= result['confidence'] <= 1
+    
+    def test_grade_complexity_quadratic(self, sample_sort_code):
+        """
+        Test: Quadratic student function against a linear reference.
+        Verify: Ladder stops at the budget and the score is penalized.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        result = grader.grade_complexity(
+            "count_pairs",
+            lambda lst: len(set(lst)),
+            lambda n: (list(range(n)),),
+            min_size=32, max_size=2 ** 16, time_budget=2.0
+        )
+        
+        student = result['complexity']['student']
+        assert student['best_fit'] in ('O(n^2)', 'O(n^3)')
+        assert student['budget_exhausted'] is True
+        assert result['score'] < result['max_score']
+        assert "Student: O(n" in grader.generate_report(result)
+
+
+@pytest.mark.performance
+class TestAdversarialSearch:
+    """Test targeted worst-case input search."""
+    
+    def test_find_worst_case_memory(self, sample_sort_code):
+        """
+        Test: Targeted search maximizes allocated memory.
+        Verify: Worst input found has a large maximum element.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        grader.load_student_code()
+        
+        worst = grader.find_worst_case_inputs(
+            grader.student_module.allocate_by_max,
+            st.lists(st.integers(min_value=1, max_value=100000),
+                     min_size=3, max_size=3),
+            metric='memory',
+            max_examples=100,
+            top_k=2
+        )
+        
+        assert len(worst) == 2
+        assert all(len(args[0]) == 3 for args in worst)
+        assert max(worst[0][0]) >= max(worst[1][0])
+    
+    def test_grade_performance_adversarial(self, sample_sort_code,
+                                           mock_reference_function):
+        """
+        Test: Adversarial inputs are added to the benchmark set.
+        """
+        grader = PerformanceGrader(sample_sort_code)
+        result = grader.grade_performance(
+            "naive_quicksort",
+            mock_reference_function,
+            [([3, 1, 2],)],
+            adversarial={
+                'strategy': st.permutations(list(range(50))),
+                'max_examples': 30,
+                'top_k': 1
+            }
+        )
+        
+        assert result['adversarial_inputs'] == 1
+        assert result['comparison']['test_count'] == 2
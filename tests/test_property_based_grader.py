@@ -5,7 +5,9 @@
 
 import pytest
 from hypothesis import strategies as st, given, settings
-from src.property_based_grader import PropertyBasedGrader
+from src.property_based_grader import (
+    PropertyBasedGrader, PureCallMemo, integer_list_partitions
+)
 
 
 class TestPropertyBasedGrader:
@@ -114,6 +116,55 @@ def test_oracle_pass(self, sample_student_code):
         assert result['passed'] is True
         assert result['score'] == 10.0
     
+    def test_oracle_partitions_pass(self, sample_student_code):
+        """
+        Test: Oracle testing over named input partitions.
+        Verify: Every partition is reported with a full pass rate.
+        """
+        grader = PropertyBasedGrader(sample_student_code)
+        grader.load_student_code()
+        
+        partitions = integer_list_partitions(max_size=20)
+        result = grader.test_with_oracle(
+            "sort_list",
+            sorted,
+            partitions=partitions,
+            weight=1.0
+        )
+        
+        assert result['passed'] is True
+        assert result['score'] == 10.0
+        assert set(result['partitions']) == set(partitions)
+        assert all(p['pass_rate'] == 1.0 for p in result['partitions'].values())
+    
+    def test_monotonicity_ordered_pairs(self, temp_dir):
+        """
+        Test: Monotonicity test draws pre-ordered pairs.
+        Verify: No example is wasted on a > b and stats are reported.
+        """
+        import os
+        
+        code = '''
+def double(x):
+    return 2 * x
+'''
+        filepath = os.path.join(temp_dir, "monotone.py")
+        with open(filepath, 'w') as f:
+            f.write(code)
+        
+        grader = PropertyBasedGrader(filepath)
+        grader.load_student_code()
+        
+        result = grader.test_monotonicity(
+            "double",
+            st.integers(min_value=-100, max_value=100),
+            weight=1.0
+        )
+        
+        assert result['passed'] is True
+        assert result['examples'] > 0
+        assert result['vacuous_examples'] == 0
+    
     def test_custom_invariants_pass(self, sample_student_code):
         """
         Test: Custom invariant testing.
@@ -201,6 +252,54 @@ def test_generate_report(self, sample_student_code):
         assert "commutativity" in report
 
 
+class TestPureCallMemo:
+    """Test memoization of pure student functions."""
+    
+    def test_memo_hits_and_eviction(self):
+        """
+        Test: Bounded LRU memo.
+        Verify: Repeated calls hit, oldest entries are evicted.
+        """
+        calls = []
+        
+        def square(lst):
+            calls.append(lst)
+            return [x * x for x in lst]
+        
+        memo = PureCallMemo(maxsize=2)
+        memoized = memo.wrap(square)
+        
+        assert memoized([1, 2]) == [1, 4]
+        assert memoized([1, 2]) == [1, 4]
+        memoized([3])
+        memoized([4])
+        memoized([1, 2])
+        
+        assert len(calls) == 4
+        assert memo.stats()['hits'] == 1
+        assert memo.stats()['size'] == 2
+    
+    def test_memo_shared_across_properties(self, sample_student_code):
+        """
+        Test: Memo declared on a pure function is reused across properties.
+        Verify: Hit rate is reported in grade results.
+        """
+        grader = PropertyBasedGrader(sample_student_code)
+        grader.load_student_code()
+        grader.declare_pure("add")
+        
+        strategy = st.integers(min_value=-5, max_value=5)
+        grader.test_commutativity("add", strategy, weight=1.0)
+        grader.test_associativity("add", strategy, weight=1.0)
+        grader.test_identity("add", 0, strategy, weight=1.0)
+        
+        result = grader.grade()
+        
+        assert result['score'] == 10.0
+        assert result['memo']['add']['hits'] > 0
+        assert "Memo add" in grader.generate_report()
+
+
 class TestPropertyBasedGraderFailures:
     """Test failure scenarios."""
     
@@ -230,6 +329,168 @@ def subtract(a, b):
         assert result['passed'] is False
         assert result['score'] == 0.0
         assert 'failures' in result
+        assert 0 < len(result['failures']) <= 5
+        assert result['failure_count'] >= len(result['failures'])
+    
+    def test_failure_reprs_truncated(self, temp_dir):
+        """
+        Test: Failures on huge inputs are stored with truncated reprs.
+        """
+        import os
+        
+        code = '''
+def bad_sort(lst):
+    return list(lst)
+'''
+        filepath = os.path.join(temp_dir, "bad_sort_huge.py")
+        with open(filepath, 'w') as f:
+            f.write(code)
+        
+        grader = PropertyBasedGrader(filepath)
+        grader.load_student_code()
+        
+        result = grader.test_with_oracle(
+            "bad_sort",
+            sorted,
+            st.lists(st.integers(), min_size=100, max_size=100),
+            weight=1.0
+        )
+        
+        assert result['passed'] is False
+        assert all('...' in failure for failure in result['failures'])
+    
+    def test_monotonicity_fail(self, temp_dir):
+        """
+        Test: Decreasing function fails monotonicity test.
+        """
+        import os
+        
+        code = '''
+def negate(x):
+    return -x
+'''
+        filepath = os.path.join(temp_dir, "decreasing.py")
+        with open(filepath, 'w') as f:
+            f.write(code)
+        
+        grader = PropertyBasedGrader(filepath)
+        grader.load_student_code()
+        
+        result = grader.test_monotonicity(
+            "negate",
+            st.integers(min_value=-10, max_value=10),
+            weight=1.0
+        )
+        
+        assert result['passed'] is False
+        assert 'failures' in result
+    
+    def test_oracle_partitions_partial_credit(self, temp_dir):
+        """
+        Test: Function failing only on one partition.
+        Verify: Partial credit per partition.
+        """
+        import os
+        
+        code = '''
+def dedup_sort(lst):
+    return sorted(set(lst))  # Drops duplicates
+'''
+        filepath = os.path.join(temp_dir, "dedup_sort.py")
+        with open(filepath, 'w') as f:
+            f.write(code)
+        
+        grader = PropertyBasedGrader(filepath)
+        grader.load_student_code()
+        
+        result = grader.test_with_oracle(
+            "dedup_sort",
+            sorted,
+            partitions={
+                'single': st.lists(st.integers(), min_size=1, max_size=1),
+                'duplicates': {
+                    'strategy': st.integers().map(lambda x: [x, x]),
+                    'max_examples': 20
+                }
+            },
+            weight=1.0
+        )
+        
+        assert result['passed'] is False
+        assert result['partitions']['single']['pass_rate'] == 1.0
+        assert result['partitions']['duplicates']['pass_rate'] == 0.0
+        assert result['score'] == pytest.approx(5.0)
+    
+    def test_oracle_partition_hypothesis_error(self, sample_student_code):
+        """
+        Test: A partition whose Hypothesis run raises (health check).
+        Verify: The partition fails; grading of other partitions goes on.
+        """
+        grader = PropertyBasedGrader(sample_student_code)
+        grader.load_student_code()
+        
+        result = grader.test_with_oracle(
+            "sort_list",
+            sorted,
+            partitions={
+                'ok': st.lists(st.integers(), max_size=5),
+                'unsatisfiable': {
+                    'strategy': st.lists(st.integers()).filter(lambda lst: False),
+                    'max_examples': 20
+                }
+            },
+            weight=1.0
+        )
+        
+        broken = result['partitions']['unsatisfiable']
+        assert result['passed'] is False
+        assert 'error' in broken
+        assert broken['pass_rate'] == 0.0
+        assert 'Hypothesis error' in broken['failures'][0]
+        assert result['partitions']['ok']['pass_rate'] == 1.0
+        assert result['score'] == pytest.approx(5.0)
+    
+    def test_oracle_partition_error_after_passes(self, sample_student_code):
+        """
+        Test: A partition that errors after many passing examples.
+        Verify: The partition is scored as failed, not almost fully passed.
+        """
+        grader = PropertyBasedGrader(sample_student_code)
+        grader.load_student_code()
+        calls = {'count': 0}
+        
+        def explode_late(lst):
+            calls['count'] += 1
+            if calls['count'] > 30:
+                raise RuntimeError("generator broke")
+            return lst
+        
+        result = grader.test_with_oracle(
+            "sort_list",
+            sorted,
+            partitions={
+                'late': {
+                    'strategy': st.lists(st.integers(), max_size=5).map(explode_late),
+                    'max_examples': 100
+                }
+            }
+        )
+        
+        late = result['partitions']['late']
+        assert 'error' in late
+        assert late['examples'] >= 30
+        assert late['pass_rate'] == 0.0
+        assert result['score'] == 0.0
+    
+    def test_oracle_requires_strategy_or_partitions(self, sample_student_code):
+        """
+        Test: Calling test_with_oracle without any input source is an error.
+        """
+        grader = PropertyBasedGrader(sample_student_code)
+        grader.load_student_code()
+        
+        with pytest.raises(ValueError):
+            grader.test_with_oracle("sort_list", sorted)
     
     def test_custom_invariant_fail(self, temp_dir):
         """